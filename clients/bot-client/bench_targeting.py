@@ -0,0 +1,88 @@
+"""Heat map benchmark: time per move and shots to win, offline.
+
+Run from this directory:  python bench_targeting.py [--size 100] [--fleet 5,4,3,3,2 --copies 40]
+Plays --games games against a random fleet without any server and times
+every HeatMap.choose() call. Shots to sink the whole fleet are compared
+with firing at random cells.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from targeting import HeatMap
+
+
+def random_fleet(width, height, fleet, rng):
+    """Ship cells for fleet, straight and non-overlapping."""
+    taken = set()
+    positions = []
+    for length in fleet:
+        for _ in range(10000):
+            if rng.random() < 0.5 and length <= width:
+                x, y, dx, dy = rng.randrange(width - length + 1), rng.randrange(height), 1, 0
+            elif length <= height:
+                x, y, dx, dy = rng.randrange(width), rng.randrange(height - length + 1), 0, 1
+            else:
+                continue
+            cells = [(x + dx * i, y + dy * i) for i in range(length)]
+            if not taken.intersection(cells):
+                taken.update(cells)
+                positions.extend([list(cell) for cell in cells])
+                break
+        else:
+            raise ValueError("could not place fleet")
+    return positions
+
+
+def play(width, height, fleet, rng, np_rng, smart):
+    ships = {tuple(cell) for cell in random_fleet(width, height, fleet, rng)}
+    heat = HeatMap(width, height, fleet)
+    order = [(x, y) for x in range(width) for y in range(height)]
+    rng.shuffle(order)
+    times, remaining, shots = [], len(ships), 0
+    while remaining:
+        if smart:
+            start = time.perf_counter()
+            x, y = heat.choose(np_rng)
+            times.append(time.perf_counter() - start)
+        else:
+            x, y = order.pop()
+        hit = (x, y) in ships
+        heat.record(x, y, hit)
+        remaining -= hit
+        shots += 1
+    return shots, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100, help="board width and height")
+    parser.add_argument("--fleet", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[5, 4, 3, 3, 2])
+    parser.add_argument("--copies", type=int, default=40, help="copies of --fleet on the board")
+    parser.add_argument("--games", type=int, default=2)
+    args = parser.parse_args()
+
+    fleet = args.fleet * args.copies
+    rng, np_rng = random.Random(1), np.random.default_rng(1)
+    smart_shots, random_shots, times = [], [], []
+    for _ in range(args.games):
+        shots, game_times = play(args.size, args.size, fleet, rng, np_rng, True)
+        smart_shots.append(shots)
+        times += game_times
+        random_shots.append(play(args.size, args.size, fleet, rng, np_rng, False)[0])
+    times.sort()
+    cells = args.size * args.size
+    print(f"{args.size}x{args.size}, {len(fleet)} ships ({sum(fleet)} cells), {args.games} games")
+    print(f"per move: mean {sum(times) / len(times) * 1e3:.2f} ms, "
+          f"p50 {times[len(times) // 2] * 1e3:.2f} ms, p99 {times[int(len(times) * 0.99)] * 1e3:.2f} ms, "
+          f"max {times[-1] * 1e3:.2f} ms")
+    print(f"shots to win: heat map {np.mean(smart_shots):.0f} "
+          f"({np.mean(smart_shots) / cells:.0%} of cells), random {np.mean(random_shots):.0f} "
+          f"({np.mean(random_shots) / cells:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Battleship bot: a computer opponent that plays as a normal player.
+
+It registers, joins a room over HTTP and then plays through the same
+join-game, place-ships and fire events as the other clients, choosing its
+shots with the heat map in targeting.py. In salvo games (--salvo) it
+fires each turn's best cells together with fire-salvo.
+
+    python main.py --room 7                  # be the opponent in room 7
+    python main.py --games 1000 --workers 8 --concurrency 125
+                                             # bot vs. bot, 1000 games at once
+
+Bot games run in a pool of --workers processes, each playing --concurrency
+games at a time on threads (a bot mostly waits on the network; the heat
+map is NumPy and releases the GIL for most of its work).
+"""
+import argparse
+import os
+import queue
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import requests
+import socketio
+
+from targeting import HeatMap
+
+# === CONFIG ===
+USER_URL = "http://localhost:3001"
+ROOM_URL = "http://localhost:3002"
+GAME_URL = "http://localhost:3003"
+WS_URL = "http://localhost:3003"
+EVENT_TIMEOUT = 60  # seconds without any event before a bot gives up
+START_TIMEOUT = 60  # seconds to wait for the opponent to join the room
+
+
+class BotError(Exception):
+    pass
+
+
+# === BOT ===
+class Bot:
+    EVENTS = ("joined", "ships-placed", "game-ready", "move-update", "salvo-update",
+              "game-over", "error")
+
+    def __init__(self, name=None, seed=None):
+        self.name = name or f"bot-{uuid.uuid4().hex[:8]}"
+        self.np_rng = np.random.default_rng(seed)
+        self.http = requests.Session()
+        self.inbox = queue.Queue()
+        self.sio = socketio.Client(reconnection=False)
+        for event in self.EVENTS:
+            self.sio.on(event, lambda data=None, event=event: self.inbox.put((event, data)))
+        self.user_id = None
+        self.token = None
+        self.think_times = []  # seconds per heat map move
+
+    def register(self):
+        resp = self.http.post(f"{USER_URL}/register", json={"username": self.name})
+        if resp.status_code != 200:
+            raise BotError(f"register failed: {resp.text.strip()}")
+        self.user_id = resp.json()["userId"]
+        self.token = resp.json().get("token")
+
+    def join_room(self, room_id):
+        resp = self.http.post(f"{ROOM_URL}/rooms/{room_id}/join",
+                              json={"userId": self.user_id, "token": self.token})
+        if resp.status_code != 200:
+            raise BotError(f"join room failed: {resp.text.strip()}")
+
+    def start(self, room_id, config=None):
+        """POST /games/:id/start once the room is full; returns the game config."""
+        deadline = time.monotonic() + START_TIMEOUT
+        while True:
+            resp = self.http.post(f"{GAME_URL}/games/{room_id}/start", json=config or {})
+            if resp.status_code == 200:
+                return resp.json()
+            if resp.status_code != 400 or time.monotonic() > deadline:
+                raise BotError(f"start failed: {resp.text.strip()}")
+            time.sleep(0.5)  # opponent has not joined yet
+
+    def expect(self):
+        try:
+            event, data = self.inbox.get(timeout=EVENT_TIMEOUT)
+        except queue.Empty:
+            raise BotError("timed out waiting for the server")
+        if event == "error":
+            raise BotError(data.get("message", "error event"))
+        return event, data
+
+    def play(self, room_id, config=None):
+        """Play one game in room_id (already joined). Returns True if the bot won."""
+        game = self.start(room_id, config)
+        width, height, fleet = game["width"], game["height"], game["fleet"]
+        salvo = game.get("salvo", 1)
+        heat = HeatMap(width, height, fleet)
+        self.sio.connect(WS_URL)
+        try:
+            self.sio.emit("join-game", {"roomId": room_id, "userId": self.user_id,
+                                        "token": self.token})
+            # The server picks a random legal fleet under its own rules
+            self.sio.emit("place-ships", {"roomId": room_id, "userId": self.user_id,
+                                          "token": self.token, "random": True})
+            while True:
+                event, data = self.expect()
+                if event == "game-over":
+                    return data["winner"] == self.user_id
+                if event == "move-update" and data["turn"] != self.user_id:
+                    heat.record(data["x"], data["y"], data["hit"])  # our shot
+                if event == "salvo-update" and data["turn"] != self.user_id:
+                    for x, y, hit in data["shots"]:  # our salvo
+                        heat.record(x, y, hit)
+                if event in ("game-ready", "move-update", "salvo-update") \
+                        and data["turn"] == self.user_id:
+                    fire = {"roomId": room_id, "userId": self.user_id, "token": self.token}
+                    start = time.perf_counter()
+                    if salvo > 1:
+                        fire["shots"] = heat.choose_many(salvo, self.np_rng)
+                    else:
+                        fire["x"], fire["y"] = heat.choose(self.np_rng)
+                    self.think_times.append(time.perf_counter() - start)
+                    self.sio.emit("fire-salvo" if salvo > 1 else "fire", fire)
+        finally:
+            self.sio.disconnect()
+
+
+# === BOT VS. BOT POOL ===
+def bot_game(config, seed):
+    """Two bots play each other in a new room. Returns (moves, think times)."""
+    room_id = requests.post(f"{ROOM_URL}/rooms").json()["roomId"]
+    bots = [Bot(seed=seed), Bot(seed=seed + 1)]
+    for bot in bots:
+        bot.register()
+        bot.join_room(room_id)
+    with ThreadPoolExecutor(max_workers=1) as other:
+        opponent = other.submit(bots[1].play, room_id, config)
+        bots[0].play(room_id, config)
+        opponent.result()
+    times = bots[0].think_times + bots[1].think_times
+    return len(times), times
+
+
+def run_worker(games, concurrency, config, seed):
+    """One pool process: play games bot games, concurrency at a time."""
+    moves, times, failed = 0, [], 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(bot_game, config, seed + 2 * i) for i in range(games)]
+        for future in as_completed(futures):
+            try:
+                game_moves, game_times = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"bot game failed: {e}", file=sys.stderr)
+                continue
+            moves += game_moves
+            times += game_times
+    return games - failed, failed, moves, times
+
+
+def run_pool(args, config):
+    per_worker = [args.games // args.workers + (i < args.games % args.workers)
+                  for i in range(args.workers)]
+    start = time.perf_counter()
+    played = failed = moves = 0
+    times = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_worker, games, args.concurrency, config, 10 ** 6 * i)
+                   for i, games in enumerate(per_worker) if games]
+        for future in as_completed(futures):
+            worker_played, worker_failed, worker_moves, worker_times = future.result()
+            played += worker_played
+            failed += worker_failed
+            moves += worker_moves
+            times += worker_times
+    elapsed = time.perf_counter() - start
+    times.sort()
+    print(f"{played} bot games ({failed} failed), {moves} moves in {elapsed:.1f}s "
+          f"({played / elapsed:.1f} games/s)")
+    if times:
+        print(f"heat map per move: p50 {times[len(times) // 2] * 1e3:.2f} ms, "
+              f"p99 {times[int(len(times) * 0.99)] * 1e3:.2f} ms, max {times[-1] * 1e3:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Battleship bot opponent")
+    parser.add_argument("--room", type=int, help="join this room and play whoever is in it")
+    parser.add_argument("--games", type=int, default=10, help="bot vs. bot games (without --room)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="bot worker processes")
+    parser.add_argument("--concurrency", type=int, default=10, help="games at once per worker")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--fleet", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[5, 4, 3, 3, 2], help="comma-separated ship lengths")
+    parser.add_argument("--salvo", type=int, default=1, help="shots per turn (salvo variant)")
+    args = parser.parse_args()
+
+    # Used if the bot is first to start the game; otherwise the game's own
+    config = {"width": args.width, "height": args.height, "fleet": args.fleet,
+              "salvo": args.salvo}
+    if args.room is None:
+        run_pool(args, config)
+        return
+    bot = Bot()
+    bot.register()
+    bot.join_room(args.room)
+    print(f"{bot.name} (ID: {bot.user_id}) joined room {args.room}")
+    won = bot.play(args.room, config)
+    print(f"{bot.name} {'won' if won else 'lost'}")
+
+
+if __name__ == "__main__":
+    main()
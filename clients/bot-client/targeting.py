@@ -0,0 +1,95 @@
+"""Probability-density targeting for the bot.
+
+For every ship length in the fleet, every horizontal and vertical placement
+that covers no miss and at least one unknown cell is a candidate; each cell
+scores the number of candidates through it. Placements through hits score
+HIT_WEIGHT ** hits, so the bot finishes ships it has found instead of
+searching elsewhere. The server never says which ship was sunk, so hits
+keep attracting shots only while their placements still have unknown
+cells.
+
+Everything is whole-board NumPy: the number of misses, hits and unknown
+cells in every run of L cells comes from a cumulative sum
+(cs[i + L] - cs[i]), and spreading each run's weight back onto its L cells
+is a second cumulative sum. Vertical runs are the same on the transpose.
+A move costs O(width x height) per distinct ship length.
+"""
+import numpy as np
+
+UNKNOWN, MISS, HIT = 0, 1, 2
+HIT_WEIGHT = 30.0
+MAX_HIT_POWER = 4  # beyond this the weight only costs float precision
+
+
+def prefix(grid):
+    """Cumulative sums down axis 0, with a leading row of zeros."""
+    cs = np.zeros((grid.shape[0] + 1, grid.shape[1]), dtype=np.int32)
+    np.cumsum(grid, axis=0, out=cs[1:])
+    return cs
+
+
+def run_sums(cs, length):
+    """Sum over every run of length cells down axis 0, from prefix()."""
+    return cs[length:] - cs[:-length]
+
+
+def spread(weights, length):
+    """Cell scores from run weights (as laid out by run_sums): each cell
+    gets the sum of the weights of the runs that cover it."""
+    runs = weights.shape[0]
+    cw = np.zeros((runs + 1, weights.shape[1]))
+    np.cumsum(weights, axis=0, out=cw[1:])
+    cells = np.arange(runs + length - 1)
+    return cw[np.minimum(cells + 1, runs)] - cw[np.maximum(cells - length + 1, 0)]
+
+
+class HeatMap:
+    def __init__(self, width, height, fleet):
+        self.width = width
+        self.height = height
+        self.shots = np.zeros((width, height), dtype=np.int8)  # indexed [x, y]
+        lengths, counts = np.unique(np.asarray(fleet), return_counts=True)
+        self.lengths = list(zip(lengths.tolist(), counts.tolist()))
+
+    def record(self, x, y, hit):
+        self.shots[x, y] = HIT if hit else MISS
+
+    def density(self):
+        misses = (self.shots == MISS).astype(np.int8)
+        hits = (self.shots == HIT).astype(np.int8)
+        unknown = (self.shots == UNKNOWN).astype(np.int8)
+        scores = np.zeros((self.width, self.height))
+        for transpose in (False, True):  # runs along x, then along y
+            grids = (misses.T, hits.T, unknown.T) if transpose else (misses, hits, unknown)
+            m, h, u = (prefix(grid) for grid in grids)
+            axis_scores = np.zeros(grids[0].shape)
+            for length, count in self.lengths:
+                if length > grids[0].shape[0]:
+                    continue
+                ok = (run_sums(m, length) == 0) & (run_sums(u, length) > 0)
+                power = np.minimum(run_sums(h, length), MAX_HIT_POWER)
+                axis_scores += spread(np.where(ok, count * HIT_WEIGHT ** power, 0.0), length)
+            scores += axis_scores.T if transpose else axis_scores
+        scores[self.shots != UNKNOWN] = 0
+        return scores
+
+    def choose(self, rng=None):
+        """(x, y) of the best unknown cell; ties broken at random."""
+        scores = self.density()
+        best = scores.max()
+        if best <= 0:  # nothing fits any more; any unknown cell will do
+            candidates = np.argwhere(self.shots == UNKNOWN)
+        else:
+            candidates = np.argwhere(scores == best)
+        rng = rng or np.random.default_rng()
+        x, y = candidates[rng.integers(len(candidates))]
+        return int(x), int(y)
+
+    def choose_many(self, n, rng=None):
+        """[x, y] of the n best unknown cells (all of them if fewer are
+        left), for a salvo; ties broken at random."""
+        rng = rng or np.random.default_rng()
+        unknown = np.flatnonzero(self.shots == UNKNOWN)
+        scores = self.density().ravel()[unknown]
+        best = unknown[np.lexsort((rng.random(len(unknown)), -scores))[:n]]
+        return [[int(x), int(y)] for x, y in zip(*np.divmod(best, self.height))]
@@ -0,0 +1,530 @@
+"""Asyncio CLI client: the game keeps running while you type.
+
+Run from this directory:
+    python async_client.py                                       # interactive
+    python async_client.py --auto --username ann --match         # scripted
+    python async_client.py --auto --username bob --room 7 --moves "0 0;0 1;4 4"
+
+main.py asks for moves with input() inside its Socket.IO handlers, which
+stalls every other event (and the heartbeats) until the user answers. Here
+the handlers only update the game state and the screen; a separate play()
+task asks a player for ships and moves when it is that player's turn:
+
+    TerminalPlayer  reads lines from stdin on a reader thread, handed to the
+                    event loop through an asyncio.Queue
+    AutoPlayer      answers from the command line: a random fleet from the
+                    server, then --moves in order, then random cells
+
+On a terminal the boards are drawn once at the top of the screen and after
+that only the cells that change are rewritten; messages scroll in the lines
+below them. Piped or scripted, the boards are printed when the game starts
+and ends, with a message per move in between. Reconnects resync from the
+last game version seen, as in main.py.
+
+To script games from Python, give GameClient any object with the
+TerminalPlayer methods and await client.run().
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import threading
+
+import aiohttp
+import socketio
+
+from main import (USER_URL, ROOM_URL, GAME_URL, WS_URL, ENCODING, BOT_SCRIPT,
+                  decode_frame, pack_cells)
+
+ROOM_POLL_SECONDS = 0.5
+
+
+# === SCREEN ===
+class BoardView:
+    """Both boards laid out as in main.display_boards()."""
+    def __init__(self, out=None, ansi=None):
+        self.out = out or sys.stdout
+        if ansi is None:
+            ansi = self.out.isatty() and os.environ.get("TERM", "dumb") != "dumb"
+        self.ansi = ansi
+        self.drawn = False  # boards on screen, cells can be rewritten in place
+        self.prompt = ""
+
+    def write(self, text):
+        self.out.write(text)
+        self.out.flush()
+
+    def draw(self, game):
+        """The whole screen: once per game, and after a snapshot resync."""
+        width, height = game.width, game.height
+        self.label = len(str(width - 1))
+        side = self.label + 2 * height
+        self.offset = side + 4  # from a cell of your board to the same cell of theirs
+        header = " " * (self.label + 1) + " ".join(str(y % 10) for y in range(height))
+        lines = [f"{'YOUR BOARD':<{side + 4}}OPPONENT BOARD",
+                 "-" * (2 * side + 4),
+                 header + "    " + header]
+        for x in range(width):
+            lines.append(f"{x:>{self.label}} {' '.join(game.mine[x])}  | "
+                         f"{x:>{self.label}} {' '.join(game.theirs[x])}")
+        lines.append("-" * (2 * side + 4))
+        size = shutil.get_terminal_size()
+        self.drawn = self.ansi and len(lines) + 3 <= size.lines and len(lines[1]) <= size.columns
+        if self.drawn:
+            # Clear, draw, then keep messages scrolling below the boards
+            self.write("\033[H\033[2J" + "\n".join(lines) +
+                       f"\033[{len(lines) + 2};{size.lines}r\033[{size.lines};1H")
+        else:
+            self.write("\n".join(lines) + "\n")
+
+    def cell(self, board, x, y, mark):
+        """Rewrite one cell of board 0 (yours) or 1 (theirs) in place."""
+        if self.drawn:
+            column = self.label + 2 + 2 * y + board * self.offset
+            self.write(f"\0337\033[{4 + x};{column}H{mark}\0338")
+
+    def say(self, text):
+        if self.prompt:
+            # Keep the prompt as the last line while events arrive
+            self.write(f"\r\033[K{text}\n{self.prompt}" if self.ansi else f"\n{text}\n{self.prompt}")
+        else:
+            self.write(text + "\n")
+
+    def close(self):
+        if self.drawn:
+            self.write(f"\033[r\033[{shutil.get_terminal_size().lines};1H\n")
+            self.drawn = False
+
+
+# === PLAYERS ===
+class TerminalPlayer:
+    def __init__(self, view):
+        self.view = view
+        self.lines = None
+
+    def start_reader(self):
+        loop = asyncio.get_running_loop()
+        self.lines = asyncio.Queue()
+
+        def read():
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(self.lines.put_nowait, line)
+            loop.call_soon_threadsafe(self.lines.put_nowait, None)
+        threading.Thread(target=read, daemon=True).start()
+
+    async def ask(self, prompt):
+        if self.lines is None:
+            self.start_reader()
+        self.view.prompt = prompt
+        self.view.write(prompt)
+        try:
+            line = await self.lines.get()
+        finally:
+            self.view.prompt = ""
+        if line is None:
+            raise EOFError
+        return line.strip()
+
+    async def credentials(self):
+        self.view.say("BATTLESHIP CLI CLIENT (asyncio)\n1. Register\n2. Login")
+        mode = "register" if await self.ask("Choose (1 or 2): ") == "1" else "login"
+        return mode, await self.ask("Enter username: ")
+
+    async def lobby(self):
+        self.view.say("\n1. Create Room\n2. Join Room\n3. Quick Match\n4. Play vs Bot")
+        choice = await self.ask("Choose (1, 2, 3 or 4): ")
+        if choice == "2":
+            while True:
+                try:
+                    return "join", int(await self.ask("Enter Room ID: "))
+                except ValueError:
+                    self.view.say("Invalid room ID")
+        return {"1": "create", "3": "match", "4": "bot"}.get(choice, "create"), None
+
+    async def fleet(self, game):
+        """[x, y] ship cells, or None for a random fleet from the server."""
+        if (await self.ask(f"Random fleet (lengths {game.fleet})? (y/n): ")).lower() == "y":
+            return None
+        self.view.say(f"Place your {len(game.fleet)} ships, each by its two end cells")
+        positions = []
+        for number, length in enumerate(game.fleet, 1):
+            while True:
+                try:
+                    x1, y1, x2, y2 = map(int, (await self.ask(
+                        f"Ship {number}, length {length} (x1 y1 x2 y2): ")).split())
+                except ValueError:
+                    self.view.say("Enter 4 numbers: x1 y1 x2 y2")
+                    continue
+                cells = [[x, y] for x in range(min(x1, x2), max(x1, x2) + 1)
+                         for y in range(min(y1, y2), max(y1, y2) + 1)]
+                if not ((x1 == x2 or y1 == y2) and len(cells) == length and
+                        all(game.on_board(x, y) for x, y in cells)):
+                    self.view.say(f"Ship must be a straight line of {length} cells "
+                                  f"within 0-{game.width - 1} x 0-{game.height - 1}!")
+                elif any(game.mine[x][y] == 'S' for x, y in cells):
+                    self.view.say("Ships cannot overlap!")
+                else:
+                    for x, y in cells:
+                        game.set_mine(x, y, 'S')
+                    positions += cells
+                    break
+        return positions
+
+    async def target(self, game):
+        while True:
+            try:
+                x, y = map(int, (await self.ask("Your turn! Fire position (x y): ")).split())
+            except ValueError:
+                self.view.say(f"Enter two numbers: x y (0-{game.width - 1}, 0-{game.height - 1})")
+                continue
+            if game.on_board(x, y) and game.theirs[x][y] == '~':
+                return x, y
+            self.view.say("Invalid position or already fired there!")
+
+
+class AutoPlayer:
+    def __init__(self, username, room=None, match=False, moves=(), delay=0.0, rng=random):
+        self.username = username
+        self.room = room
+        self.match = match
+        self.moves = list(moves)
+        self.delay = delay
+        self.rng = rng
+
+    async def credentials(self):
+        return "register", self.username
+
+    async def lobby(self):
+        if self.room is not None:
+            return "join", self.room
+        return ("match" if self.match else "create"), None
+
+    async def fleet(self, game):
+        return None
+
+    async def target(self, game):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        while self.moves:
+            x, y = self.moves.pop(0)
+            if game.on_board(x, y) and game.theirs[x][y] == '~':
+                return x, y
+        return self.rng.choice([(x, y) for x in range(game.width) for y in range(game.height)
+                                if game.theirs[x][y] == '~'])
+
+
+# === GAME ===
+class GameClient:
+    def __init__(self, player, view=None, encoding=ENCODING):
+        self.player = player
+        self.view = view or BoardView()
+        self.encoding = encoding
+        self.sio = socketio.AsyncClient()
+        self.http = None
+        self.user_id = self.token = self.room_id = None
+        self.width, self.height, self.fleet = 5, 5, [2, 2]
+        self.mine = self.theirs = None
+        self.new_boards()
+        self.version = 0  # last game version seen, sent with resync after a reconnect
+        self.ready = False
+        self.turn = self.winner = None
+        self.shot = None  # our shot waiting for its move-update
+        self.wake = asyncio.Event()  # turn, placement or game state changed
+        self.replace = False  # the server refused our fleet: place again
+        self.handlers = {
+            'joined': self.on_joined,
+            'ships-placed': self.on_ships_placed,
+            'game-ready': self.on_game_ready,
+            'move-update': self.on_move_update,
+            'game-over': self.on_game_over,
+            'ships-assigned': self.on_ships_assigned,
+            'resync': self.on_resync,
+            'error': self.on_error,
+        }
+        for event, handler in self.handlers.items():
+            self.sio.on(event, handler)
+        self.sio.on('frame', self.on_frame)
+        self.sio.on('connect', self.on_connect)
+        self.sio.on('disconnect', self.on_disconnect)
+
+    # === BOARDS ===
+    def new_boards(self):
+        self.mine = [['~'] * self.height for _ in range(self.width)]
+        self.theirs = [['~'] * self.height for _ in range(self.width)]
+
+    def on_board(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def set_mine(self, x, y, mark):
+        self.mine[x][y] = mark
+        self.view.cell(0, x, y, mark)
+
+    def set_theirs(self, x, y, mark):
+        self.theirs[x][y] = mark
+        self.view.cell(1, x, y, mark)
+
+    def saw(self, data):
+        # Packed frames carry no version; each of these events adds one
+        self.version = data.get('version', self.version + 1)
+
+    # === WEBSOCKET EVENT HANDLERS ===
+    # None of these wait for the player; play() does.
+    async def on_connect(self):
+        if self.room_id is not None and self.version:
+            # Reconnected mid-game: catch up from the last version seen
+            await self.sio.emit('resync', {'roomId': self.room_id, 'userId': self.user_id,
+                                           'token': self.token, 'version': self.version,
+                                           'encoding': self.encoding})
+
+    async def on_disconnect(self):
+        if self.winner is None:
+            self.view.say("Disconnected from Game Server, reconnecting...")
+
+    async def on_joined(self, data):
+        self.view.say(f"Joined game room {data['roomId']} as user {data['yourId']}")
+
+    async def on_ships_placed(self, data):
+        self.saw(data)
+        if data['userId'] != self.user_id:
+            self.view.say(f"Player {data['userId']} has placed their ships.")
+
+    async def on_game_ready(self, data):
+        self.ready, self.turn = True, data['turn']
+        if not self.view.drawn:
+            self.view.draw(self)
+        self.view.say("BOTH PLAYERS READY! " +
+                      ("You fire first." if self.turn == self.user_id else "Opponent fires first."))
+        self.wake.set()
+
+    async def on_move_update(self, data):
+        self.saw(data)
+        x, y, hit = data['x'], data['y'], data['hit']
+        # Turns alternate, so whoever has the turn now did not fire
+        if data['turn'] != self.user_id:
+            self.shot = None
+            self.set_theirs(x, y, 'X' if hit else 'O')
+            self.view.say(f"You fired at ({x},{y}) → {'HIT!' if hit else 'MISS'}")
+        else:
+            self.set_mine(x, y, 'X' if hit else 'O')
+            self.view.say(f"Opponent fired at ({x},{y}) → {'HIT!' if hit else 'MISS'}")
+        self.turn = data['turn']
+        self.wake.set()
+
+    async def on_game_over(self, data):
+        self.saw(data)
+        self.winner = data['winner']
+        if not self.view.drawn:
+            self.view.draw(self)
+        self.view.close()
+        self.view.say(f"GAME OVER! Winner: Player {self.winner}\n" +
+                      ("YOU WIN!" if self.winner == self.user_id else "You lost."))
+        self.wake.set()
+
+    async def on_ships_assigned(self, data):
+        # Random fleet picked by the server
+        for x, y in data['positions']:
+            self.set_mine(x, y, 'S')
+        self.view.say("Fleet placed, waiting for opponent...")
+
+    async def on_resync(self, data):
+        if data['type'] == 'delta':
+            # The events missed while disconnected, as they were broadcast
+            for event, payload in data['events']:
+                await self.handlers[event](payload)
+            self.view.say(f"Resynced: {len(data['events'])} missed events")
+            return
+        self.new_boards()
+        for x, y in data.get('yourShips', []):
+            self.mine[x][y] = 'S'
+        for i, (x, y, hit) in enumerate(data['moves']):
+            # Moves alternate, player1 first
+            if (data['player1'] == self.user_id) == (i % 2 == 0):
+                self.theirs[x][y] = 'X' if hit else 'O'
+            else:
+                self.mine[x][y] = 'X' if hit else 'O'
+        self.version, self.turn, self.shot = data['version'], data['turn'], None
+        self.ready = len(data['shipsPlaced']) == 2
+        self.view.draw(self)
+        self.view.say(f"Resynced from snapshot (version {self.version})")
+        if data['winner'] is not None:
+            await self.on_game_over({'winner': data['winner'], 'version': self.version})
+        self.wake.set()
+
+    async def on_error(self, data):
+        message = data.get('message', 'Unknown error')
+        self.view.say(f"Error: {message}")
+        if message == 'Invalid ship placement':
+            for x, y in [(x, y) for x in range(self.width) for y in range(self.height)
+                         if self.mine[x][y] == 'S']:
+                self.set_mine(x, y, '~')
+            self.replace = True
+        elif self.shot is not None:
+            # The shot was refused: take the turn again
+            self.set_theirs(*self.shot, '~')
+            self.shot = None
+        self.wake.set()
+
+    async def on_frame(self, frame):
+        for event, payload in decode_frame(frame):
+            handler = self.handlers.get(event)
+            if handler:
+                await handler(payload)
+
+    # === LOBBY (HTTP) ===
+    async def post(self, url, body=None):
+        async with self.http.post(url, json=body) as resp:
+            return resp.status, await resp.json()
+
+    async def get(self, url, **params):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else None
+        async with self.http.get(url, params=params, headers=headers) as resp:
+            return resp.status, await resp.json()
+
+    async def login(self):
+        mode, username = await self.player.credentials()
+        status, data = await self.post(f"{USER_URL}/{mode}", {"username": username})
+        if status != 200:
+            raise RuntimeError(f"Authentication failed: {data.get('error', 'Unknown')}")
+        self.user_id, self.token = data["userId"], data.get("token")
+        self.view.say(f"Logged in as {username} (ID: {self.user_id})")
+
+    async def enter_room(self):
+        """Create, join or match into a room; waits until it is full."""
+        choice, room = await self.player.lobby()
+        auth = {"userId": self.user_id, "token": self.token}
+        if choice == "match":
+            status, data = await self.post(f"{ROOM_URL}/match", auth)
+            if status not in (200, 202):
+                raise RuntimeError(f"Matchmaking failed: {data.get('error', 'Unknown')}")
+            self.view.say("Looking for an opponent...")
+            while data["status"] != "matched":
+                status, data = await self.get(f"{ROOM_URL}/match/{self.user_id}", wait=30)
+                if status == 404:
+                    raise RuntimeError("Matchmaking cancelled")
+            self.room_id = data["roomId"]
+            self.view.say(f"Matched with player {data['opponentId']} in room {self.room_id}")
+            return
+        if choice == "join":
+            self.room_id = room
+        else:
+            status, data = await self.post(f"{ROOM_URL}/rooms")
+            if status != 201:
+                raise RuntimeError(f"Failed to create room: {data}")
+            self.room_id = data["roomId"]
+            self.view.say(f"Room created: {self.room_id}")
+        status, data = await self.post(f"{ROOM_URL}/rooms/{self.room_id}/join", auth)
+        if status != 200:
+            raise RuntimeError(f"Failed to join room: {data.get('error', 'Unknown')}")
+        if choice == "bot":
+            # The bot is a separate player process that joins the same room
+            await asyncio.create_subprocess_exec(
+                sys.executable, BOT_SCRIPT, "--room", str(self.room_id),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        self.view.say("Waiting for opponent...")
+        while (await self.get(f"{ROOM_URL}/rooms/{self.room_id}"))[1].get("status") != "full":
+            await asyncio.sleep(ROOM_POLL_SECONDS)
+
+    async def start(self):
+        status, config = await self.post(f"{GAME_URL}/games/{self.room_id}/start")
+        if status != 200:
+            raise RuntimeError(f"Could not start game: {config}")
+        await self.sio.emit('join-game', {'roomId': self.room_id, 'userId': self.user_id,
+                                          'token': self.token, 'encoding': self.encoding})
+        self.width, self.height = config.get("width", 5), config.get("height", 5)
+        self.fleet = config.get("fleet", [2, 2])
+        self.new_boards()
+        self.view.draw(self)
+
+    # === PLAY ===
+    async def place(self):
+        self.replace = False
+        positions = await self.player.fleet(self)
+        placement = {'roomId': self.room_id, 'userId': self.user_id, 'token': self.token}
+        if positions is None:
+            placement['random'] = True
+        elif self.encoding == "packed":
+            placement['cells'] = pack_cells(positions)
+        else:
+            placement['positions'] = positions
+        await self.sio.emit('place-ships', placement)
+        if positions is not None:
+            self.view.say("Waiting for opponent to place ships...")
+
+    async def fire(self):
+        x, y = await self.player.target(self)
+        if self.winner is not None or self.turn != self.user_id:
+            return
+        self.shot = (x, y)
+        self.set_theirs(x, y, '?')  # pending until the move-update
+        await self.sio.emit('fire', {'roomId': self.room_id, 'userId': self.user_id,
+                                     'token': self.token, 'x': x, 'y': y})
+
+    async def play(self):
+        """Ask the player for ships, then for a shot on each of our turns."""
+        await self.place()
+        while self.winner is None:
+            await self.wake.wait()
+            self.wake.clear()
+            if self.replace:
+                await self.place()
+            elif self.ready and self.turn == self.user_id and self.shot is None \
+                    and self.winner is None:
+                # A resync or game-over while the player decides cancels the question
+                ask = asyncio.ensure_future(self.fire())
+                changed = asyncio.ensure_future(self.wake.wait())
+                await asyncio.wait([ask, changed], return_when=asyncio.FIRST_COMPLETED)
+                if not ask.done():
+                    ask.cancel()
+                changed.cancel()
+                if ask.done() and not ask.cancelled():
+                    ask.result()
+
+    async def run(self):
+        async with aiohttp.ClientSession() as self.http:
+            await self.login()
+            await self.sio.connect(WS_URL)
+            try:
+                await self.enter_room()
+                await self.start()
+                await self.play()
+            finally:
+                self.view.close()
+                await self.sio.disconnect()
+        return self.winner == self.user_id
+
+
+def parse_moves(text):
+    return [tuple(map(int, move.split())) for move in text.split(";") if move.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--auto", action="store_true", help="play without asking (scripted)")
+    parser.add_argument("--username", help="with --auto: register under this name")
+    parser.add_argument("--room", type=int, help="with --auto: join this room (default: create one)")
+    parser.add_argument("--match", action="store_true", help="with --auto: use quick match")
+    parser.add_argument("--moves", type=parse_moves, default=[],
+                        help='with --auto: shots to fire first, "x y;x y;..."')
+    parser.add_argument("--delay", type=float, default=0.0, help="with --auto: seconds per shot")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    view = BoardView()
+    if args.auto:
+        username = args.username or f"auto{random.randrange(10 ** 9)}"
+        player = AutoPlayer(username, args.room, args.match, args.moves, args.delay,
+                            random.Random(args.seed))
+    else:
+        player = TerminalPlayer(view)
+    try:
+        won = asyncio.run(GameClient(player, view).run())
+    except (RuntimeError, EOFError, KeyboardInterrupt) as e:
+        view.close()
+        print(e or "Bye")
+        sys.exit(1)
+    sys.exit(0 if won else 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
+import base64
+import json
+import os
 import requests
 import socketio
+import struct
+import subprocess
+import sys
 import threading
 import time
 
@@ -8,20 +14,42 @@ USER_URL = "http://localhost:3001"
 ROOM_URL = "http://localhost:3002"
 GAME_URL = "http://localhost:3003"
 WS_URL = "http://localhost:3003"
+# "packed": binary frames, several events per message; "json": one event each
+ENCODING = os.environ.get("BATTLESHIP_ENCODING", "packed")
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot-client", "main.py")
 
 sio = socketio.Client()
 user_id = None
+token = None  # signed session token from the user service
 username = None
 room_id = None
 
-# Game boards (5x5)
+# Game boards (5x5 until the server says otherwise)
+board_width = 5
+board_height = 5
+fleet = [2, 2]
 my_board = [['~' for _ in range(5)] for _ in range(5)]
 opponent_board = [['~' for _ in range(5)] for _ in range(5)]
 
+version = 0  # last game version seen, sent with resync after a reconnect
+replaying = False  # applying a resync delta: don't prompt for moves
+
+def new_board():
+    return [['~' for _ in range(board_height)] for _ in range(board_width)]
+
+def saw(data):
+    # Packed frames carry no version; each of these events adds one
+    global version
+    version = data.get('version', version + 1)
+
 # === WEBSOCKET EVENT HANDLERS ===
 @sio.event
 def connect():
     print("Connected to Game Server via WebSocket")
+    if room_id is not None and version:
+        # Reconnected mid-game: catch up from the last version seen
+        sio.emit('resync', {'roomId': room_id, 'userId': user_id, 'token': token,
+                            'version': version, 'encoding': ENCODING})
 
 @sio.event
 def disconnect():
@@ -33,6 +61,7 @@ def on_joined(data):
 
 @sio.on('ships-placed')
 def on_ships_placed(data):
+    saw(data)
     print(f"Player {data['userId']} has placed their ships.")
 
 @sio.on('game-ready')
@@ -41,25 +70,26 @@ def on_game_ready(data):
     print("\n" + "="*50)
     print("BOTH PLAYERS READY! GAME STARTING...")
     print(f"Current turn: Player {data['turn']}")
-    my_board = [['~' for _ in range(5)] for _ in range(5)]
-    opponent_board = [['~' for _ in range(5)] for _ in range(5)]
+    opponent_board = new_board()
     display_boards()
-    if data['turn'] == user_id:
+    if data['turn'] == user_id and not replaying:
         take_turn()
 
 @sio.on('move-update')
 def on_move_update(data):
+    saw(data)
     x, y = data['x'], data['y']
     marker = 'X' if data['hit'] else 'O'
     opponent_board[x][y] = marker
     result = "HIT!" if data['hit'] else "MISS"
     print(f"\nOpponent fired at ({x},{y}) → {result}")
     display_boards()
-    if data['turn'] == user_id:
+    if data['turn'] == user_id and not replaying:
         take_turn()
 
 @sio.on('game-over')
 def on_game_over(data):
+    saw(data)
     print(f"\n{'='*50}")
     print(f"GAME OVER! Winner: Player {data['winner']}")
     if data['winner'] == user_id:
@@ -69,17 +99,122 @@ def on_game_over(data):
     print("="*50)
     sio.disconnect()
 
+@sio.on('ships-assigned')
+def on_ships_assigned(data):
+    # Random fleet picked by the server
+    for x, y in data['positions']:
+        my_board[x][y] = 'S'
+    print("Your fleet:")
+    display_boards()
+
+@sio.on('resync')
+def on_resync(data):
+    global my_board, opponent_board, version, replaying
+    if data['type'] == 'delta':
+        # The events missed while disconnected, as they were broadcast
+        replaying = True
+        try:
+            for event, payload in data['events']:
+                HANDLERS[event](payload)
+        finally:
+            replaying = False
+        print(f"Resynced: {len(data['events'])} missed events")
+        turn = next((p['turn'] for e, p in reversed(data['events']) if 'turn' in p), None)
+        if turn == user_id:
+            take_turn()
+        return
+    my_board, opponent_board = new_board(), new_board()
+    for x, y in data.get('yourShips', []):
+        my_board[x][y] = 'S'
+    for x, y, hit in data['moves']:
+        opponent_board[x][y] = 'X' if hit else 'O'
+    version = data['version']
+    print(f"Resynced from snapshot (version {version})")
+    display_boards()
+    if data['winner'] is not None:
+        on_game_over({'winner': data['winner'], 'version': version})
+    elif data['turn'] == user_id and len(data['shipsPlaced']) == 2:
+        take_turn()
+
 @sio.on('error')
 def on_error(data):
     print(f"Error: {data.get('message', 'Unknown error')}")
 
+# === PACKED FRAMES (layout: services/game-rules-service/wire.py) ===
+FRAME_LAYOUTS = {
+    1: ('joined', '<II', ('roomId', 'yourId')),
+    2: ('ships-placed', '<I', ('userId',)),
+    3: ('game-ready', '<IHH', ('turn', 'width', 'height')),
+    4: ('move-update', '<HH?I', ('x', 'y', 'hit', 'turn')),
+    5: ('game-over', '<I', ('winner',)),
+}
+
+def decode_frame(frame):
+    """Yield (event, payload) for each message in a packed frame."""
+    data = base64.b64decode(frame)
+    offset = 0
+    while offset < len(data):
+        kind = data[offset]
+        offset += 1
+        if kind in FRAME_LAYOUTS:
+            event, layout, fields = FRAME_LAYOUTS[kind]
+            yield event, dict(zip(fields, struct.unpack_from(layout, data, offset)))
+            offset += struct.calcsize(layout)
+        elif kind == 6:  # error
+            (length,) = struct.unpack_from('<H', data, offset)
+            yield 'error', {'message': data[offset + 2:offset + 2 + length].decode()}
+            offset += 2 + length
+        elif kind == 7:  # salvo-update: turn, shot count, then x/y/hit per shot
+            turn, count = struct.unpack_from('<IH', data, offset)
+            offset += 6
+            shots = [[x, y, hit] for x, y, hit in struct.iter_unpack(
+                '<HH?', data[offset:offset + 5 * count])]
+            yield 'salvo-update', {'turn': turn, 'shots': shots}
+            offset += 5 * count
+        else:  # any other event, as JSON
+            name_length = data[offset]
+            name = data[offset + 1:offset + 1 + name_length].decode()
+            offset += 1 + name_length
+            (length,) = struct.unpack_from('<I', data, offset)
+            yield name, json.loads(data[offset + 4:offset + 4 + length])
+            offset += 4 + length
+
+def pack_cells(positions):
+    flat = [c for cell in positions for c in cell]
+    return base64.b64encode(struct.pack(f'<{len(flat)}H', *flat)).decode()
+
+@sio.on('frame')
+def on_frame(frame):
+    for event, payload in decode_frame(frame):
+        handler = FRAME_HANDLERS.get(event)
+        if handler:
+            handler(payload)
+
+FRAME_HANDLERS = {
+    'joined': on_joined,
+    'ships-placed': on_ships_placed,
+    'game-ready': on_game_ready,
+    'move-update': on_move_update,
+    'game-over': on_game_over,
+    'ships-assigned': on_ships_assigned,
+    'resync': on_resync,
+    'error': on_error,
+}
+# Broadcast events a resync delta may carry
+HANDLERS = {
+    'ships-placed': on_ships_placed,
+    'game-ready': on_game_ready,
+    'move-update': on_move_update,
+    'game-over': on_game_over,
+}
+
 # === HELPER FUNCTIONS ===
 def display_boards():
     print("\n" + "YOUR BOARD".center(25) + "OPPONENT BOARD".center(25))
     print("-" * 50)
-    header = "  " + " ".join(str(i) for i in range(5))
+    header = "  " + " ".join(str(i) for i in range(board_height))
     print(header + "    " + header)
-    for i in range(5):
+    for i in range(board_width):
         my_row = " ".join(my_board[i])
         opp_row = " ".join(opponent_board[i])
         print(f"{i} {my_row}  | {i} {opp_row}")
@@ -92,10 +227,11 @@ def take_turn():
             if not coord:
                 continue
             x, y = map(int, coord.split())
-            if 0 <= x < 5 and 0 <= y < 5 and opponent_board[x][y] == '~':
+            if 0 <= x < board_width and 0 <= y < board_height and opponent_board[x][y] == '~':
                 sio.emit('fire', {
                     'roomId': room_id,
                     'userId': user_id,
+                    'token': token,
                     'x': x,
                     'y': y
                 })
@@ -105,13 +241,13 @@ def take_turn():
             else:
                 print("Invalid position or already fired there!")
         except ValueError:
-            print("Enter two numbers: x y (0-4)")
+            print(f"Enter two numbers: x y (0-{board_width - 1}, 0-{board_height - 1})")
         except Exception as e:
             print(f"Input error: {e}")
 
 # === MAIN GAME FLOW ===
 def main():
-    global user_id, username, room_id
+    global user_id, token, username, room_id, board_width, board_height, fleet, my_board
 
     print("BATTLESHIP CLI CLIENT")
     print("1. Register")
@@ -131,6 +267,7 @@ def main():
 
     user_data = resp.json()
     user_id = user_data["userId"]
+    token = user_data.get("token")
     print(f"Logged in as {username} (ID: {user_id})")
 
     # Connect to WebSocket
@@ -144,9 +281,38 @@ def main():
 
     print("\n1. Create Room")
     print("2. Join Room")
-    choice = input("Choose (1 or 2): ").strip()
+    print("3. Quick Match")
+    print("4. Play vs Bot")
+    choice = input("Choose (1, 2, 3 or 4): ").strip()
 
-    if choice == "1":
+    if choice == "4":
+        room_id = requests.post(f"{ROOM_URL}/rooms").json()["roomId"]
+        resp = requests.post(f"{ROOM_URL}/rooms/{room_id}/join", json={"userId": user_id, "token": token})
+        if resp.status_code != 200:
+            print("Failed to join room:", resp.json().get("error", "Unknown"))
+            return
+        # The bot is a separate player process that joins the same room
+        subprocess.Popen([sys.executable, BOT_SCRIPT, "--room", str(room_id)],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f"Room {room_id}: waiting for the bot to join...")
+        while requests.get(f"{ROOM_URL}/rooms/{room_id}").json().get("status") != "full":
+            time.sleep(0.2)
+    elif choice == "3":
+        resp = requests.post(f"{ROOM_URL}/match", json={"userId": user_id, "token": token})
+        if resp.status_code not in (200, 202):
+            print("Matchmaking failed:", resp.json().get("error", "Unknown"))
+            return
+        print("Looking for an opponent...")
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        while resp.json()["status"] != "matched":
+            resp = requests.get(f"{ROOM_URL}/match/{user_id}", params={"wait": 30},
+                                headers=headers)
+            if resp.status_code == 404:
+                print("Matchmaking cancelled")
+                return
+        room_id = resp.json()["roomId"]
+        print(f"Matched with player {resp.json()['opponentId']} in room {room_id}")
+    elif choice == "1":
         resp = requests.post(f"{ROOM_URL}/rooms")
         if resp.status_code != 201:
             print("Failed to create room:", resp.json())
@@ -159,14 +325,15 @@ def main():
         except:
             print("Invalid room ID")
             return
-        resp = requests.post(f"{ROOM_URL}/rooms/{room_id}/join", json={"userId": user_id})
+        resp = requests.post(f"{ROOM_URL}/rooms/{room_id}/join", json={"userId": user_id, "token": token})
         if resp.status_code != 200:
             print("Failed to join room:", resp.json().get("error", "Unknown"))
             return
         print(f"Joined room {room_id}")
 
     # Join game via WebSocket
-    sio.emit('join-game', {'roomId': room_id, 'userId': user_id})
+    sio.emit('join-game', {'roomId': room_id, 'userId': user_id, 'token': token,
+                           'encoding': ENCODING})
 
     # Start game (only after both joined)
     print("Waiting for opponent...")
@@ -174,37 +341,58 @@ def main():
     if start_resp.status_code != 200:
         print("Could not start game:", start_resp.json())
         return
+    game_config = start_resp.json()
+    board_width = game_config.get("width", 5)
+    board_height = game_config.get("height", 5)
+    fleet = game_config.get("fleet", [2, 2])
+    my_board = new_board()
 
     # === SHIP PLACEMENT ===
-    print("\nPlace your 2 ships (each 2 cells, horizontal or vertical)")
+    if input(f"\nRandom fleet (lengths {fleet})? (y/n): ").strip().lower() == 'y':
+        sio.emit('place-ships', {'roomId': room_id, 'userId': user_id, 'token': token,
+                                 'random': True})
+        print("Waiting for opponent to place ships...")
+        sio.wait()
+        return
+    print(f"\nPlace your {len(fleet)} ships (lengths {fleet}, horizontal or vertical)")
+    print("Give each ship by its two end cells")
     ships = []
-    for ship_num in range(1, 3):
+    for ship_num, length in enumerate(fleet, 1):
         while True:
-            pos_input = input(f"Ship {ship_num} (x1 y1 x2 y2): ").strip()
+            pos_input = input(f"Ship {ship_num}, length {length} (x1 y1 x2 y2): ").strip()
             try:
                 x1, y1, x2, y2 = map(int, pos_input.split())
-                # Must be adjacent and in bounds
-                if (abs(x1 - x2) + abs(y1 - y2) == 1 and
-                    0 <= x1 < 5 and 0 <= x2 < 5 and
-                    0 <= y1 < 5 and 0 <= y2 < 5):
-                    ships.append([[x1, y1], [x2, y2]])
+                # Must be a straight line of the right length, in bounds
+                if ((x1 == x2 or y1 == y2) and
+                    abs(x1 - x2) + abs(y1 - y2) == length - 1 and
+                    0 <= x1 < board_width and 0 <= x2 < board_width and
+                    0 <= y1 < board_height and 0 <= y2 < board_height):
+                    cells = [[x, y]
+                             for x in range(min(x1, x2), max(x1, x2) + 1)
+                             for y in range(min(y1, y2), max(y1, y2) + 1)]
+                    if any(my_board[x][y] == 'S' for x, y in cells):
+                        print("Ships cannot overlap!")
+                        continue
+                    ships.append(cells)
                     # Mark on local board
-                    my_board[x1][y1] = 'S'
-                    my_board[x2][y2] = 'S'
+                    for x, y in cells:
+                        my_board[x][y] = 'S'
                     display_boards()
                     break
                 else:
-                    print("Ships must be adjacent (horizontal/vertical) and within 0–4!")
+                    print(f"Ship must be a straight line of {length} cells "
+                          f"within 0–{board_width - 1} x 0–{board_height - 1}!")
             except:
                 print("Enter 4 numbers: x1 y1 x2 y2")
 
     # Send ship positions to server
     all_positions = [pos for ship in ships for pos in ship]
-    sio.emit('place-ships', {
-        'roomId': room_id,
-        'userId': user_id,
-        'positions': all_positions
-    })
+    placement = {'roomId': room_id, 'userId': user_id, 'token': token}
+    if ENCODING == "packed":
+        placement['cells'] = pack_cells(all_positions)
+    else:
+        placement['positions'] = all_positions
+    sio.emit('place-ships', placement)
 
     print("Waiting for opponent to place ships...")
     sio.wait()
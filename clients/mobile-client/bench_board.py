@@ -0,0 +1,135 @@
+"""Board rendering: a Button per cell vs. one canvas (board.py).
+
+Run from this directory:  python bench_board.py [--frames 120] [--moves 1,20]
+(headless: SDL_VIDEODRIVER=offscreen python bench_board.py)
+For 10x10 and 50x50 boards: time to build a pair of boards (as at game
+start), then the time of each frame while --moves move updates arrive per
+frame, the way main.py used to apply them (two Clock callbacks per move,
+Button text and colour) and the way it does now (set_cell and set_status,
+drawn once per frame). Frames are drawn as fast as possible (maxfps 0);
+reported per frame: mean, p95 and max, in ms.
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+from kivy.config import Config
+
+Config.set('graphics', 'maxfps', '0')
+Config.set('graphics', 'width', '1000')
+Config.set('graphics', 'height', '520')
+Config.set('kivy', 'log_level', 'warning')
+
+from kivy.app import App
+from kivy.base import EventLoop
+from kivy.clock import Clock
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.label import Label
+
+from board import CanvasBoard
+
+SIZES = [10, 50]
+WARMUP_FRAMES = 10
+
+
+class ButtonBoard(GridLayout):
+    """The old board: one Button per cell."""
+    def __init__(self, width, height, **kwargs):
+        super().__init__(cols=height, **kwargs)
+        self.cells = {}
+        for i in range(width):
+            for j in range(height):
+                btn = Button(text='~', font_size=20, background_normal='', background_color=(0.1, 0.3, 0.5, 1))
+                btn.bind(on_press=lambda b, x=i, y=j: None)
+                self.add_widget(btn)
+                self.cells[(i, j)] = btn
+
+
+def old_move(app, board, x, y, hit):
+    marker = 'X' if hit else 'O'
+    color = (1, 0, 0, 1) if hit else (0.7, 0.7, 0.7, 1)
+    cell = board.cells[(x, y)]
+    Clock.schedule_once(lambda dt: [setattr(cell, 'text', marker), setattr(cell, 'background_color', color)])
+    Clock.schedule_once(lambda dt: setattr(app.status, 'text', "Opponent turn"))
+
+
+def new_move(app, board, x, y, hit):
+    board.set_cell(x, y, 'X' if hit else 'O')
+    app.set_status("Opponent turn")
+
+
+class BenchApp(App):
+    def __init__(self, args, **kwargs):
+        super().__init__(**kwargs)
+        self.args = args
+        self.results = []
+
+    def build(self):
+        self.root = BoxLayout(orientation='vertical')
+        self.status = Label(text='', size_hint_y=None, height=50)
+        self.status_text = ''
+        self.show_status = Clock.create_trigger(lambda dt: setattr(self.status, 'text', self.status_text))
+        self.boards = BoxLayout(spacing=20)
+        self.root.add_widget(self.status)
+        self.root.add_widget(self.boards)
+        Clock.schedule_once(self.run_all, 0)
+        return self.root
+
+    def set_status(self, text):
+        self.status_text = text
+        self.show_status()
+
+    def frame(self):
+        """Run one frame of the event loop; seconds taken."""
+        start = time.perf_counter()
+        EventLoop.idle()
+        return time.perf_counter() - start
+
+    def run_all(self, dt):
+        rng = random.Random(1)
+        for size in SIZES:
+            for name, make, move in (("buttons", lambda: ButtonBoard(size, size), old_move),
+                                     ("canvas", lambda: CanvasBoard(size, size), new_move)):
+                start = time.perf_counter()
+                boards = [make(), make()]
+                for board in boards:
+                    self.boards.add_widget(board)
+                self.frame()  # first layout and draw
+                build = time.perf_counter() - start
+                for _ in range(WARMUP_FRAMES):
+                    self.frame()
+                cells = [(x, y) for x in range(size) for y in range(size)]
+                for moves in self.args.moves:
+                    times = []
+                    for _ in range(self.args.frames):
+                        for _ in range(moves):
+                            x, y = rng.choice(cells)
+                            move(self, boards[1], x, y, rng.random() < 0.2)
+                        times.append(self.frame())
+                    self.results.append((f"{size}x{size}", name, build, moves, times))
+                self.boards.clear_widgets()
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--moves", type=lambda s: [int(n) for n in s.split(",")], default=[1, 20],
+                        help="move updates arriving per frame")
+    args = parser.parse_args()
+    app = BenchApp(args)
+    app.run()
+    print(f"{'board':8} {'widget':8} {'build':>9} {'moves':>6} {'mean':>7} {'p95':>7} {'max':>7}  (ms)")
+    for size, name, build, moves, times in app.results:
+        times = sorted(t * 1e3 for t in times)
+        mean = sum(times) / len(times)
+        p95 = times[int(0.95 * (len(times) - 1))]
+        print(f"{size:8} {name:8} {build * 1e3:9.1f} {moves:6} {mean:7.2f} {p95:7.2f} {times[-1]:7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Board widget drawn on one canvas.
+
+The cells are one texture with a pixel per cell, stretched over the
+widget without smoothing, with the grid lines as a single line mesh on
+top: three canvas instructions however big the board is, instead of a
+Button (and its own canvas, label and touch handling) per cell.
+
+set_cell() may be called from any thread, e.g. a Socket.IO handler. It
+only records the change and fires a Clock trigger, so however many moves
+arrive in one frame they are drawn together at the next frame: only the
+changed cells are blitted into the texture, then the canvas redraws once.
+
+Cells are addressed as in the game: x is the row (top to bottom), y the
+column (left to right). Touches are mapped to a cell here and passed to
+on_cell(board, x, y).
+"""
+import threading
+
+from kivy.clock import Clock
+from kivy.graphics import Color, Mesh, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.uix.widget import Widget
+
+# RGBA bytes per mark: water, ship, hit, miss, fired but not answered yet
+COLORS = {
+    '~': bytes((26, 77, 128, 255)),
+    'S': bytes((0, 204, 0, 255)),
+    'X': bytes((255, 0, 0, 255)),
+    'O': bytes((179, 179, 179, 255)),
+    '?': bytes((230, 230, 60, 255)),
+}
+GRID_COLOR = (0.05, 0.1, 0.2, 1)
+
+
+class CanvasBoard(Widget):
+    def __init__(self, width=5, height=5, on_cell=None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_cell = on_cell
+        self.lock = threading.Lock()
+        self.pending = {}  # (x, y) -> mark, drawn at the next frame
+        self.redraw = Clock.create_trigger(self.flush)
+        with self.canvas:
+            Color(1, 1, 1, 1)
+            self.rect = Rectangle()
+            Color(*GRID_COLOR)
+            self.grid = Mesh(mode='lines')
+        self.bind(pos=self.layout, size=self.layout)
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        """A new empty board of width rows and height columns (main thread)."""
+        self.rows, self.cols = width, height
+        self.marks = [['~'] * height for _ in range(width)]
+        with self.lock:
+            self.pending.clear()
+        texture = Texture.create(size=(height, width), colorfmt='rgba')
+        texture.mag_filter = 'nearest'
+        texture.blit_buffer(COLORS['~'] * (width * height), colorfmt='rgba', bufferfmt='ubyte')
+        self.rect.texture = texture
+        self.layout()
+
+    def clear(self):
+        self.resize(self.rows, self.cols)
+
+    def set_cell(self, x, y, mark):
+        with self.lock:
+            self.pending[(x, y)] = mark
+        self.redraw()
+
+    def mark(self, x, y):
+        with self.lock:
+            return self.pending.get((x, y), self.marks[x][y])
+
+    def flush(self, *args):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        texture = self.rect.texture
+        for (x, y), mark in pending.items():
+            if 0 <= x < self.rows and 0 <= y < self.cols:
+                self.marks[x][y] = mark
+                # Texture rows count from the bottom
+                texture.blit_buffer(COLORS[mark], pos=(y, self.rows - 1 - x), size=(1, 1),
+                                    colorfmt='rgba', bufferfmt='ubyte')
+        self.canvas.ask_update()
+
+    def layout(self, *args):
+        self.rect.pos, self.rect.size = self.pos, self.size
+        left, bottom = self.pos
+        width, height = self.size
+        vertices = []
+        for i in range(self.cols + 1):
+            x = left + width * i / self.cols
+            vertices += [x, bottom, 0, 0, x, bottom + height, 0, 0]
+        for j in range(self.rows + 1):
+            y = bottom + height * j / self.rows
+            vertices += [left, y, 0, 0, left + width, y, 0, 0]
+        self.grid.vertices = vertices
+        self.grid.indices = list(range(len(vertices) // 4))
+
+    def on_touch_down(self, touch):
+        if self.disabled or not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        y = min(self.cols - 1, int((touch.x - self.x) / self.width * self.cols))
+        x = min(self.rows - 1, int((self.top - touch.y) / self.height * self.rows))
+        if self.on_cell:
+            self.on_cell(self, x, y)
+        return True
@@ -1,60 +1,62 @@
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.gridlayout import GridLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
 from kivy.clock import Clock
+import base64
+import json
+import os
 import requests
 import socketio
+import struct
 import threading
 
+from board import CanvasBoard
+
 # === CONFIG ===
 USER_URL = "http://localhost:3001"
 ROOM_URL = "http://localhost:3002"
 GAME_URL = "http://localhost:3003"
 WS_URL = "http://localhost:3003"
+# "packed": binary frames, several events per message; "json": one event each
+ENCODING = os.environ.get("BATTLESHIP_ENCODING", "packed")
 
 sio = socketio.Client()
 user_id = None
+token = None  # signed session token from the user service
 username = None
 room_id = None
 my_board = [['~'] * 5 for _ in range(5)]
 opponent_board = [['~'] * 5 for _ in range(5)]
 placing = False
 ship_cells = []
+fleet_cells = 4  # total ship cells to place, from the game config
+
+def on_player_cell(board, x, y):
+    if placing and len(ship_cells) < fleet_cells and board.mark(x, y) == '~':
+        board.set_cell(x, y, 'S')
+        ship_cells.append([x, y])
+        if len(ship_cells) == fleet_cells:
+            placement = {'roomId': room_id, 'userId': user_id, 'token': token}
+            if ENCODING == "packed":
+                placement['cells'] = pack_cells(ship_cells)
+            else:
+                placement['positions'] = ship_cells
+            sio.emit('place-ships', placement)
+            App.get_running_app().set_status("Waiting for opponent...")
 
-class Board(GridLayout):
-    def __init__(self, is_player=True, **kwargs):
-        super().__init__(**kwargs)
-        self.cols = 5
-        self.is_player = is_player
-        self.cells = {}
-        for i in range(5):
-            for j in range(5):
-                btn = Button(text='~', font_size=20, background_normal='', background_color=(0.1, 0.3, 0.5, 1))
-                btn.bind(on_press=lambda b, x=i, y=j: self.on_cell_press(b, x, y))
-                self.add_widget(btn)
-                self.cells[(i, j)] = btn
-
-    def on_cell_press(self, btn, x, y):
-        if not self.is_player:
-            if btn.text == '~' and App.get_running_app().can_fire:
-                sio.emit('fire', {'roomId': room_id, 'userId': user_id, 'x': x, 'y': y})
-                btn.text = '?'
-        else:
-            if placing and len(ship_cells) < 4 and btn.text == '~':
-                btn.text = 'S'
-                btn.background_color = (0, 0.8, 0, 1)
-                ship_cells.append([x, y])
-                if len(ship_cells) == 4:
-                    sio.emit('place-ships', {'roomId': room_id, 'userId': user_id, 'positions': ship_cells})
-                    App.get_running_app().status.text = "Waiting for opponent..."
+def on_opponent_cell(board, x, y):
+    if board.mark(x, y) == '~' and App.get_running_app().can_fire:
+        sio.emit('fire', {'roomId': room_id, 'userId': user_id, 'token': token, 'x': x, 'y': y})
+        board.set_cell(x, y, '?')
 
 class BattleshipApp(App):
     def build(self):
         self.can_fire = False
+        self.status_text = ''
+        self.show_status = Clock.create_trigger(lambda dt: setattr(self.status, 'text', self.status_text))
         self.title = "Battleship Mobile"
 
         self.root = BoxLayout(orientation='vertical', padding=10, spacing=10)
@@ -87,8 +89,8 @@ class BattleshipApp(App):
         game_box.add_widget(self.status)
 
         boards = BoxLayout(spacing=20)
-        self.player_board = Board(is_player=True)
-        self.opponent_board = Board(is_player=False)
+        self.player_board = CanvasBoard(on_cell=on_player_cell)
+        self.opponent_board = CanvasBoard(on_cell=on_opponent_cell)
         boards.add_widget(self.player_board)
         boards.add_widget(self.opponent_board)
         game_box.add_widget(boards)
@@ -113,9 +115,10 @@ class BattleshipApp(App):
         try:
             resp = requests.post(f"{USER_URL}/{mode}", json={"username": name})
             if resp.status_code in (200, 201):
-                global user_id, username
+                global user_id, token, username
                 data = resp.json()
                 user_id = data["userId"]
+                token = data.get("token")
                 username = name
                 self.show_lobby()
                 self.connect_socket()
@@ -152,7 +155,7 @@ class BattleshipApp(App):
             rid = int(self.room_input.text)
             global room_id
             room_id = rid
-            resp = requests.post(f"{ROOM_URL}/rooms/{rid}/join", json={"userId": user_id})
+            resp = requests.post(f"{ROOM_URL}/rooms/{rid}/join", json={"userId": user_id, "token": token})
             if resp.status_code == 200:
                 self.start_game_flow()
             else:
@@ -166,40 +169,121 @@ class BattleshipApp(App):
         self.game_box.opacity = 1
         self.game_box.disabled = False
         self.status.text = "Waiting for opponent..."
-        sio.emit('join-game', {'roomId': room_id, 'userId': user_id})
-        requests.post(f"{GAME_URL}/games/{room_id}/start")
+        sio.emit('join-game', {'roomId': room_id, 'userId': user_id, 'token': token,
+                               'encoding': ENCODING})
+        resp = requests.post(f"{GAME_URL}/games/{room_id}/start")
+        if resp.status_code == 200:
+            global fleet_cells
+            config = resp.json()
+            width, height = config.get("width", 5), config.get("height", 5)
+            fleet_cells = sum(config.get("fleet", [2, 2]))
+            self.player_board.resize(width, height)
+            self.opponent_board.resize(width, height)
+
+    def set_status(self, text):
+        """Safe from any thread; shown at the next frame, last text wins."""
+        self.status_text = text
+        self.show_status()
 
     def popup(self, title, msg):
         Popup(title=title, content=Label(text=msg), size_hint=(0.8, 0.4)).open()
 
 # === SOCKET EVENTS ===
+# Handlers run on the Socket.IO thread: board cells and the status line are
+# only recorded here and drawn together at the next frame.
 @sio.on('joined')
 def on_joined(data):
-    Clock.schedule_once(lambda dt: setattr(BattleshipApp.get_running_app().status, 'text', 'Opponent joined!'))
+    BattleshipApp.get_running_app().set_status('Opponent joined!')
 
 @sio.on('game-ready')
 def on_ready(data):
     global placing
     placing = True
     ship_cells.clear()
-    Clock.schedule_once(lambda dt: BattleshipApp.get_running_app().status.update_text("Place 4 ship cells"))
+    BattleshipApp.get_running_app().set_status(f"Place {fleet_cells} ship cells")
 
 @sio.on('move-update')
 def on_move(data):
-    x, y, hit = data['x'], data['y'], data['hit']
-    marker = 'X' if hit else 'O'
-    color = (1, 0, 0, 1) if hit else (0.7, 0.7, 0.7, 1)
     app = BattleshipApp.get_running_app()
-    cell = app.opponent_board.cells[(x, y)]
-    Clock.schedule_once(lambda dt: [setattr(cell, 'text', marker), setattr(cell, 'background_color', color)])
-    turn_text = "Your turn!" if data['turn'] == user_id else "Opponent turn"
-    Clock.schedule_once(lambda dt: setattr(app.status, 'text', turn_text))
+    app.opponent_board.set_cell(data['x'], data['y'], 'X' if data['hit'] else 'O')
+    app.set_status("Your turn!" if data['turn'] == user_id else "Opponent turn")
     app.can_fire = data['turn'] == user_id
 
 @sio.on('game-over')
 def on_over(data):
     msg = "YOU WIN!" if data['winner'] == user_id else "You lost."
-    Clock.schedule_once(lambda dt: setattr(BattleshipApp.get_running_app().status, 'text', msg))
+    BattleshipApp.get_running_app().set_status(msg)
+
+@sio.on('error')
+def on_error(data):
+    app = BattleshipApp.get_running_app()
+    message = data.get('message', 'Error')
+    if message == 'Invalid ship placement':
+        # The server wants straight ships of the fleet's lengths; start over
+        for x, y in ship_cells:
+            app.player_board.set_cell(x, y, '~')
+        ship_cells.clear()
+        app.set_status("Invalid placement: place straight ships again")
+    else:
+        app.set_status(message)
+
+# === PACKED FRAMES (layout: services/game-rules-service/wire.py) ===
+FRAME_LAYOUTS = {
+    1: ('joined', '<II', ('roomId', 'yourId')),
+    2: ('ships-placed', '<I', ('userId',)),
+    3: ('game-ready', '<IHH', ('turn', 'width', 'height')),
+    4: ('move-update', '<HH?I', ('x', 'y', 'hit', 'turn')),
+    5: ('game-over', '<I', ('winner',)),
+}
+
+def decode_frame(frame):
+    """Yield (event, payload) for each message in a packed frame."""
+    data = base64.b64decode(frame)
+    offset = 0
+    while offset < len(data):
+        kind = data[offset]
+        offset += 1
+        if kind in FRAME_LAYOUTS:
+            event, layout, fields = FRAME_LAYOUTS[kind]
+            yield event, dict(zip(fields, struct.unpack_from(layout, data, offset)))
+            offset += struct.calcsize(layout)
+        elif kind == 6:  # error
+            (length,) = struct.unpack_from('<H', data, offset)
+            yield 'error', {'message': data[offset + 2:offset + 2 + length].decode()}
+            offset += 2 + length
+        elif kind == 7:  # salvo-update: turn, shot count, then x/y/hit per shot
+            turn, count = struct.unpack_from('<IH', data, offset)
+            offset += 6
+            shots = [[x, y, hit] for x, y, hit in struct.iter_unpack(
+                '<HH?', data[offset:offset + 5 * count])]
+            yield 'salvo-update', {'turn': turn, 'shots': shots}
+            offset += 5 * count
+        else:  # any other event, as JSON
+            name_length = data[offset]
+            name = data[offset + 1:offset + 1 + name_length].decode()
+            offset += 1 + name_length
+            (length,) = struct.unpack_from('<I', data, offset)
+            yield name, json.loads(data[offset + 4:offset + 4 + length])
+            offset += 4 + length
+
+def pack_cells(positions):
+    flat = [c for cell in positions for c in cell]
+    return base64.b64encode(struct.pack(f'<{len(flat)}H', *flat)).decode()
+
+@sio.on('frame')
+def on_frame(frame):
+    for event, payload in decode_frame(frame):
+        handler = FRAME_HANDLERS.get(event)
+        if handler:
+            handler(payload)
+
+FRAME_HANDLERS = {
+    'joined': on_joined,
+    'game-ready': on_ready,
+    'move-update': on_move,
+    'game-over': on_over,
+    'error': on_error,
+}
 
 if __name__ == '__main__':
     BattleshipApp().run()
\ No newline at end of file
@@ -1,7 +1,11 @@
 const socket = io('http://localhost:3003');
-let userId, username, roomId;
+let userId, username, roomId, token;
 let placingShips = false;
 let shipPositions = [];
+let boardWidth = 5, boardHeight = 5;
+let fleetCells = 4;
+// 'packed': binary frames, several events per message; 'json': one event each
+const ENCODING = 'packed';
 
 // DOM Elements
 const loginScreen = document.getElementById('login-screen');
@@ -28,7 +32,7 @@ function register() {
   })
   .then(r => r.json())
   .then(data => {
-    userId = data.userId; username = name;
+    userId = data.userId; username = name; token = data.token;
     loginScreen.classList.add('hidden');
     lobby.classList.remove('hidden');
     connectSocket();
@@ -46,7 +50,7 @@ function login() {
   })
   .then(r => r.json())
   .then(data => {
-    userId = data.userId; username = name;
+    userId = data.userId; username = name; token = data.token;
     loginScreen.classList.add('hidden');
     lobby.classList.remove('hidden');
     connectSocket();
@@ -56,7 +60,7 @@ function login() {
 
 // === SOCKET ===
 function connectSocket() {
-  socket.emit('join-game', { roomId: null, userId });
+  socket.emit('join-game', { roomId: null, userId, token });
 }
 
 // === ROOM ===
@@ -74,7 +78,7 @@ function joinRoom() {
   fetch(`${ROOM_URL}/rooms/${roomId}/join`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ userId })
+    body: JSON.stringify({ userId, token })
   })
   .then(r => r.json())
   .then(() => joinGame())
@@ -86,15 +90,17 @@ function joinGame() {
   game.classList.remove('hidden');
   renderBoard(playerBoard, true);
   renderBoard(opponentBoard, false);
-  socket.emit('join-game', { roomId, userId });
+  socket.emit('join-game', { roomId, userId, token, encoding: ENCODING });
   status.textContent = 'Waiting for opponent...';
 }
 
 // === BOARD ===
 function renderBoard(boardEl, isPlayer) {
   boardEl.innerHTML = '';
-  for (let i = 0; i < 5; i++) {
-    for (let j = 0; j < 5; j++) {
+  boardEl.style.gridTemplateColumns = `repeat(${boardHeight}, 50px)`;
+  boardEl.style.gridTemplateRows = `repeat(${boardWidth}, 50px)`;
+  for (let i = 0; i < boardWidth; i++) {
+    for (let j = 0; j < boardHeight; j++) {
       const cell = document.createElement('div');
       cell.classList.add('cell');
       cell.dataset.x = i;
@@ -110,7 +116,7 @@ function renderBoard(boardEl, isPlayer) {
 }
 
 function placeShip(x, y) {
-  if (!placingShips || shipPositions.length >= 4) return;
+  if (!placingShips || shipPositions.length >= fleetCells) return;
   const cell = playerBoard.querySelector(`[data-x="${x}"][data-y="${y}"]`);
   if (cell.classList.contains('ship')) return;
 
@@ -118,8 +124,11 @@ function placeShip(x, y) {
   cell.textContent = 'S';
   shipPositions.push([x, y]);
 
-  if (shipPositions.length === 4) {
-    socket.emit('place-ships', { roomId, userId, positions: shipPositions });
+  if (shipPositions.length === fleetCells) {
+    const placement = { roomId, userId, token };
+    if (ENCODING === 'packed') placement.cells = packCells(shipPositions);
+    else placement.positions = shipPositions;
+    socket.emit('place-ships', placement);
     placingShips = false;
     status.textContent = 'Waiting for opponent...';
   }
@@ -128,43 +137,134 @@ function placeShip(x, y) {
 function fire(x, y) {
   const cell = opponentBoard.querySelector(`[data-x="${x}"][data-y="${y}"]`);
   if (cell.textContent) return;
-  socket.emit('fire', { roomId, userId, x, y });
+  socket.emit('fire', { roomId, userId, token, x, y });
   cell.textContent = '?';
 }
 
 // === START GAME ===
 function startGame() {
-  fetch(`${GAME_URL}/games/${roomId}/start`, { method: 'POST' });
-  placingShips = true;
-  status.textContent = 'Place 4 ship cells (click on your board)';
-  startBtn.classList.add('hidden');
+  fetch(`${GAME_URL}/games/${roomId}/start`, { method: 'POST' })
+    .then(r => r.json())
+    .then(data => {
+      if (data.error) return alert(data.error);
+      boardWidth = data.width;
+      boardHeight = data.height;
+      fleetCells = data.fleet.reduce((a, b) => a + b, 0);
+      renderBoard(playerBoard, true);
+      renderBoard(opponentBoard, false);
+      placingShips = true;
+      status.textContent = `Place ${fleetCells} ship cells (click on your board)`;
+      startBtn.classList.add('hidden');
+    });
 }
 
 // === SOCKET EVENTS ===
-socket.on('joined', data => {
-  if (data.roomId === roomId) {
-    status.textContent = 'Opponent joined! Click "Start Game"';
-    startBtn.classList.remove('hidden');
+const handlers = {
+  'joined': data => {
+    if (data.roomId === roomId) {
+      status.textContent = 'Opponent joined! Click "Start Game"';
+      startBtn.classList.remove('hidden');
+    }
+  },
+
+  'ships-placed': () => {
+    status.textContent = 'Opponent placed ships...';
+  },
+
+  'game-ready': data => {
+    status.textContent = `Game started! ${data.turn === userId ? 'Your turn!' : 'Opponent turn'}`;
+  },
+
+  'move-update': data => {
+    const { x, y, hit, turn } = data;
+    const cell = opponentBoard.querySelector(`[data-x="${x}"][data-y="${y}"]`);
+    cell.textContent = hit ? 'X' : 'O';
+    cell.classList.add(hit ? 'hit' : 'miss');
+    status.textContent = turn === userId ? 'Your turn!' : 'Opponent turn';
+  },
+
+  'game-over': data => {
+    status.textContent = data.winner === userId ? 'YOU WIN!' : 'You lost.';
+    opponentBoard.querySelectorAll('.cell').forEach(c => c.onclick = null);
+  },
+
+  'error': data => {
+    if (data.message !== 'Invalid ship placement') return console.warn(data.message);
+    // The server wants straight ships of the fleet's lengths; start over
+    shipPositions = [];
+    renderBoard(playerBoard, true);
+    placingShips = true;
+    status.textContent = `Invalid placement: place ${fleetCells} cells as straight ships`;
   }
-});
+};
 
-socket.on('ships-placed', () => {
-  status.textContent = 'Opponent placed ships...';
-});
+Object.entries(handlers).forEach(([event, handler]) => socket.on(event, handler));
 
-socket.on('game-ready', data => {
-  status.textContent = `Game started! ${data.turn === userId ? 'Your turn!' : 'Opponent turn'}`;
+socket.on('frame', frame => {
+  decodeFrame(frame).forEach(([event, data]) => {
+    if (handlers[event]) handlers[event](data);
+  });
 });
 
-socket.on('move-update', data => {
-  const { x, y, hit, turn } = data;
-  const cell = opponentBoard.querySelector(`[data-x="${x}"][data-y="${y}"]`);
-  cell.textContent = hit ? 'X' : 'O';
-  cell.classList.add(hit ? 'hit' : 'miss');
-  status.textContent = turn === userId ? 'Your turn!' : 'Opponent turn';
-});
+// === PACKED FRAMES (layout: services/game-rules-service/wire.py) ===
+// type -> [event, [field, byte size] ...], little-endian unsigned fields
+const FRAME_LAYOUTS = {
+  1: ['joined', ['roomId', 4], ['yourId', 4]],
+  2: ['ships-placed', ['userId', 4]],
+  3: ['game-ready', ['turn', 4], ['width', 2], ['height', 2]],
+  4: ['move-update', ['x', 2], ['y', 2], ['hit', 1], ['turn', 4]],
+  5: ['game-over', ['winner', 4]]
+};
+
+function decodeFrame(frame) {
+  const bytes = Uint8Array.from(atob(frame), c => c.charCodeAt(0));
+  const view = new DataView(bytes.buffer);
+  const text = (start, length) => new TextDecoder().decode(bytes.subarray(start, start + length));
+  const messages = [];
+  let offset = 0;
+  while (offset < bytes.length) {
+    const kind = bytes[offset++];
+    if (FRAME_LAYOUTS[kind]) {
+      const [event, ...fields] = FRAME_LAYOUTS[kind];
+      const data = {};
+      for (const [name, size] of fields) {
+        data[name] = size === 4 ? view.getUint32(offset, true)
+                   : size === 2 ? view.getUint16(offset, true) : view.getUint8(offset);
+        offset += size;
+      }
+      if (kind === 4) data.hit = data.hit === 1;
+      messages.push([event, data]);
+    } else if (kind === 6) {
+      const length = view.getUint16(offset, true);
+      messages.push(['error', { message: text(offset + 2, length) }]);
+      offset += 2 + length;
+    } else if (kind === 7) {  // salvo-update: turn, shot count, then x/y/hit per shot
+      const turn = view.getUint32(offset, true);
+      const count = view.getUint16(offset + 4, true);
+      offset += 6;
+      const shots = [];
+      for (let i = 0; i < count; i++, offset += 5) {
+        shots.push([view.getUint16(offset, true), view.getUint16(offset + 2, true),
+                    bytes[offset + 4] === 1]);
+      }
+      messages.push(['salvo-update', { turn, shots }]);
+    } else {
+      const nameLength = bytes[offset];
+      const event = text(offset + 1, nameLength);
+      offset += 1 + nameLength;
+      const length = view.getUint32(offset, true);
+      messages.push([event, JSON.parse(text(offset + 4, length))]);
+      offset += 4 + length;
+    }
+  }
+  return messages;
+}
 
-socket.on('game-over', data => {
-  status.textContent = data.winner === userId ? 'YOU WIN!' : 'You lost.';
-  opponentBoard.querySelectorAll('.cell').forEach(c => c.onclick = null);
-});
\ No newline at end of file
+function packCells(positions) {
+  const view = new DataView(new ArrayBuffer(positions.length * 4));
+  positions.forEach(([x, y], i) => {
+    view.setUint16(i * 4, x, true);
+    view.setUint16(i * 4 + 2, y, true);
+  });
+  return btoa(String.fromCharCode(...new Uint8Array(view.buffer)));
+}
@@ -0,0 +1,135 @@
+"""Compare the multi-process HTTP deployment with the all-in-one process.
+
+For each mode: start the server(s), time until every port answers, then run
+the lobby flow (register x2, create room, join x2, start game) --rounds times
+and report per-request latency. join and start are the calls that make an
+inter-service request (loopback HTTP vs. in-process function call). The
+standalone services run as they normally do, under the debug servers.
+
+    python services/all-in-one/bench_modes.py --rounds 300
+"""
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MODES = {
+    "multi-process": {
+        "scripts": ["user-service", "room-service", "game-rules-service"],
+        "urls": {"user": "http://localhost:3001", "room": "http://localhost:3002",
+                 "game": "http://localhost:3003"},
+    },
+    "all-in-one": {
+        "scripts": ["all-in-one"],
+        "urls": {"user": "http://localhost:3000", "room": "http://localhost:3000",
+                 "game": "http://localhost:3000"},
+    },
+}
+# A cheap request per port that only succeeds once the app is serving
+PROBES = ["{user}/users/0", "{room}/rooms/0", "{game}/games/0/start"]
+
+
+def start(mode):
+    # The services need a shared session secret; a fresh one per run
+    env = dict(os.environ)
+    env.setdefault("SESSION_SECRET", secrets.token_hex(32))
+    procs = []
+    for name in MODES[mode]["scripts"]:
+        script = os.path.join(SERVICES_DIR, name, "server.py")
+        procs.append(subprocess.Popen([sys.executable, script], cwd=os.path.dirname(script), env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                      start_new_session=True))
+    return procs
+
+
+def wait_ready(session, urls, timeout=30):
+    deadline = time.monotonic() + timeout
+    for probe in PROBES:
+        url = probe.format(**urls)
+        while True:
+            try:
+                if probe.endswith("/start"):
+                    session.post(url, timeout=1)
+                else:
+                    session.get(url, timeout=1)
+                break
+            except requests.RequestException:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} not ready")
+                time.sleep(0.02)
+
+
+def stop(procs):
+    for proc in procs:
+        os.killpg(proc.pid, signal.SIGTERM)
+    for proc in procs:
+        proc.wait()
+
+
+def timed(samples, label, call):
+    start = time.perf_counter()
+    resp = call()
+    samples.setdefault(label, []).append(time.perf_counter() - start)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def run_flow(session, urls, samples, tag):
+    users = []
+    for n in range(2):
+        user = timed(samples, "POST /register", lambda: session.post(
+            f"{urls['user']}/register", json={"username": f"bench-{tag}-{n}"}))
+        users.append(user)
+    room_id = timed(samples, "POST /rooms",
+                    lambda: session.post(f"{urls['room']}/rooms"))["roomId"]
+    for user in users:
+        timed(samples, "POST /rooms/<id>/join", lambda: session.post(
+            f"{urls['room']}/rooms/{room_id}/join", json={"userId": user["userId"]}))
+    timed(samples, "POST /games/<id>/start",
+          lambda: session.post(f"{urls['game']}/games/{room_id}/start"))
+
+
+def bench(mode, rounds):
+    urls = MODES[mode]["urls"]
+    session = requests.Session()
+    began = time.perf_counter()
+    procs = start(mode)
+    try:
+        wait_ready(session, urls)
+        startup = time.perf_counter() - began
+        samples = {}
+        run_id = uuid.uuid4().hex[:8]
+        for i in range(rounds):
+            run_flow(session, urls, samples, f"{run_id}-{i}")
+    finally:
+        stop(procs)
+    return startup, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="multi-process vs all-in-one latency")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {mode: bench(mode, args.rounds) for mode in MODES}
+    print(f"{'':<34}" + "".join(f"{mode:>18}" for mode in results))
+    print(f"{'startup ms':<34}" + "".join(f"{r[0] * 1e3:>18.0f}" for r in results.values()))
+    labels = next(iter(results.values()))[1]
+    for label in labels:
+        cells = ""
+        for _, samples in results.values():
+            values = sorted(samples[label])
+            p50, p95 = values[len(values) // 2], values[int(len(values) * 0.95)]
+            cells += f"{f'{p50 * 1e3:.2f} / {p95 * 1e3:.2f}':>18}"
+        print(f"{label + ' p50/p95 ms':<34}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""All three services in one process.
+
+Mounts the user, room and game-rules Flask apps behind one port and points
+the inter-service clients (/users/<id>, /users/batch, /rooms/<id>) at the
+in-process apps, so those calls become function calls instead of loopback
+HTTP. The separate services on ports 3001-3003 keep working as before.
+
+    python services/all-in-one/server.py        # http://localhost:3000
+"""
+import importlib.util
+import os
+import sys
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PORT = int(os.environ.get("PORT", "3000"))
+
+# Routes owned by the user and room services; everything else, including
+# the Socket.IO endpoint, goes to the game-rules app.
+USER_PREFIXES = ("/register", "/login", "/users")
+ROOM_PREFIXES = ("/rooms", "/match")
+
+
+def load_service(name, module_name):
+    service_dir = os.path.join(SERVICES_DIR, name)
+    sys.path.insert(0, service_dir)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(service_dir, "server.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# game-rules-service first: in eventlet/gevent mode it monkey-patches before
+# Flask and requests are imported by the other two.
+game_service = load_service("game-rules-service", "game_rules_service")
+room_service = load_service("room-service", "room_service")
+user_service = load_service("user-service", "user_service")
+
+room_service.user_service.use_local(user_service.app)
+game_service.room_service.use_local(room_service.app)
+game_service.user_service.use_local(user_service.app)  # leaderboard names
+# Room evictions invalidate the game app's room cache on its internal port
+room_service.CACHE_SUBSCRIBERS = [f"http://127.0.0.1:{game_service.INTERNAL_PORT}"]
+
+
+class PathDispatcher:
+    def __init__(self, default, mounts):
+        self.default = default
+        self.mounts = mounts  # [(path prefixes, wsgi app)]
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        for prefixes, app in self.mounts:
+            if path.startswith(prefixes):
+                return app(environ, start_response)
+        return self.default(environ, start_response)
+
+
+app = game_service.app
+socketio = game_service.socketio
+app.wsgi_app = PathDispatcher(app.wsgi_app, [
+    (USER_PREFIXES, user_service.app),
+    (ROOM_PREFIXES, room_service.app),
+])
+
+if __name__ == '__main__':
+    game_service.check_secret("All-in-one server")
+    game_service.engine = game_service.create_engine()
+    room_service.start_evictor()
+    game_service.start_monitors()
+    game_service.start_internal()
+    mode = game_service.ASYNC_MODE
+    print(f"All-in-one Battleship server running on http://localhost:{PORT} ({mode})")
+    if mode == "eventlet":
+        socketio.run(app, port=PORT, log_output=False, max_size=game_service.WORKERS)
+    elif mode == "gevent":
+        socketio.run(app, port=PORT, log_output=False, spawn=game_service.WORKERS)
+    else:
+        # Same debug server as the standalone services, minus the reloader
+        socketio.run(app, port=PORT, debug=True, use_reloader=False, allow_unsafe_werkzeug=True)
@@ -0,0 +1,146 @@
+"""Instrumentation overhead: what metrics.py adds to each event and request.
+
+Run from this directory:  python bench_metrics.py [--ops 200000] [--threads 8]
+
+1. Histogram.observe through a cached child and through labels(...), and
+   Counter.inc, single-threaded and from --threads threads at once.
+2. A Socket.IO handler with and without instrument_socketio's wrapper.
+3. A Flask request through the test client with and without
+   instrument_app.
+4. Rendering /metrics with a realistic number of series.
+"""
+import argparse
+import threading
+import time
+
+from flask import Flask, jsonify
+
+from metrics import Registry, instrument_app, timed_handler
+
+
+def per_op(fn, ops):
+    start = time.perf_counter()
+    fn(ops)
+    return (time.perf_counter() - start) / ops
+
+
+def threaded(fn, ops, threads):
+    workers = [threading.Thread(target=fn, args=(ops // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / ops
+
+
+def bench_recording(ops, threads):
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "bench", ("event",))
+    counter = registry.counter("bench_total", "bench", ("event",))
+    child = histogram.labels("fire")
+
+    def cached(n):
+        for _ in range(n):
+            child.observe(0.0012)
+
+    def by_labels(n):
+        for _ in range(n):
+            histogram.labels("fire").observe(0.0012)
+
+    def count(n):
+        for _ in range(n):
+            counter.labels("fire").inc()
+
+    def empty(n):
+        for _ in range(n):
+            pass
+
+    loop = per_op(empty, ops)
+    rows = [("observe, cached child", cached), ("labels().observe", by_labels),
+            ("labels().inc", count)]
+    for name, fn in rows:
+        single = per_op(fn, ops) - loop
+        contended = threaded(fn, ops, threads) - loop
+        print(f"{name:<28}{single * 1e9:>10.0f}{contended * 1e9:>14.0f}")
+    assert sum(child.counts) == 2 * (ops + ops // threads * threads), "lost update"
+
+
+def bench_handler(ops):
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "bench", ("event",))
+    errors = registry.counter("bench_errors_total", "bench", ("event",))
+    in_flight = registry.gauge("bench_in_flight", "bench")
+
+    def handler(sid, data):
+        return None
+
+    wrapped = timed_handler(handler, histogram.labels("fire"), errors.labels("fire"),
+                            in_flight.labels())
+
+    def plain(n):
+        for _ in range(n):
+            handler("sid", None)
+
+    def timed(n):
+        for _ in range(n):
+            wrapped("sid", None)
+
+    return per_op(timed, ops) - per_op(plain, ops)
+
+
+def bench_flask(requests):
+    def make_app(instrumented):
+        app = Flask(__name__)
+
+        @app.route("/rooms/<int:room_id>", methods=["GET"])
+        def get_room(room_id):
+            return jsonify({"roomId": room_id, "status": "full"})
+
+        if instrumented:
+            instrument_app(app, Registry())
+        return app.test_client()
+
+    results = []
+    for instrumented in (False, True):
+        client = make_app(instrumented)
+        client.get("/rooms/1")
+        start = time.perf_counter()
+        for i in range(requests):
+            client.get(f"/rooms/{i}")
+        results.append((time.perf_counter() - start) / requests)
+    return results
+
+
+def bench_render(series):
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "bench", ("event",))
+    for i in range(series):
+        histogram.labels(f"event-{i}").observe(0.001)
+    start = time.perf_counter()
+    text = registry.render()
+    return time.perf_counter() - start, len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--series", type=int, default=50,
+                        help="histogram series in the /metrics render")
+    args = parser.parse_args()
+
+    print(f"{'ns per call':<28}{'1 thread':>10}{f'{args.threads} threads':>14}")
+    bench_recording(args.ops, args.threads)
+    print()
+    print(f"Socket.IO handler wrapper: +{bench_handler(args.ops) * 1e9:.0f} ns per event")
+    plain, instrumented = bench_flask(args.requests)
+    print(f"Flask request: {plain * 1e6:.1f} us plain, {instrumented * 1e6:.1f} us instrumented "
+          f"(+{(instrumented - plain) * 1e6:.1f} us)")
+    seconds, size = bench_render(args.series)
+    print(f"/metrics render, {args.series} histogram series: {seconds * 1e3:.2f} ms, {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
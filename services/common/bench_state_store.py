@@ -0,0 +1,150 @@
+"""Concurrency stress test for state_store: correctness and lock contention.
+
+Run from this directory:  python bench_state_store.py [--threads 16] [--ops 20000]
+
+1. Races: threads allocate ids and join rooms the way the old handlers did
+   (unlocked `next_id += 1`, unlocked check-then-set on a dict) and through
+   Counter / StripedStore, and count duplicate ids and double player2s.
+2. Contention: threads run read-modify-write updates on random keys under
+   one global lock and under 64 stripes, and report throughput and how
+   often a thread found its lock already held. The critical section
+   yields the GIL (--hold seconds of sleep), as a handler writing a journal
+   record or logging would.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from state_store import Counter, StripedLock, StripedStore
+
+
+class CountingLock:
+    """Lock that counts acquisitions that had to wait."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+
+    def __enter__(self):
+        if not self.lock.acquire(blocking=False):
+            self.contended += 1
+            self.lock.acquire()
+        self.acquired += 1
+
+    def __exit__(self, *exc):
+        self.lock.release()
+
+
+def run_threads(threads, target):
+    workers = [threading.Thread(target=target, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+# --- 1. Races ---
+def race_ids(threads, ops, safe):
+    counter = Counter()
+    state = {"next_id": 1}
+    issued = []
+
+    def work(_):
+        mine = []
+        for _ in range(ops):
+            if safe:
+                mine.append(counter.next())
+            else:
+                user_id = state["next_id"]
+                time.sleep(0)  # a handler doing anything else in between
+                state["next_id"] = user_id + 1
+                mine.append(user_id)
+        issued.extend(mine)
+
+    run_threads(threads, work)
+    return len(issued) - len(set(issued))
+
+
+def race_joins(threads, rooms, safe):
+    store = StripedStore()
+    for room_id in range(rooms):
+        store.set(room_id, {"player1_id": None, "player2_id": None, "status": "waiting"})
+    seated = [[] for _ in range(rooms)]
+
+    def join(room_id, user_id):
+        room = store.get(room_id)
+        if room["status"] == "full":
+            return
+        if room["player1_id"] is None:
+            time.sleep(0)
+            room["player1_id"] = user_id
+        elif room["player2_id"] is None:
+            time.sleep(0)
+            room["player2_id"] = user_id
+            room["status"] = "full"
+        else:
+            return
+        seated[room_id].append(user_id)
+
+    def work(n):
+        for room_id in range(rooms):
+            if safe:
+                with store.locked(room_id):
+                    join(room_id, n)
+            else:
+                join(room_id, n)
+
+    run_threads(threads, work)
+    return sum(1 for players in seated if len(players) > 2)
+
+
+# --- 2. Contention ---
+def contention(threads, ops, stripes, hold, keys=10000):
+    striped = StripedLock(stripes)
+    striped.locks = [CountingLock() for _ in range(stripes)]
+    counts = {}
+
+    def work(n):
+        rng = random.Random(n)
+        for _ in range(ops):
+            key = rng.randrange(keys)
+            with striped(key):
+                value = counts.get(key, 0)
+                time.sleep(hold)
+                counts[key] = value + 1
+
+    elapsed = run_threads(threads, work)
+    assert sum(counts.values()) == threads * ops, "lost update"
+    acquired = sum(lock.acquired for lock in striped.locks)
+    contended = sum(lock.contended for lock in striped.locks)
+    return threads * ops / elapsed, contended / acquired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=20000, help="operations per thread")
+    parser.add_argument("--hold", type=float, default=0.0,
+                        help="seconds slept inside each critical section")
+    args = parser.parse_args()
+    sys.setswitchinterval(1e-5)  # switch threads often to expose races
+
+    print(f"{args.threads} threads")
+    print(f"duplicate ids        unlocked {race_ids(args.threads, args.ops // 10, False):>6}"
+          f"   Counter      {race_ids(args.threads, args.ops // 10, True):>6}")
+    print(f"double-booked rooms  unlocked {race_joins(args.threads, 2000, False):>6}"
+          f"   StripedStore {race_joins(args.threads, 2000, True):>6}")
+    print()
+    print(f"{'locks':>6} {'ops/s':>10} {'contended':>10}")
+    for stripes in (1, 64):
+        rate, contended = contention(args.threads, args.ops, stripes, args.hold)
+        print(f"{stripes:>6} {rate:>10,.0f} {contended:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
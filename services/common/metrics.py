@@ -0,0 +1,309 @@
+"""Prometheus metrics without extra dependencies.
+
+Counters, gauges and histograms live in a Registry (REGISTRY by default)
+and metrics_blueprint() serves them as GET /metrics in the Prometheus text
+format. Recording is a dict lookup for the label values plus a short
+locked update, so it stays on in production (bench_metrics.py measures
+it). Asking a registry for a metric that already exists returns the
+existing one, so every app in the all-in-one process can set up the same
+HTTP metrics and they share one /metrics.
+
+    instrument_app(app)             # latency per route, requests in flight
+    instrument_socketio(socketio)   # latency and errors per event (call
+                                    # after the handlers are registered)
+    start_lag_monitor()             # event loop / thread scheduling lag
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Blueprint, Response, request
+
+# Seconds; handlers are usually sub-millisecond, inter-service calls a few ms
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_INTERVAL = 1.0  # seconds between event loop lag probes
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def label_text(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.children = {}  # label values -> child
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.new_child())
+        return child
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        return [f"{self.name}{label_text(self.labelnames, values)} {number(child.value)}"
+                for values, child in list(self.children.items())]
+
+
+class Gauge(Metric):
+    """A value that goes up and down. With fn, the value is read at scrape
+    time: fn() returns a number, or {label value(s): number} if the gauge
+    has labels."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def new_child(self):
+        return CounterChild()
+
+    def set(self, value):
+        self.labels().value = value
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().inc(-amount)
+
+    def render(self):
+        if self.fn is None:
+            items = [(values, child.value) for values, child in list(self.children.items())]
+        else:
+            value = self.fn()
+            if isinstance(value, dict):
+                items = [(key if isinstance(key, tuple) else (key,), v)
+                         for key, v in value.items()]
+            else:
+                items = [((), value)]
+        return [f"{self.name}{label_text(self.labelnames, values)} {number(value)}"
+                for values, value in items]
+
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(buckets)
+
+    def new_child(self):
+        return HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = []
+        for values, child in list(self.children.items()):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + number(bound) + '"'
+                lines.append(f"{self.name}_bucket"
+                             f"{label_text(self.labelnames, values, le)} {cumulative}")
+            labels = label_text(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}  # name -> Metric, in registration order
+        self.lock = threading.Lock()
+
+    def register(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=(), fn=None):
+        return self.register(Gauge, name, help, labelnames, fn)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram, name, help, labelnames, buckets)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            try:
+                samples = metric.render()
+            except Exception:  # a broken gauge callback must not hide the rest
+                continue
+            lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def metrics_blueprint(registry=REGISTRY):
+    bp = Blueprint("metrics", __name__)
+
+    @bp.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return bp
+
+
+# === INSTRUMENTATION ===
+def instrument_app(app, registry=REGISTRY):
+    """Time every request of a Flask app by route template (not path, so
+    ids don't create a series each) and serve /metrics on it."""
+    seconds = registry.histogram("battleship_http_request_duration_seconds",
+                                 "HTTP request latency by route",
+                                 ("method", "route", "status"))
+    in_flight = registry.gauge("battleship_http_requests_in_flight",
+                               "HTTP requests being handled")
+
+    @app.before_request
+    def start_timer():
+        request.environ["metrics.start"] = time.perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def record_status(response):
+        request.environ["metrics.status"] = response.status_code
+        return response
+
+    @app.teardown_request
+    def stop_timer(exc):
+        environ = request.environ
+        start = environ.pop("metrics.start", None)
+        if start is None:
+            return
+        in_flight.dec()
+        rule = request.url_rule
+        status = environ.get("metrics.status", 500)
+        seconds.labels(request.method, rule.rule if rule else "unmatched",
+                       str(status)).observe(time.perf_counter() - start)
+
+    app.register_blueprint(metrics_blueprint(registry))
+
+
+def instrument_socketio(socketio, namespace="/", registry=REGISTRY):
+    """Wrap every registered Socket.IO event handler with a timer. Handler
+    exceptions are counted and re-raised."""
+    seconds = registry.histogram("battleship_socketio_event_duration_seconds",
+                                 "Socket.IO event handler latency", ("event",))
+    errors = registry.counter("battleship_socketio_event_errors_total",
+                              "Socket.IO event handlers that raised", ("event",))
+    in_flight = registry.gauge("battleship_socketio_events_in_flight",
+                               "Socket.IO event handlers running")
+    handlers = socketio.server.handlers[namespace]
+    for event, handler in list(handlers.items()):
+        handlers[event] = timed_handler(handler, seconds.labels(event),
+                                        errors.labels(event), in_flight.labels())
+
+
+def timed_handler(handler, histogram, errors, in_flight):
+    def timed(*args):
+        start = time.perf_counter()
+        in_flight.inc()
+        try:
+            return handler(*args)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            in_flight.inc(-1)
+            histogram.observe(time.perf_counter() - start)
+    return timed
+
+
+def start_lag_monitor(start_task=None, sleep=time.sleep, registry=REGISTRY):
+    """Sample how late a LAG_INTERVAL sleep wakes up: time a ready green
+    thread (or, in threading mode, a runnable thread) waits to run. Growing
+    lag means the event loop or the GIL is saturated."""
+    lag = registry.gauge("battleship_event_loop_lag_seconds",
+                         "How late a periodic timer fired, last sample")
+
+    def probe():
+        while True:
+            start = time.perf_counter()
+            sleep(LAG_INTERVAL)
+            lag.set(max(0.0, time.perf_counter() - start - LAG_INTERVAL))
+
+    if start_task is None:
+        threading.Thread(target=probe, daemon=True).start()
+    else:
+        start_task(probe)
+
+
+def process_gauges(workers=0, registry=REGISTRY):
+    """Thread count and, for the async servers, the green thread pool
+    size to compare with requests and events in flight."""
+    registry.gauge("battleship_threads", "Live OS threads", fn=threading.active_count)
+    if workers:
+        registry.gauge("battleship_worker_pool_size",
+                       "Max concurrent green threads", fn=lambda: workers)
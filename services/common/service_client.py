@@ -0,0 +1,223 @@
+"""Pooled HTTP client for service-to-service calls.
+
+One ServiceClient per downstream service keeps a keep-alive connection pool,
+applies timeouts and retries idempotent GETs. In the all-in-one deployment
+use_local() points a client at the owning Flask app in the same process and
+calls its view functions directly instead of going over HTTP. Responses that callers mark as
+cacheable (facts that do not change, such as "user 5 exists" or "room 3 is
+full with players 5 and 6") are kept in a TTL/LRU cache. When the owning
+service changes or removes such data it calls notify_invalidate(), which
+POSTs to /internal/cache/invalidate on every subscriber, signed with
+SESSION_SECRET. Services with a public listener for browsers (the game
+server's Socket.IO port) serve that endpoint on a loopback-only port
+instead; see serve_internal().
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import requests
+from flask import Blueprint, jsonify, request
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from werkzeug.serving import make_server
+
+from metrics import REGISTRY
+from tokens import INTERNAL_SIGNATURE_HEADER, sign_internal, verify_internal
+
+ServiceResponse = namedtuple("ServiceResponse", "status_code data")
+
+
+class ServiceError(Exception):
+    """The downstream service could not be reached."""
+
+
+CALL_SECONDS = REGISTRY.histogram("battleship_service_call_duration_seconds",
+                                  "Inter-service call latency, cache misses only",
+                                  ("service", "method"))
+CALL_ERRORS = REGISTRY.counter("battleship_service_call_errors_total",
+                               "Inter-service calls that failed or returned 5xx",
+                               ("service", "method"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ServiceClient:
+    def __init__(self, name, base_url, timeout=2.0, retries=2, pool_size=64,
+                 cache_size=10000, cache_ttl=60.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.local_app = None
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.05,
+                      status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(["GET"]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path, cache_if=None):
+        """GET a JSON resource. If cache_if(status_code, data) is true the
+        response is cached under path until its TTL runs out or the owner
+        invalidates it."""
+        cached = self.cache.get(path)
+        if cached is not None:
+            return cached
+        resp = self.request("GET", path)
+        if cache_if is not None and cache_if(resp.status_code, resp.data):
+            self.cache.set(path, resp)
+        return resp
+
+    def post(self, path, json=None):
+        return self.request("POST", path, json=json)
+
+    def use_local(self, app):
+        """Serve requests from a Flask app in this process."""
+        self.local_app = app
+
+    def request(self, method, path, json=None):
+        start = time.perf_counter()
+        try:
+            if self.local_app is not None:
+                resp = self.local_request(method, path, json)
+            else:
+                resp = self.remote_request(method, path, json)
+        except Exception:
+            CALL_ERRORS.labels(self.name, method).inc()
+            raise
+        finally:
+            CALL_SECONDS.labels(self.name, method).observe(time.perf_counter() - start)
+        if resp.status_code >= 500:
+            CALL_ERRORS.labels(self.name, method).inc()
+        return resp
+
+    def remote_request(self, method, path, json=None):
+        try:
+            resp = self.session.request(method, self.base_url + path,
+                                        json=json, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ServiceError(f"{self.name} unavailable: {e}") from e
+        try:
+            data = resp.json()
+        except ValueError:
+            data = None
+        return ServiceResponse(resp.status_code, data)
+
+    def local_request(self, method, path, json=None):
+        app = self.local_app
+        with app.test_request_context(path, method=method, json=json):
+            if request.routing_exception is not None:
+                code = getattr(request.routing_exception, "code", 404)
+                return ServiceResponse(code, None)
+            rv = app.view_functions[request.url_rule.endpoint](**request.view_args)
+            resp = app.make_response(rv)
+        return ServiceResponse(resp.status_code, resp.get_json(silent=True))
+
+    def invalidate(self, path=None):
+        self.cache.invalidate(path)
+
+
+def invalidation_blueprint(*clients):
+    """Flask blueprint that lets owning services drop cached entries:
+    POST /internal/cache/invalidate {"service": "user-service", "paths": [...]}.
+    Omitting "paths" clears that service's whole cache. The body must be
+    signed (see notify_invalidate()), or anyone could flush the caches."""
+    by_name = {client.name: client for client in clients}
+    bp = Blueprint("service_cache", __name__)
+
+    @bp.route("/internal/cache/invalidate", methods=["POST"])
+    def invalidate():
+        body = request.get_data(as_text=True)
+        if not verify_internal(body, request.headers.get(INTERNAL_SIGNATURE_HEADER)):
+            return jsonify({"error": "Bad signature"}), 403
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request"}), 400
+        paths = data.get("paths")
+        if paths is not None and not (isinstance(paths, list)
+                                      and all(isinstance(path, str) for path in paths)):
+            return jsonify({"error": "Invalid request"}), 400
+        client = by_name.get(data.get("service"))
+        if client is None:
+            return jsonify({"error": "Unknown service"}), 404
+        if paths is None:
+            client.invalidate()
+        else:
+            for path in paths:
+                client.invalidate(path)
+        return jsonify({"message": "Invalidated"})
+
+    return bp
+
+
+def notify_invalidate(subscribers, service, paths):
+    """Tell subscriber services (base URLs) to drop cached paths. Runs in a
+    background thread and is best effort; the TTL bounds staleness if a
+    subscriber is down."""
+    body = json.dumps({"service": service, "paths": paths})
+    headers = {"Content-Type": "application/json",
+               INTERNAL_SIGNATURE_HEADER: sign_internal(body)}
+
+    def send():
+        for url in subscribers:
+            try:
+                requests.post(f"{url.rstrip('/')}/internal/cache/invalidate",
+                              data=body.encode(), headers=headers, timeout=1.0)
+            except requests.RequestException:
+                pass
+    threading.Thread(target=send, daemon=True).start()
+
+
+def serve_internal(app, port, start_task):
+    """Serve app on 127.0.0.1:port from a background task, for endpoints
+    only other services on this host call. The server's threads follow
+    the process's monkey-patching like everything else."""
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    start_task(server.serve_forever)
+    return server
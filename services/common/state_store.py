@@ -0,0 +1,122 @@
+"""Thread-safe in-memory state shared by the services.
+
+Flask and Socket.IO run handlers on many threads (or green threads), so
+check-then-set sequences on the users/rooms/games dicts need a lock. One
+global lock would serialise every request; StripedLock instead maps each
+key to one of a fixed number of locks, so updates to different keys
+proceed in parallel and only updates to the same key (or to keys that
+share a stripe) wait for each other. Single dict reads and writes are
+atomic in CPython, so plain lookups take no lock at all.
+"""
+import sys
+import threading
+from contextlib import contextmanager
+
+DEFAULT_STRIPES = 64
+
+
+class Counter:
+    """Atomic id allocator: every call to next() returns a new value."""
+
+    def __init__(self, start=1):
+        self.value = start
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            value = self.value
+            self.value += 1
+        return value
+
+
+class StripedLock:
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, key):
+        """The lock guarding key."""
+        return self.locks[hash(key) % len(self.locks)]
+
+    @contextmanager
+    def all(self):
+        """Hold every stripe, e.g. for a consistent snapshot. Acquired in
+        a fixed order, so two callers cannot deadlock each other."""
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
+
+
+class StripedStore:
+    """A dict whose read-modify-write sequences lock only the key's stripe.
+
+        with store.locked(key):
+            record = store.get(key)
+            ...  # check and update record
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self.data = {}
+        self.lock = StripedLock(stripes)
+
+    def locked(self, key):
+        return self.lock(key)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def add(self, key, value):
+        """Insert value unless key is present. Returns True if inserted."""
+        with self.lock(key):
+            if key in self.data:
+                return False
+            self.data[key] = value
+            return True
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def pop(self, key, default=None):
+        return self.data.pop(key, default)
+
+    def snapshot(self):
+        with self.lock.all():
+            return dict(self.data)
+
+    def values(self):
+        """A list copy of the values, in insertion order."""
+        return list(self.data.values())
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+
+def footprint(obj, seen=None):
+    """Approximate deep size of obj in bytes. Objects reachable twice (and
+    interned small ints and strings) are counted once."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(footprint(k, seen) + footprint(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(footprint(v, seen) for v in obj)
+    else:
+        for name in getattr(type(obj), "__slots__", ()):
+            size += footprint(getattr(obj, name, None), seen)
+    return size
+
+
+def sample(values, count=100):
+    """Up to count items spread evenly over values (a list)."""
+    step = max(1, len(values) // count)
+    return values[::step][:count]
@@ -0,0 +1,99 @@
+"""Stateless HMAC-signed session tokens.
+
+user-service issues "<userId>.<expires>.<signature>" on register/login.
+Any service holding the same SESSION_SECRET can verify a token locally,
+without calling user-service.
+
+There is no default secret: tokens signed with a published one could be
+forged by anyone. The services refuse to start without SESSION_SECRET
+(see check_secret()) unless SESSION_DEV_MODE=1 opts in to a fixed
+development secret. A bare userId is only trusted with
+REQUIRE_SESSION_TOKENS=0, also for development.
+
+The same secret signs internal service-to-service requests (see
+sign_internal()), so only the services can make them.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import time
+
+DEV_SECRET = "dev-secret-change-me"
+DEV_MODE = os.environ.get("SESSION_DEV_MODE") == "1"
+SESSION_SECRET = os.environ.get("SESSION_SECRET", DEV_SECRET if DEV_MODE else "").encode()
+SESSION_TTL = int(os.environ.get("SESSION_TTL", str(24 * 3600)))
+# Requests without a valid token are rejected; REQUIRE_SESSION_TOKENS=0
+# falls back to the client-supplied userId instead (development only).
+REQUIRE_TOKENS = os.environ.get("REQUIRE_SESSION_TOKENS", "1") != "0"
+INTERNAL_SIGNATURE_HEADER = "X-Internal-Signature"
+
+
+def check_secret(service):
+    """Call before serving: exits unless SESSION_SECRET is set, or warns
+    loudly in SESSION_DEV_MODE."""
+    if os.environ.get("SESSION_SECRET"):
+        pass
+    elif DEV_MODE:
+        print(f"WARNING: {service} signs session tokens with the public development "
+              f"secret; anyone can forge them. Set SESSION_SECRET outside development.",
+              file=sys.stderr)
+    else:
+        sys.exit(f"{service}: set SESSION_SECRET (the same in every service), "
+                 f"or SESSION_DEV_MODE=1 for local development")
+    if not REQUIRE_TOKENS:
+        print(f"WARNING: {service} accepts a bare userId without a session token "
+              f"(REQUIRE_SESSION_TOKENS=0).", file=sys.stderr)
+
+
+def _sign(payload, secret):
+    digest = hmac.new(secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def issue_token(user_id, secret=SESSION_SECRET, ttl=SESSION_TTL):
+    payload = f"{user_id}.{int(time.time()) + ttl}"
+    return f"{payload}.{_sign(payload, secret)}"
+
+
+def verify_token(token, secret=SESSION_SECRET):
+    """Return the user id a token was issued for, or None if the token is
+    malformed, forged or expired."""
+    if not isinstance(token, str):
+        return None
+    payload, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature.encode(), _sign(payload, secret).encode()):
+        return None
+    user_id, _, expires = payload.partition(".")
+    try:
+        if int(expires) < time.time():
+            return None
+        return int(user_id)
+    except ValueError:
+        return None
+
+
+def sign_internal(body, secret=SESSION_SECRET):
+    """Signature for the body of an internal request, sent in the
+    INTERNAL_SIGNATURE_HEADER. Prefixed so that it can never pass as a
+    session token's signature, nor a token's as a body's."""
+    return _sign(f"internal:{body}", secret)
+
+
+def verify_internal(body, signature, secret=SESSION_SECRET):
+    if not isinstance(signature, str):
+        return False
+    return hmac.compare_digest(signature.encode(), sign_internal(body, secret).encode())
+
+
+def authenticate(data):
+    """User id for a request or socket event body: taken from a verified
+    "token" when one is sent, otherwise the plain "userId" unless tokens are
+    required. None means the caller is not authenticated."""
+    token = data.get("token")
+    if token is not None:
+        return verify_token(token)
+    if REQUIRE_TOKENS:
+        return None
+    return data.get("userId")
@@ -0,0 +1,138 @@
+"""Micro-benchmark: list-of-lists board engine vs. BitBoard.
+
+Run from this directory:  python bench_board.py [--games N] [--large]
+Each "game" places 4 ship cells on a 5x5 board and fires at every cell,
+checking for a win after each shot, like on_fire does. --large also times
+fleet placement and firing on a 1000x1000 sparse board.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from board import BitBoard, create_board
+
+POSITIONS = [[0, 0], [0, 1], [2, 2], [3, 2]]
+SHOTS = [(x, y) for x in range(5) for y in range(5)]
+
+
+# --- Previous engine, kept here as the baseline ---
+EMPTY, SHIP, HIT, MISS = 0, 1, 2, 3
+
+def list_create_board():
+    return [[EMPTY for _ in range(5)] for _ in range(5)]
+
+def list_is_valid_placement(board, positions):
+    for x, y in positions:
+        if not (0 <= x < 5 and 0 <= y < 5) or board[x][y] != EMPTY:
+            return False
+    return True
+
+def list_place_ship(board, positions):
+    for x, y in positions:
+        board[x][y] = SHIP
+
+def list_fire(board, x, y):
+    if board[x][y] == SHIP:
+        board[x][y] = HIT
+        return True
+    elif board[x][y] == EMPTY:
+        board[x][y] = MISS
+        return False
+    return None
+
+def list_all_ships_sunk(board):
+    return all(cell != SHIP for row in board for cell in row)
+
+
+def play_list():
+    board = list_create_board()
+    if list_is_valid_placement(board, POSITIONS):
+        list_place_ship(board, POSITIONS)
+    for x, y in SHOTS:
+        list_fire(board, x, y)
+        if list_all_ships_sunk(board):
+            return
+
+
+def play_bitboard():
+    board = BitBoard()
+    if board.is_valid_placement(POSITIONS):
+        board.place_ships(POSITIONS)
+    for x, y in SHOTS:
+        board.fire(x, y)
+        if board.all_ships_sunk():
+            return
+
+
+def timed(play, games):
+    start = time.perf_counter()
+    for _ in range(games):
+        play()
+    return time.perf_counter() - start
+
+
+def board_bytes(create, count=1000):
+    tracemalloc.start()
+    boards = [create() for _ in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del boards
+    return size / count
+
+
+def bench_large(size=1000, ships=500, length=5):
+    # One ship every other row/column block so the fleet never overlaps
+    fleet = [[[2 * (i % (size // 2)), 10 * (i // (size // 2)) + k] for k in range(length)]
+             for i in range(ships)]
+    positions = [cell for ship in fleet for cell in ship]
+
+    board = create_board(size, size)
+    start = time.perf_counter()
+    valid = board.is_valid_placement(positions)
+    validate = time.perf_counter() - start
+    board.place_ships(positions)
+
+    start = time.perf_counter()
+    for x, y in positions:
+        board.fire(x, y)
+        board.all_ships_sunk()
+    per_shot = (time.perf_counter() - start) / len(positions)
+
+    tracemalloc.start()
+    board = create_board(size, size)
+    board.place_ships(positions)
+    for x, y in positions:
+        board.fire(x, y)
+    size_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"\n{size}x{size} {type(board).__name__}, {ships} ships x {length} cells")
+    print(f"placement valid={valid} in {validate * 1e3:.3f} ms, "
+          f"fire+win check {per_shot * 1e6:.2f} us/shot, "
+          f"sunk={board.all_ships_sunk()}, {size_bytes:,} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--large", action="store_true")
+    args = parser.parse_args()
+
+    print(f"python {sys.version.split()[0]}, {args.games} games per engine")
+    print(f"{'engine':<10}{'games/s':>12}{'us/shot':>10}{'bytes/board':>14}")
+    for name, play, create in (
+        ("list", play_list, list_create_board),
+        ("bitboard", play_bitboard, BitBoard),
+    ):
+        elapsed = timed(play, args.games)
+        # Both engines stop at the same shot, so shots/game is shared.
+        shots = args.games * (SHOTS.index((3, 2)) + 1)
+        print(f"{name:<10}{args.games / elapsed:>12,.0f}"
+              f"{elapsed / shots * 1e6:>10.2f}{board_bytes(create):>14,.0f}")
+    if args.large:
+        bench_large()
+
+
+if __name__ == "__main__":
+    main()
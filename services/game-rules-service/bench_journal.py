@@ -0,0 +1,95 @@
+"""Journal benchmark: write overhead per fire and recovery time.
+
+Run from this directory:  python bench_journal.py [--games 100000]
+Plays --games games (placement plus --shots shots each) with and without a
+journal, then times recovery from the journal alone and from a snapshot
+plus a journal tail.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from engine import GameEngine
+from journal import Journal
+
+POSITIONS = [[0, 0], [0, 1], [2, 2], [3, 2]]
+SHOTS = [(4, 4), (4, 4), (4, 3), (4, 3), (4, 2), (4, 2), (4, 1), (4, 1)]
+
+
+def setup(engine, games):
+    for room_id in range(games):
+        room = {"player1_id": 2 * room_id + 1, "player2_id": 2 * room_id + 2, "status": "full"}
+        engine.start(room_id, room, 5, 5, [2, 2])
+        engine.place_ships(room_id, 2 * room_id + 1, POSITIONS)
+        engine.place_ships(room_id, 2 * room_id + 2, POSITIONS)
+
+
+def play(engine, games, shots):
+    """Fire shots alternately in every game; returns seconds per fire."""
+    start = time.perf_counter()
+    for room_id in range(games):
+        players = (2 * room_id + 1, 2 * room_id + 2)
+        for n, (x, y) in enumerate(SHOTS[:shots]):
+            engine.fire(room_id, players[n % 2], x, y)
+    return (time.perf_counter() - start) / (games * shots)
+
+
+def recover(directory):
+    start = time.perf_counter()
+    engine = GameEngine(Journal(directory, snapshot_every=10 ** 9))
+    journal, engine.journal = engine.journal, None
+    replayed = journal.recover(engine)
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return elapsed, replayed, len(engine.games) + len(engine.finished)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--shots", type=int, default=len(SHOTS))
+    args = parser.parse_args()
+
+    baseline = GameEngine()
+    setup(baseline, args.games)
+    plain = play(baseline, args.games, args.shots)
+
+    directory = tempfile.mkdtemp(prefix="battleship-journal-")
+    try:
+        journal = Journal(directory, snapshot_every=10 ** 9)
+        engine = GameEngine(journal)
+        setup(engine, args.games)
+        logged = play(engine, args.games, args.shots)
+        journal.close()
+        print(f"{args.games} games, {args.shots} shots each")
+        print(f"fire without journal   {plain * 1e6:8.2f} us")
+        print(f"fire with journal      {logged * 1e6:8.2f} us  "
+              f"(+{(logged - plain) * 1e6:.2f} us, fsync batched every "
+              f"{journal.fsync_interval * 1e3:.0f} ms)")
+
+        elapsed, replayed, games = recover(directory)
+        print(f"recover, journal only  {elapsed:8.2f} s   ({replayed} records, {games} games)")
+
+        # Snapshot everything, then add a tail of one more shot per game
+        journal = Journal(directory, snapshot_every=10 ** 9)
+        engine = GameEngine(journal)
+        engine.recover()
+        start = time.perf_counter()
+        journal.snapshot(engine.state())
+        snapshot_time = time.perf_counter() - start
+        for room_id in range(args.games):
+            engine.fire(room_id, 2 * room_id + 1, 3, 3)
+        journal.close()
+        elapsed, replayed, games = recover(directory)
+        print(f"snapshot write         {snapshot_time:8.2f} s")
+        print(f"recover, snapshot+tail {elapsed:8.2f} s   ({replayed} records, {games} games)")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
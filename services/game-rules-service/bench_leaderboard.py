@@ -0,0 +1,69 @@
+"""Leaderboard benchmark: sorted index vs. sorting the players per read.
+
+Run from this directory:  python bench_leaderboard.py [--players 1000000] [--games 2000000]
+Records --games random results between --players players into a
+Leaderboard (leaderboard.py), then times per call: recording a game, the
+top 20, a page of 20 deep in the ranking and one player's rank, against
+doing the same reads by sorting every player's stats (what a leaderboard
+computed on request from the totals would cost). Recording is timed over
+the last 100k games.
+"""
+import argparse
+import random
+import time
+
+from leaderboard import Leaderboard, rank_key
+
+TIMED_GAMES = 100000  # the last games, recorded with the clock running
+
+
+def results(players, games, rng):
+    for _ in range(games):
+        a, b = rng.randrange(players), rng.randrange(players)
+        shots = rng.randrange(30, 90)
+        yield {"winner": a, "shots": shots,
+               "players": [[a, shots // 2, 17], [b, shots - shots // 2, rng.randrange(17)]]}
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000000)
+    parser.add_argument("--games", type=int, default=2000000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+    board = Leaderboard()
+    for result in results(args.players, args.games - TIMED_GAMES, rng):
+        board.record(result)
+    timed_results = list(results(args.players, TIMED_GAMES, rng))
+    start = time.perf_counter()
+    for result in timed_results:
+        board.record(result)
+    record = (time.perf_counter() - start) / TIMED_GAMES
+    ranked = len(board.players)
+    middle = ranked // 2
+    user_id = board.page(middle, 1)[1][0][1]
+
+    def sorted_players():
+        return sorted(rank_key(u, s) for u, s in board.players.items())
+
+    print(f"{ranked} ranked players, {args.games} games")
+    print(f"{'call':24} {'index us':>12} {'sort us':>12}")
+    print(f"{'record a game':24} {record * 1e6:12.2f} {'-':>12}")
+    for name, indexed, naive in (
+            ("top 20", lambda: board.page(0, 20), lambda: sorted_players()[:20]),
+            (f"20 at rank {middle}", lambda: board.page(middle, 20),
+             lambda: sorted_players()[middle:middle + 20]),
+            ("rank of a player", lambda: board.player(user_id),
+             lambda: sorted_players().index(rank_key(user_id, board.players[user_id])))):
+        print(f"{name:24} {timed(indexed, 1000) * 1e6:12.2f} {timed(naive, 3) * 1e6:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Placement tables: cost of full fleet validation and random fleets.
+
+Run from this directory:  python bench_placement.py [--rounds 2000]
+For each board size and fleet: time to build the tables (first use), then
+per fleet the old check (bounds and overlap only, board.is_valid_placement)
+vs. the full check (shapes, lengths, no-touch), both over the same
+FLEETS random legal fleets, and random legal fleets from the tables vs.
+drawing ships cell by cell into a set.
+"""
+import argparse
+import random
+import time
+
+from board import create_board
+from placement import FleetTable
+
+CLASSIC = [5, 4, 3, 3, 2]
+CONFIGS = [
+    ("5x5 default", 5, 5, [2, 2], False),
+    ("10x10 classic", 10, 10, CLASSIC, False),
+    ("10x10 no-touch", 10, 10, CLASSIC, True),
+    ("32x32 x8 fleets", 32, 32, CLASSIC * 8, False),
+    ("1000x1000 x20", 1000, 1000, CLASSIC * 20, False),
+    ("1000x1000 x100", 1000, 1000, CLASSIC * 100, False),
+    ("1000x1000 x200", 1000, 1000, CLASSIC * 200, False),
+]
+FLEETS = 10
+
+
+def set_fleet(width, height, fleet, rng):
+    """The clients' way: random straight ships, checked cell by cell."""
+    taken = set()
+    for length in fleet:
+        while True:
+            if rng.random() < 0.5 and length <= width:
+                x, y, dx, dy = rng.randrange(width - length + 1), rng.randrange(height), 1, 0
+            else:
+                x, y, dx, dy = rng.randrange(width), rng.randrange(height - length + 1), 0, 1
+            cells = [(x + dx * i, y + dy * i) for i in range(length)]
+            if not taken.intersection(cells):
+                taken.update(cells)
+                break
+    return [list(cell) for cell in taken]
+
+
+def per_call(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+    print(f"{'config':18} {'build':>9} {'old check':>11} {'full check':>11} "
+          f"{'random fleet':>13} {'set fleet':>10}")
+    for name, width, height, fleet, no_touch in CONFIGS:
+        rounds = args.rounds if width * height <= 1024 else max(1, args.rounds // 100)
+        start = time.perf_counter()
+        table = FleetTable(width, height, fleet, no_touch)
+        fleets = [table.random_fleet(rng)]  # builds the tables it needs
+        build = (time.perf_counter() - start) * 1e3
+        fleets += [table.random_fleet(rng) for _ in range(FLEETS - 1)]
+        assert all(table.is_valid(positions) for positions in fleets)
+        board = create_board(width, height)
+        passes = max(1, rounds // FLEETS)
+        old = per_call(lambda: [board.is_valid_placement(p) for p in fleets], passes) / FLEETS
+        full = per_call(lambda: [table.is_valid(p) for p in fleets], passes) / FLEETS
+        drawn = per_call(lambda: table.random_fleet(rng), rounds)
+        by_set = "-" if no_touch else \
+            f"{per_call(lambda: set_fleet(width, height, fleet, rng), rounds):8.1f}us"
+        print(f"{name:18} {build:7.1f}ms {old:9.1f}us {full:9.1f}us {drawn:11.1f}us {by_set:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Rate limit benchmark: cost on the hot path, and cost of a flood.
+
+Run from this directory:  python bench_ratelimit.py [--games 100] [--flood 5000]
+Drives server.py's real Socket.IO handlers through Flask-SocketIO's test
+client (packet decode, limiter, token check, engine, encode; no network).
+Reports per event:
+  - RateLimiter.allow() alone, for a bucket that has tokens;
+  - fire events of --games random 10x10 games with the limits off and
+    with every event going through both buckets (rates set so none is
+    refused);
+  - --flood resync events (a full snapshot of a half-played 50x50 game
+    each) sent as fast as possible by one connection: all answered with
+    the limits off, all but a burst refused with an error by the
+    connection's bucket with the defaults.
+The test client's own packet handling is in every figure; allow() is the
+limiter's whole cost on an event it lets through.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from ratelimit import RateLimiter
+from tokens import issue_token
+
+import server
+
+PLAYERS = (1, 2)
+TOKENS = {user_id: issue_token(user_id) for user_id in PLAYERS}
+
+
+def set_limits(rate, user_rate):
+    server.connection_limiter.rate = rate
+    server.user_limiter.rate = user_rate
+    server.connection_limiter.buckets.clear()
+    server.user_limiter.buckets.clear()
+
+
+def connect():
+    return {user_id: server.socketio.test_client(server.app) for user_id in PLAYERS}
+
+
+def play(clients, room_id, rng):
+    """One game; returns (seconds in fire events, fire events)."""
+    server.engine.start(room_id, {"player1_id": 1, "player2_id": 2, "status": "full"},
+                        10, 10, [5, 4, 3, 3, 2])
+    for user_id, client in clients.items():
+        auth = {"roomId": room_id, "userId": user_id, "token": TOKENS[user_id]}
+        client.emit("join-game", auth)
+        client.emit("place-ships", dict(auth, random=True))
+        client.get_received()
+    targets = {}
+    for user_id in PLAYERS:
+        targets[user_id] = [(x, y) for x in range(10) for y in range(10)]
+        rng.shuffle(targets[user_id])
+    turn, elapsed, events = 1, 0.0, 0
+    while True:
+        x, y = targets[turn].pop()
+        start = time.perf_counter()
+        clients[turn].emit("fire", {"roomId": room_id, "userId": turn, "token": TOKENS[turn],
+                                    "x": x, "y": y})
+        elapsed += time.perf_counter() - start
+        events += 1
+        received = clients[turn].get_received()
+        clients[3 - turn].get_received()
+        event = received[-1]
+        if event["name"] == "game-over":
+            return elapsed, events
+        if event["name"] != "move-update":
+            raise RuntimeError(event)
+        turn = event["args"][0]["turn"]
+
+
+def games(first_room, count, rng):
+    clients = connect()
+    elapsed = events = 0
+    for room_id in range(first_room, first_room + count):
+        seconds, fired = play(clients, room_id, rng)
+        elapsed += seconds
+        events += fired
+    return elapsed / events
+
+
+def flood(count, room_id, rng):
+    """Player 2 asks for a resync snapshot of a half-played 50x50 game
+    count times, as fast as the server answers. Returns (seconds per
+    event, {event name: count} of the last answers)."""
+    server.engine.start(room_id, {"player1_id": 1, "player2_id": 2, "status": "full"},
+                        50, 50, [5, 4, 3, 3, 2] * 4)
+    for user_id in PLAYERS:
+        server.engine.place_ships(room_id, user_id, None)
+    cells = [(x, y) for x in range(50) for y in range(50)]
+    rng.shuffle(cells)
+    turn = 1
+    for x, y in cells[:1250]:
+        event, payload, _ = server.engine.fire(room_id, turn, x, y)[0]
+        turn = payload["turn"]
+    flooder = server.socketio.test_client(server.app)
+    data = {"roomId": room_id, "userId": 2, "token": TOKENS[2]}
+    answers = {}
+    start = time.perf_counter()
+    for i in range(count):
+        flooder.emit("resync", data)
+        if i % 1000 == 999 or i == count - 1:
+            answers = {}
+            for event in flooder.get_received():
+                answers[event["name"]] = answers.get(event["name"], 0) + 1
+    return (time.perf_counter() - start) / count, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--flood", type=int, default=5000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    limiter = RateLimiter(1e9, 1e9)
+    count = 1000000
+    start = time.perf_counter()
+    for _ in range(count):
+        limiter.allow("sid")
+    allow = (time.perf_counter() - start) / count
+    print(f"{'case':40} {'us/event':>9}")
+    print(f"{'allow(), one bucket':40} {allow * 1e6:9.3f}")
+
+    set_limits(0, 0)
+    off = games(100, args.games, rng)
+    set_limits(1e9, 1e9)
+    on = games(100 + args.games, args.games, rng)
+    print(f"{'fire, limits off':40} {off * 1e6:9.2f}")
+    print(f"{'fire, connection + user buckets':40} {on * 1e6:9.2f}")
+
+    for name, rate in (("limits off", 0), (f"limits {server.RATE_LIMIT:g}/s", server.RATE_LIMIT)):
+        set_limits(rate, server.USER_RATE_LIMIT if rate else 0)
+        seconds, answers = flood(args.flood, 10 ** 6 + len(name), rng)
+        print(f"{'resync flood, ' + name:40} {seconds * 1e6:9.2f}  last 1000: {answers}")
+    print(f"refused: {server.limit_stats()['connection']['rejected']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Reconnect storm benchmark: resync by delta vs. full snapshot.
+
+Run from this directory:  python bench_resync.py [--games 200] [--size 20] [--missed 1,5,20]
+Plays --games games on a --size board part way (half the cells fired on
+average), then has both players of every game reconnect at once, having
+missed the last N events. Reports time per resync in the engine and the
+JSON bytes sent per reconnect when the client sends its last version
+(delta) vs. when it cannot (snapshot, the whole game so far).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from bench_spectators import start_game
+from engine import GameEngine
+
+
+def setup(games, size, rng):
+    """Games cut off at a random point; returns engine and {room: version}."""
+    engine = GameEngine()
+    versions = {}
+    for room_id in range(1, games + 1):
+        _, shots, turn = start_game(engine, room_id, rng, size, size)
+        for _ in range(rng.randrange(size * size)):
+            x, y = shots[turn].pop()
+            event, payload, _ = engine.fire(room_id, turn, x, y)[0]
+            if event == "game-over":
+                break
+            turn = payload["turn"]
+        versions[room_id] = engine.sync(room_id)["version"]
+    return engine, versions
+
+
+def storm(engine, versions, missed):
+    """Every player resyncs once. Returns (seconds per resync, bytes each)."""
+    sent = count = 0
+    start = time.perf_counter()
+    for room_id, current in versions.items():
+        since = None if missed is None else max(0, current - missed)
+        for user_id in (1, 2):
+            event, payload, _ = engine.resync(room_id, user_id, since)[0]
+            sent += len(json.dumps(payload, separators=(",", ":")))
+            count += 1
+    return (time.perf_counter() - start) / count, sent / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--size", type=int, default=20, help="board width and height")
+    parser.add_argument("--missed", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[1, 5, 20])
+    args = parser.parse_args()
+    engine, versions = setup(args.games, args.size, random.Random(1))
+    mean = sum(versions.values()) / len(versions)
+    print(f"{args.games} games on {args.size}x{args.size}, mean version {mean:.0f}, "
+          f"{2 * args.games} reconnects per storm")
+    print(f"{'resync':18} {'us each':>9} {'bytes each':>11}")
+    for missed in args.missed:
+        seconds, size = storm(engine, versions, missed)
+        print(f"{f'delta, missed {missed}':18} {seconds * 1e6:9.1f} {size:11.0f}")
+    seconds, size = storm(engine, versions, None)
+    print(f"{'snapshot':18} {seconds * 1e6:9.1f} {size:11.0f}")
+
+
+if __name__ == "__main__":
+    main()
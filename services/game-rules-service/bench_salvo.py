@@ -0,0 +1,123 @@
+"""Salvo benchmark: one fire event per shot vs. one fire-salvo per turn.
+
+Run from this directory:  python bench_salvo.py [--games 200] [--salvo N]
+For each board, plays random games once with fire (classic rules) and once
+with fire-salvo (salvo rules, --salvo shots a turn), running per client
+event what the server does for it: decode the Socket.IO packet, check the
+session token, apply it in the engine and encode the outgoing JSON event.
+Reports per shot: server CPU time, client events (round trips) and the
+bytes sent to the players, JSON and packed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from socketio import packet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from bench_wire import event_packet, ws_bytes
+from engine import RESULT, GameEngine
+from tokens import authenticate, issue_token
+from wire import encode_frame
+
+CLASSIC = [5, 4, 3, 3, 2]
+CONFIGS = [
+    ("10x10", 10, 10, CLASSIC, 5),
+    ("100x100 x20 fleets", 100, 100, CLASSIC * 20, 50),
+    ("300x300 x50 fleets", 300, 300, CLASSIC * 50, 200),
+]
+PLAYERS = (1, 2)
+TOKENS = {user_id: issue_token(user_id) for user_id in PLAYERS}
+
+
+def shots_for(width, height, rng):
+    cells = [[x, y] for x in range(width) for y in range(height)]
+    rng.shuffle(cells)
+    return cells
+
+
+def requests(room_id, turn, cells, salvo):
+    """The client packet(s) for one turn, encoded as sent."""
+    auth = {"roomId": room_id, "userId": turn, "token": TOKENS[turn]}
+    if salvo:
+        return [event_packet("fire-salvo", dict(auth, shots=cells)).encode()]
+    return [event_packet("fire", dict(auth, x=x, y=y)).encode() for x, y in cells]
+
+
+def handle(engine, encoded, salvo):
+    """One client event, server side. Returns the messages sent."""
+    pkt = packet.Packet(encoded_packet=encoded)
+    data = pkt.data[1]
+    user_id = authenticate(data)
+    if salvo:
+        messages = engine.fire_salvo(data["roomId"], user_id, data["shots"])
+    else:
+        messages = engine.fire(data["roomId"], user_id, data["x"], data["y"])
+    # game-result stays in the server (leaderboard)
+    messages = [m for m in messages if m[0] != RESULT]
+    for event, payload, _ in messages:
+        event_packet(event, payload).encode()
+    return messages
+
+
+def play(engine, room_id, width, height, fleet, size, rng):
+    """One game: size shots a turn with fire-salvo, or with fire if size
+    is 1. Returns (seconds, shots, events, JSON bytes out, packed bytes out)."""
+    salvo = size > 1
+    engine.start(room_id, {"player1_id": 1, "player2_id": 2, "status": "full"},
+                 width, height, fleet, size)
+    for user_id in PLAYERS:
+        engine.place_ships(room_id, user_id, None)
+    targets = {user_id: shots_for(width, height, rng) for user_id in PLAYERS}
+    turn, elapsed, shots, events, json_out, packed_out = 1, 0.0, 0, 0, 0, 0
+    while True:
+        cells = [targets[turn].pop() for _ in range(min(size, len(targets[turn])))]
+        packets = requests(room_id, turn, cells, salvo)
+        start = time.perf_counter()
+        for encoded in packets:
+            messages = handle(engine, encoded, salvo)
+            # Every broadcast reaches both players
+            json_out += 2 * sum(ws_bytes(event_packet(e, p)) for e, p, _ in messages)
+            packed_out += 2 * ws_bytes(event_packet("frame", encode_frame(
+                [(e, p) for e, p, _ in messages])))
+        elapsed += time.perf_counter() - start
+        shots += len(cells)
+        events += len(packets)
+        event, payload, _ = messages[0]
+        if event == "game-over":
+            return elapsed, shots, events, json_out, packed_out
+        if event == "error":
+            raise RuntimeError(payload["message"])
+        turn = payload["turn"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=200,
+                        help="games per mode on 10x10; bigger boards play fewer, as many shots")
+    parser.add_argument("--salvo", type=int, help="shots per salvo on every board")
+    args = parser.parse_args()
+    rng = random.Random(1)
+    print(f"{'board':20} {'mode':10} {'us/shot':>8} {'events/shot':>12} "
+          f"{'JSON B/shot':>12} {'packed B/shot':>14}")
+    room_id = 0
+    for name, width, height, fleet, size in CONFIGS:
+        size = args.salvo or size
+        games = max(2, args.games * 100 // (width * height))
+        for mode, per_turn in (("fire", 1), (f"salvo {size}", size)):
+            engine = GameEngine()
+            total = [0] * 5
+            for _ in range(games):
+                room_id += 1
+                for i, value in enumerate(play(engine, room_id, width, height, fleet,
+                                               per_turn, rng)):
+                    total[i] += value
+            elapsed, shots, events, json_out, packed_out = total
+            print(f"{name:20} {mode:10} {elapsed / shots * 1e6:8.2f} {events / shots:12.3f} "
+                  f"{json_out / shots:12.1f} {packed_out / shots:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
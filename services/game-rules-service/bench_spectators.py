@@ -0,0 +1,194 @@
+"""Spectator benchmark: cost of fan-out on the fire path, and slow readers.
+
+Run from this directory:  python bench_spectators.py [--spectators 1000,10000] [--slow 0.1]
+Plays one random 10x10 game per run with N spectators attached to an
+in-memory stand-in for the Socket.IO server (a queue per connection, as
+Engine.IO keeps). Compares the time per fire when the handler fans out
+itself (encode once, send to every spectator, as a Socket.IO room emit
+does) with SpectatorHub, where the handler only publishes and the fan-out
+happens in flush() every --per-tick shots. A --slow fraction of the
+spectators never read their queue; the report shows how many updates they
+were skipped, how deep their queue got, and that every reader ends on the
+same moves as the game.
+"""
+import argparse
+import os
+import queue
+import random
+import sys
+import time
+
+from socketio import packet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from bench_wire import random_fleet
+from engine import GameEngine
+from spectators import SpectatorHub
+
+
+class FakeSocket:
+    def __init__(self):
+        self.queue = queue.Queue()
+
+
+class FakeEio:
+    def __init__(self):
+        self.sockets = {}
+
+    def send_packet(self, sid, pkt):
+        self.sockets[sid].queue.put(pkt)
+
+
+class FakeManager:
+    def eio_sid_from_sid(self, sid, namespace):
+        return sid
+
+
+class FakeServer:
+    packet_class = packet.Packet
+
+    def __init__(self):
+        self.eio = FakeEio()
+        self.manager = FakeManager()
+
+
+def start_game(engine, room_id, rng, width=10, height=10, fleet=(5, 4, 3, 3, 2)):
+    p1, p2 = 1, 2
+    engine.start(room_id, {"player1_id": p1, "player2_id": p2, "status": "full"},
+                 width, height, list(fleet))
+    messages = []
+    for user_id in (p1, p2):
+        messages += engine.place_ships(room_id, user_id, random_fleet(width, height, fleet, rng))
+    shots = {}
+    for user_id in (p1, p2):
+        cells = [(x, y) for x in range(width) for y in range(height)]
+        rng.shuffle(cells)
+        shots[user_id] = cells
+    return messages, shots, p1
+
+
+def play(engine, room_id, shots, turn, on_broadcast):
+    """Fire until game-over; returns (seconds spent in the handler, shots)."""
+    elapsed = count = 0
+    while True:
+        x, y = shots[turn].pop()
+        start = time.perf_counter()
+        messages = engine.fire(room_id, turn, x, y)
+        on_broadcast([(e, p) for e, p, b in messages if b])
+        elapsed += time.perf_counter() - start
+        count += 1
+        event, payload, _ = messages[0]
+        if event == "game-over":
+            return elapsed, count
+        turn = payload["turn"]
+        yield
+
+
+def run_inline(spectators, seed):
+    """The fire handler sends to every spectator itself."""
+    server = FakeServer()
+    sids = range(spectators)
+    for sid in sids:
+        server.eio.sockets[sid] = FakeSocket()
+    hub = SpectatorHub(server, None)
+    engine = GameEngine()
+    _, shots, turn = start_game(engine, 1, random.Random(seed))
+
+    def fan_out(messages):
+        encoded = hub.encode_update(1, messages, False)
+        for sid in sids:
+            server.eio.send_packet(sid, encoded)
+
+    game = play(engine, 1, shots, turn, fan_out)
+    try:
+        while True:
+            next(game)
+    except StopIteration as done:
+        return done.value
+
+
+def run_hub(spectators, slow, per_tick, max_backlog, seed):
+    server = FakeServer()
+    engine = GameEngine()
+    hub = SpectatorHub(server, engine.spectate, max_backlog=max_backlog,
+                       start_task=lambda task: None)
+    slow_sids = set(range(int(spectators * slow)))
+    views = {}  # sid -> set of (x, y) shots seen
+    for sid in range(spectators):
+        server.eio.sockets[sid] = FakeSocket()
+        hub.watch(sid, 1)
+    _, shots, turn = start_game(engine, 1, random.Random(seed))
+
+    deepest = 0
+    flush_time = 0
+
+    def tick():
+        nonlocal deepest, flush_time
+        start = time.perf_counter()
+        hub.flush()
+        flush_time += time.perf_counter() - start
+        for sid, socket in server.eio.sockets.items():
+            if sid in slow_sids:
+                deepest = max(deepest, socket.queue.qsize())
+                continue
+            while not socket.queue.empty():
+                read(sid, socket.queue.get())
+
+    def read(sid, pkt):
+        event, payload = packet.Packet(encoded_packet=pkt.data).data
+        if event == "spectate-snapshot":
+            views[sid] = {(x, y) for x, y, _ in payload["moves"]}
+        elif event == "spectate-update":
+            views[sid].update((p["x"], p["y"]) for e, p in payload["events"]
+                              if e == "move-update")
+
+    tick()  # initial snapshots
+    # Slow readers: fill their queues as if earlier traffic were still unsent
+    for sid in slow_sids:
+        for _ in range(max_backlog + 1):
+            server.eio.sockets[sid].queue.put(None)
+    game = play(engine, 1, shots, turn, lambda messages: hub.publish(1, messages))
+    fired = 0
+    try:
+        while True:
+            next(game)
+            fired += 1
+            if fired % per_tick == 0:
+                tick()
+    except StopIteration as done:
+        elapsed, count = done.value
+    tick()  # game-over: final snapshots
+    # The slow readers catch up and get one snapshot in place of what they missed
+    for sid in slow_sids:
+        server.eio.sockets[sid].queue = queue.Queue()
+    slow_sids.clear()
+    tick()
+    final = {(x, y) for x, y, _ in engine.spectate(1)["moves"]}
+    consistent = sum(views.get(sid) == final for sid in range(spectators))
+    return elapsed, count, flush_time, deepest, hub.stats(), consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spectators", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[0, 1000, 10000])
+    parser.add_argument("--slow", type=float, default=0.1,
+                        help="fraction of spectators that never read")
+    parser.add_argument("--per-tick", type=int, default=5, help="shots per flush")
+    parser.add_argument("--max-backlog", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'spectators':>10} {'inline us/fire':>15} {'hub us/fire':>12} "
+          f"{'flush us/spectator':>19} {'dropped':>8} {'deepest':>8} {'consistent':>11}")
+    for spectators in args.spectators:
+        inline, count = run_inline(spectators, seed=spectators)
+        elapsed, count, flush_time, deepest, stats, consistent = run_hub(
+            spectators, args.slow, args.per_tick, args.max_backlog, seed=spectators)
+        per_spectator = flush_time / max(1, spectators) / max(1, count // args.per_tick)
+        print(f"{spectators:>10} {inline / count * 1e6:>15.1f} {elapsed / count * 1e6:>12.1f} "
+              f"{per_spectator * 1e6:>19.2f} {stats['updatesDropped']:>8} {deepest:>8} "
+              f"{consistent:>5}/{spectators}")
+
+
+if __name__ == "__main__":
+    main()
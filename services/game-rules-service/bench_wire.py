@@ -0,0 +1,134 @@
+"""Wire benchmark: JSON events vs. packed frames.
+
+Run from this directory:  python bench_wire.py [--games 200] [--width 10 --height 10]
+Plays random games through the engine and encodes what the server would
+send, down to the Engine.IO/WebSocket framing, both ways: one JSON
+Socket.IO event per message, or packed frames (one per event, as with
+GAME_TICK_MS=0). Reports bytes per game in each direction and the server
+CPU time to encode one outgoing event.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from socketio import packet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from engine import RESULT, GameEngine
+from wire import encode_frame, pack_cells
+
+
+def ws_bytes(sio_packet):
+    """Bytes on the wire for one Socket.IO packet sent as a WebSocket text
+    message: Engine.IO "4" prefix plus the WebSocket frame header."""
+    length = len(sio_packet.encode()) + 1
+    return length + (2 if length < 126 else 4)
+
+
+def event_packet(event, payload):
+    return packet.Packet(packet.EVENT, data=[event, payload], namespace="/")
+
+
+def random_fleet(width, height, fleet, rng):
+    taken, positions = set(), []
+    for length in fleet:
+        while True:
+            if rng.random() < 0.5:
+                x, y, dx, dy = rng.randrange(width - length + 1), rng.randrange(height), 1, 0
+            else:
+                x, y, dx, dy = rng.randrange(width), rng.randrange(height - length + 1), 0, 1
+            cells = [(x + dx * i, y + dy * i) for i in range(length)]
+            if not taken.intersection(cells):
+                taken.update(cells)
+                positions += [list(cell) for cell in cells]
+                break
+    return positions
+
+
+def play(engine, room_id, width, height, fleet, rng):
+    """Yield (client payload, [(event, payload, broadcast)]) for every event
+    of one game; client payload is what the caller sent."""
+    p1, p2 = 2 * room_id + 1, 2 * room_id + 2
+    room = {"player1_id": p1, "player2_id": p2, "status": "full"}
+    engine.start(room_id, room, width, height, fleet)
+    for user_id in (p1, p2):
+        yield ("join-game", {"roomId": room_id, "userId": user_id}), engine.join(room_id, user_id)
+    for user_id in (p1, p2):
+        positions = random_fleet(width, height, fleet, rng)
+        request = ("place-ships", {"roomId": room_id, "userId": user_id, "positions": positions})
+        yield request, engine.place_ships(room_id, user_id, positions)
+    targets = {}
+    for user_id in (p1, p2):
+        cells = [(x, y) for x in range(width) for y in range(height)]
+        rng.shuffle(cells)
+        targets[user_id] = cells
+    turn = p1
+    while True:
+        x, y = targets[turn].pop()
+        # game-result stays in the server (leaderboard)
+        messages = [m for m in engine.fire(room_id, turn, x, y) if m[0] != RESULT]
+        yield ("fire", {"roomId": room_id, "userId": turn, "x": x, "y": y}), messages
+        event, payload, _ = messages[0]
+        if event == "game-over":
+            return
+        turn = payload["turn"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--fleet", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[5, 4, 3, 3, 2])
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    engine = GameEngine()
+    events = []
+    for room_id in range(args.games):
+        events.extend(play(engine, room_id, args.width, args.height, args.fleet, rng))
+
+    # Bytes: broadcasts reach both players, replies only the caller
+    json_out = packed_out = json_in = packed_in = 0
+    for (name, request), messages in events:
+        json_in += ws_bytes(event_packet(name, request))
+        if name == "join-game":
+            request = dict(request, encoding="packed")
+        elif name == "place-ships":
+            request = dict(request)
+            request["cells"] = pack_cells(request.pop("positions"))
+        packed_in += ws_bytes(event_packet(name, request))
+        for group in (True, False):
+            chosen = [(e, p) for e, p, b in messages if b is group]
+            if chosen:
+                copies = 2 if group else 1
+                json_out += copies * sum(ws_bytes(event_packet(e, p)) for e, p in chosen)
+                packed_out += copies * ws_bytes(event_packet("frame", encode_frame(chosen)))
+
+    # CPU: what the server does per outgoing event, encoding included
+    outgoing = [[(e, p) for e, p, _ in messages] for _, messages in events]
+    count = sum(len(group) for group in outgoing)
+    start = time.perf_counter()
+    for group in outgoing:
+        for e, p in group:
+            event_packet(e, p).encode()
+    json_cpu = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for group in outgoing:
+        event_packet("frame", encode_frame(group)).encode()
+    packed_cpu = (time.perf_counter() - start) / count
+
+    games = args.games
+    print(f"{games} games on {args.width}x{args.height}, fleet {args.fleet}, "
+          f"{len(events) / games:.0f} client events per game")
+    print(f"{'':14}{'JSON':>10}{'packed':>10}")
+    print(f"{'bytes/game out':14}{json_out / games:>10.0f}{packed_out / games:>10.0f}")
+    print(f"{'bytes/game in':14}{json_in / games:>10.0f}{packed_in / games:>10.0f}")
+    print(f"{'us/event':14}{json_cpu * 1e6:>10.2f}{packed_cpu * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Board engines.
+
+Ships and shots are kept as integer bitmasks (one bit per cell, bit index
+``x * height + y``) together with a running count of ship cells that have
+not been hit yet, so firing and win detection are constant-time.
+
+Large boards use SparseBoard instead, which stores the same cell indices in
+hash sets so memory grows with ships and shots rather than width x height.
+
+Coordinates passed in are trusted to be ints on the board: rules.fire()
+checks shots before they get here.
+"""
+
+BOARD_SIZE = 5
+DEFAULT_FLEET = [2, 2]  # ship lengths
+
+MAX_BOARD_SIZE = 1000
+MAX_FLEET_SHIPS = 1000
+MAX_SALVO = 1000  # shots per turn in the salvo variant
+# Above this many cells every shot would copy a large integer, so switch
+# to hash-set storage.
+MAX_BITBOARD_CELLS = 4096
+
+
+class BitBoard:
+    __slots__ = ("width", "height", "ships", "shots", "remaining")
+
+    def __init__(self, width=BOARD_SIZE, height=BOARD_SIZE):
+        self.width = width
+        self.height = height
+        self.ships = 0      # bitmask of ship cells
+        self.shots = 0      # bitmask of cells already fired at
+        self.remaining = 0  # ship cells not hit yet
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def mask(self, positions):
+        """Bitmask for a list of [x, y] cells, or None if any cell is off the
+        board or listed twice."""
+        mask = 0
+        height = self.height
+        for x, y in positions:
+            if not (0 <= x < self.width and 0 <= y < height):
+                return None
+            bit = 1 << (x * height + y)
+            if mask & bit:
+                return None
+            mask |= bit
+        return mask
+
+    def is_valid_placement(self, positions):
+        mask = self.mask(positions)
+        return mask is not None and not (mask & self.ships)
+
+    def place_ships(self, positions):
+        mask = self.mask(positions)
+        self.ships |= mask
+        self.remaining += bin(mask).count("1")
+
+    def fire(self, x, y):
+        """True on hit, False on miss, None if the cell was already fired at."""
+        bit = 1 << (x * self.height + y)
+        if self.shots & bit:
+            return None
+        self.shots |= bit
+        if self.ships & bit:
+            self.remaining -= 1
+            return True
+        return False
+
+    def fire_cells(self, positions):
+        """Fire at every [x, y] of positions at once: a hit or miss per
+        cell, or None (and nothing fired) if any cell is off the board,
+        listed twice or already fired at."""
+        mask = self.mask(positions)
+        if mask is None or mask & self.shots:
+            return None
+        self.shots |= mask
+        ships, height = self.ships, self.height
+        self.remaining -= bin(mask & ships).count("1")
+        return [bool(ships >> (x * height + y) & 1) for x, y in positions]
+
+    def unfired(self):
+        return self.width * self.height - bin(self.shots).count("1")
+
+    def has_ship(self, x, y):
+        return bool(self.ships >> (x * self.height + y) & 1)
+
+    def all_ships_sunk(self):
+        return self.remaining == 0
+
+
+class SparseBoard:
+    __slots__ = ("width", "height", "ships", "shots", "remaining")
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.ships = set()  # cell indices of ship cells
+        self.shots = set()  # cell indices already fired at
+        self.remaining = 0
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def cells(self, positions):
+        """Set of cell indices for a list of [x, y] cells, or None if any
+        cell is off the board or listed twice."""
+        cells = set()
+        width, height = self.width, self.height
+        for x, y in positions:
+            if not (0 <= x < width and 0 <= y < height):
+                return None
+            cells.add(x * height + y)
+        if len(cells) != len(positions):
+            return None
+        return cells
+
+    def is_valid_placement(self, positions):
+        cells = self.cells(positions)
+        return cells is not None and self.ships.isdisjoint(cells)
+
+    def place_ships(self, positions):
+        cells = self.cells(positions)
+        self.ships |= cells
+        self.remaining += len(cells)
+
+    def fire(self, x, y):
+        """True on hit, False on miss, None if the cell was already fired at."""
+        cell = x * self.height + y
+        if cell in self.shots:
+            return None
+        self.shots.add(cell)
+        if cell in self.ships:
+            self.remaining -= 1
+            return True
+        return False
+
+    def fire_cells(self, positions):
+        """BitBoard.fire_cells() on sets."""
+        cells = self.cells(positions)
+        if cells is None or not self.shots.isdisjoint(cells):
+            return None
+        self.shots |= cells
+        self.remaining -= len(cells & self.ships)
+        ships, height = self.ships, self.height
+        return [x * height + y in ships for x, y in positions]
+
+    def unfired(self):
+        return self.width * self.height - len(self.shots)
+
+    def has_ship(self, x, y):
+        return x * self.height + y in self.ships
+
+    def all_ships_sunk(self):
+        return self.remaining == 0
+
+
+def create_board(width=BOARD_SIZE, height=BOARD_SIZE):
+    if width * height <= MAX_BITBOARD_CELLS:
+        return BitBoard(width, height)
+    return SparseBoard(width, height)
+
+
+def board_config(data):
+    """Validate a {"width", "height", "fleet", "salvo"} request body and
+    return (width, height, fleet, salvo). Missing keys fall back to the 5x5
+    default, one shot per turn. Raises ValueError with a client-facing
+    message."""
+    data = data or {}
+    width = data.get("width", BOARD_SIZE)
+    height = data.get("height", BOARD_SIZE)
+    fleet = data.get("fleet", DEFAULT_FLEET)
+    salvo = data.get("salvo", 1)
+    for value in (width, height):
+        if type(value) is not int or not 1 <= value <= MAX_BOARD_SIZE:
+            raise ValueError(f"Board size must be 1-{MAX_BOARD_SIZE}")
+    if (not isinstance(fleet, list) or not fleet
+            or len(fleet) > MAX_FLEET_SHIPS
+            or any(type(n) is not int or not 1 <= n <= max(width, height)
+                   for n in fleet)):
+        raise ValueError("Invalid fleet")
+    if sum(fleet) > width * height:
+        raise ValueError("Fleet does not fit on the board")
+    if type(salvo) is not int or not 1 <= salvo <= min(MAX_SALVO, width * height):
+        raise ValueError(f"Salvo must be 1-{MAX_SALVO} shots, at most the board's cells")
+    return width, height, list(fleet), salvo
@@ -0,0 +1,522 @@
+"""Game state and rule checks, independent of Flask and Socket.IO.
+
+Socket event methods return the messages to send as (event, payload,
+broadcast) tuples: broadcast messages go to the game's Socket.IO room, the
+others only to the caller. server.py delivers them, so the same engine can
+run in-process or inside a shard worker (see sharding.py). With a
+journal attached every state change is also appended to it (journal.py).
+
+When a game ends the messages also include a 'game-result' (see result())
+that the server keeps for itself instead of sending.
+
+Events for one room are serialised on that room's lock stripe; events for
+rooms on other stripes run in parallel.
+
+Each game has a version (see version()) that its broadcasts carry, so a
+client that reconnects can ask resync()/sync() for just the events after
+the last version it saw.
+
+Games started with salvo > 1 are played with fire_salvo(): each turn is
+that many shots, broadcast together as one 'salvo-update'.
+
+A finished game is compacted into a GameSummary (players, winner and the
+shots in order) and its boards are dropped. evict() removes summaries
+after finished_ttl seconds, live games nobody has touched for idle_ttl
+seconds, and, while the estimated size of everything kept is above
+memory_budget bytes, the oldest summaries and then the least recently
+active games.
+"""
+import threading
+import time
+from array import array
+
+import rules
+from state_store import StripedLock, footprint, sample
+
+EVICT_INTERVAL = 30  # seconds between evict() sweeps
+# A resync gets the missed events while there are at most this many, or a
+# quarter of the game's version; further behind, a snapshot is smaller (in
+# JSON an event costs about as much as five of a snapshot's moves)
+RESYNC_DELTA_MIN = 16
+RESULT = 'game-result'  # see result()
+
+
+def reply(event, payload):
+    return (event, payload, False)
+
+
+def broadcast(event, payload):
+    return (event, payload, True)
+
+
+def error(message):
+    return [reply('error', {'message': message})]
+
+
+def shots_by_player(shots, salvo):
+    """How many of a game's first shots player1 and player2 fired."""
+    turns, rest = divmod(shots, salvo)
+    first = (turns + 1) // 2 * salvo + (rest if turns % 2 == 0 else 0)
+    return first, shots - first
+
+
+def result(room_id, game):
+    """The 'game-result' message of a finished game, for the server's
+    leaderboard (leaderboard.py); it is never sent to clients."""
+    shots = len(game['moves']) // 2
+    fired = shots_by_player(shots, game.get('salvo', 1))
+    players = []
+    for user_id, shots_fired, ships, board in (
+            (game['player1'], fired[0], game['ships2'], game['board2']),
+            (game['player2'], fired[1], game['ships1'], game['board1'])):
+        players.append([user_id, shots_fired, len(ships) - board.remaining])
+    return reply(RESULT, {'roomId': room_id, 'winner': game['winner'], 'shots': shots,
+                          'players': players})
+
+
+class GameSummary:
+    """A finished game. moves holds x, y of every shot in order; players
+    take turns of salvo shots (one in the classic game) starting with
+    player1, and the winner fired the last shot. ships1/ships2 hold x, y
+    of each player's ship cells."""
+    __slots__ = ("player1", "player2", "winner", "width", "height", "fleet",
+                 "moves", "ships1", "ships2", "finished_at", "salvo")
+
+    def __init__(self, game):
+        self.player1 = game["player1"]
+        self.player2 = game["player2"]
+        self.winner = game["winner"]
+        self.width = game["width"]
+        self.height = game["height"]
+        self.fleet = tuple(game["fleet"])
+        self.moves = game["moves"]
+        self.ships1 = array("H", (c for cell in game["ships1"] for c in cell))
+        self.ships2 = array("H", (c for cell in game["ships2"] for c in cell))
+        self.finished_at = time.time()
+        self.salvo = game.get("salvo", 1)
+
+
+def salvo_of(summary):
+    # Summaries pickled before the salvo variant have no salvo slot set
+    return getattr(summary, "salvo", 1)
+
+
+def pairs(flat):
+    """[x0, y0, x1, y1, ...] -> [[x0, y0], [x1, y1], ...]"""
+    return [[flat[i], flat[i + 1]] for i in range(0, len(flat), 2)]
+
+
+def version(placed, moves):
+    """A game's version: every fleet placed and every shot adds one, so
+    versions 1-2 are the placements and shot i (from 0) is version 3 + i."""
+    return placed + len(moves) // 2
+
+
+class GameEngine:
+    def __init__(self, journal=None, finished_ttl=600, idle_ttl=3600, memory_budget=0,
+                 no_touch=False):
+        # room_id -> game state, least recently active first
+        self.games = {}
+        # room_id -> GameSummary, oldest first
+        self.finished = {}
+        self.journal = journal
+        self.locks = StripedLock()
+        self.finished_ttl = finished_ttl
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget  # bytes; 0 = no limit
+        self.no_touch = no_touch  # rule for new games: ships may not touch
+        self.counters = {"compacted": 0, "evictedFinished": 0,
+                         "evictedAbandoned": 0, "evictedOverBudget": 0}
+        self.counters_lock = threading.Lock()
+
+    def count(self, name):
+        with self.counters_lock:
+            self.counters[name] += 1
+
+    def state(self):
+        """Everything a journal snapshot must persist, by attribute name."""
+        return {"games": self.games, "finished": self.finished}
+
+    def recover(self):
+        """Rebuild games from the journal, then snapshot so the next
+        recovery starts from here."""
+        journal, self.journal = self.journal, None
+        try:
+            replayed = journal.recover(self)
+        finally:
+            self.journal = journal
+        journal.snapshot(self.state())
+        return replayed
+
+    def journaled(self, method, *args):
+        if self.journal is not None:
+            getattr(self.journal, method)(*args)
+
+    def call(self, method, room_id, *args):
+        with self.locks(room_id):
+            result = method(room_id, *args)
+            # Move the game to the end, so games stays ordered by activity
+            game = self.games.pop(room_id, None)
+            if game is not None:
+                game["last_active"] = time.time()
+                self.games[room_id] = game
+        journal = self.journal
+        if journal is not None and journal.snapshot_due():
+            # Taken outside the room's stripe: holding one stripe while
+            # waiting for all of them could deadlock with another snapshot
+            with self.locks.all():
+                if journal.snapshot_due():
+                    journal.snapshot(self.state())
+        return result
+
+    def start(self, room_id, room, width, height, fleet, salvo=1):
+        return self.call(self._start, room_id, room, width, height, fleet, salvo)
+
+    def join(self, room_id, user_id):
+        return self.call(self._join, room_id, user_id)
+
+    def place_ships(self, room_id, user_id, positions):
+        """positions None places a random legal fleet for the player."""
+        return self.call(self._place_ships, room_id, user_id, positions)
+
+    def fire(self, room_id, user_id, x, y):
+        return self.call(self._fire, room_id, user_id, x, y)
+
+    def fire_salvo(self, room_id, user_id, positions):
+        """A whole turn of [x, y] shots; see rules.fire_salvo()."""
+        return self.call(self._fire_salvo, room_id, user_id, positions)
+
+    def spectate(self, room_id):
+        """Snapshot of a game for spectators, or None if there is none:
+        board size, players, turn, version and every shot so far as
+        [x, y, hit]. Ship positions are only included once the game is
+        over. Watching does not count as activity, so it takes the room's
+        lock directly instead of going through call()."""
+        with self.locks(room_id):
+            return self._snapshot(room_id)
+
+    def sync(self, room_id, user_id=None, since=None):
+        """Catch-up for a client that last saw version since (see _sync),
+        for GET /games/:id/state. Like spectate(), not activity."""
+        with self.locks(room_id):
+            return self._sync(room_id, user_id, since)
+
+    def resync(self, room_id, user_id, since=None, verified=True):
+        """A reconnecting player: a 'resync' reply with _sync(). Their
+        own ships are only included if user_id came from a verified
+        session token."""
+        return self.call(self._resync, room_id, user_id, since, verified)
+
+    def _snapshot(self, room_id):
+        game = self.games.get(room_id)
+        if game is not None:
+            boards = (game["board2"], game["board1"])  # player1 fires at board2
+            moves, salvo = game["moves"], game.get("salvo", 1)
+            placed = [game[p] for p, ships in (("player1", "ships1"), ("player2", "ships2"))
+                      if game[ships] is not None]
+            return {
+                "roomId": room_id, "width": game["width"], "height": game["height"],
+                "fleet": game["fleet"], "salvo": salvo, "player1": game["player1"],
+                "player2": game["player2"], "turn": game["current_turn"],
+                "winner": None, "version": version(len(placed), moves),
+                "shipsPlaced": placed,
+                "moves": [[x, y, boards[i // salvo % 2].has_ship(x, y)]
+                          for i, (x, y) in enumerate(pairs(moves))],
+            }
+        summary = self.finished.get(room_id)
+        if summary is None:
+            return None
+        ships = (pairs(summary.ships1), pairs(summary.ships2))
+        targets = (set(map(tuple, ships[1])), set(map(tuple, ships[0])))
+        salvo = salvo_of(summary)
+        return {
+            "roomId": room_id, "width": summary.width, "height": summary.height,
+            "fleet": list(summary.fleet), "salvo": salvo, "player1": summary.player1,
+            "player2": summary.player2, "turn": None, "winner": summary.winner,
+            "version": version(2, summary.moves),
+            "shipsPlaced": [summary.player1, summary.player2],
+            "moves": [[x, y, (x, y) in targets[i // salvo % 2]]
+                      for i, (x, y) in enumerate(pairs(summary.moves))],
+            "ships": list(ships),
+        }
+
+    def _events_since(self, room_id, since):
+        """The broadcasts after version since, as [event, payload] pairs,
+        or None if there is no game. Both fleets are placed before the
+        first shot, so the events follow from the game state alone; only
+        the order of the two placements is not kept (player1 comes first).
+        A version inside a salvo gets that whole salvo again."""
+        game = self.games.get(room_id)
+        if game is not None:
+            players = (game["player1"], game["player2"])
+            placed = [user for user, ships in zip(players, ("ships1", "ships2"))
+                      if game[ships] is not None]
+            boards = (game["board2"], game["board1"])
+            moves, width, height = game["moves"], game["width"], game["height"]
+            salvo = game.get("salvo", 1)
+            hit = lambda i, x, y: boards[i // salvo % 2].has_ship(x, y)
+            winner = None
+        else:
+            summary = self.finished.get(room_id)
+            if summary is None:
+                return None
+            players = placed = (summary.player1, summary.player2)
+            targets = (set(map(tuple, pairs(summary.ships2))),
+                       set(map(tuple, pairs(summary.ships1))))
+            moves, width, height = summary.moves, summary.width, summary.height
+            salvo = salvo_of(summary)
+            hit = lambda i, x, y: (x, y) in targets[i // salvo % 2]
+            winner = summary.winner
+        events = []
+        for n in range(since, len(placed)):
+            events.append(['ships-placed', {'userId': placed[n], 'version': n + 1}])
+            if n == 1:
+                events.append(['game-ready', {'turn': players[0], 'width': width,
+                                              'height': height, 'version': 2}])
+        shots = len(moves) // 2
+        first = max(0, since - 2)
+        for begin in range(first - first % salvo, shots, salvo):
+            end = min(begin + salvo, shots)
+            turn = players[(begin // salvo + 1) % 2]
+            if end == shots and winner is not None:
+                events.append(['game-over', {'winner': winner, 'version': 2 + end}])
+            elif salvo == 1:
+                x, y = moves[2 * begin], moves[2 * begin + 1]
+                events.append(['move-update', {'hit': hit(begin, x, y), 'x': x, 'y': y,
+                                                'turn': turn, 'version': 2 + end}])
+            else:
+                events.append(['salvo-update', {
+                    'shots': [[x, y, hit(i, x, y)] for i, (x, y)
+                              in enumerate(pairs(moves[2 * begin:2 * end]), begin)],
+                    'turn': turn, 'version': 2 + end}])
+        return events
+
+    def _sync(self, room_id, user_id, since):
+        """{"type": "delta", "since", "version", "events"} with the events
+        after version since, or, if since is missing, out of range or too
+        far behind, {"type": "snapshot", ...} as
+        spectate() plus "yourShips" for a player who has placed. user_id
+        must be verified (a session token), never taken from the request
+        as is: it reveals that player's ships. None if there is no game."""
+        game = self.games.get(room_id)
+        if game is not None:
+            placed = (game["ships1"] is not None) + (game["ships2"] is not None)
+            current = version(placed, game["moves"])
+        elif room_id in self.finished:
+            current = version(2, self.finished[room_id].moves)
+        else:
+            return None
+        if (type(since) is int and 0 <= since <= current
+                and current - since <= max(RESYNC_DELTA_MIN, current // 4)):
+            return {"roomId": room_id, "type": "delta", "since": since, "version": current,
+                    "events": self._events_since(room_id, since)}
+        snapshot = self._snapshot(room_id)
+        snapshot["type"] = "snapshot"
+        if game is not None:
+            for player, ships in (("player1", "ships1"), ("player2", "ships2")):
+                if user_id == game[player] and game[ships] is not None:
+                    snapshot["yourShips"] = game[ships]
+        else:
+            summary = self.finished[room_id]
+            if user_id in (summary.player1, summary.player2):
+                snapshot["yourShips"] = snapshot["ships"][user_id != summary.player1]
+        return snapshot
+
+    def _resync(self, room_id, user_id, since, verified=True):
+        game = self.games.get(room_id)
+        if game is None:
+            game = self.finished.get(room_id)
+            if game is None:
+                return error('Game not started')
+            players = (game.player1, game.player2)
+        else:
+            players = (game['player1'], game['player2'])
+        if user_id not in players:
+            return error('Not a player in this game')
+        return [reply('resync', self._sync(room_id, user_id if verified else None, since))]
+
+    def _start(self, room_id, room, width, height, fleet, salvo=1):
+        """Start a game for a room returned by room-service.
+        Returns (response body, HTTP status)."""
+        # Both players call start; don't reset a game that is already running
+        game = self.games.get(room_id)
+        if game:
+            return {"message": "Game already started", "roomId": room_id,
+                    "width": game["width"], "height": game["height"],
+                    "fleet": game["fleet"], "salvo": game.get("salvo", 1)}, 200
+        if room.get("status") != "full":
+            return {"error": "Room not full"}, 400
+        self.finished.pop(room_id, None)  # a rematch in the same room
+
+        game = rules.new_game(room["player1_id"], room["player2_id"], width, height, fleet,
+                              self.no_touch, salvo)
+        game["moves"] = array("H")  # x, y of every shot, in order
+        game["last_active"] = time.time()
+        self.games[room_id] = game
+        self.journaled("start", room_id, room, width, height, fleet, salvo)
+        return {"message": "Game started", "roomId": room_id,
+                "width": width, "height": height, "fleet": fleet, "salvo": salvo}, 200
+
+    def _join(self, room_id, user_id):
+        game = self.games.get(room_id)
+        if game is None:
+            game = self.finished.get(room_id)
+            if game is None:
+                return error('Game not started')
+            players = (game.player1, game.player2)
+        else:
+            players = (game['player1'], game['player2'])
+        if user_id not in players:
+            return error('Not a player in this game')
+        return [reply('joined', {'roomId': room_id, 'yourId': user_id})]
+
+    def _place_ships(self, room_id, user_id, positions):
+        game = self.games.get(room_id)
+        if game is None:
+            return error('Game is over' if room_id in self.finished else 'Game not found')
+
+        messages = []
+        if positions is None:  # quick play: the server picks the fleet
+            try:
+                positions = rules.random_placement(game)
+            except ValueError as e:
+                return error(str(e))
+            messages.append(reply('ships-assigned', {'positions': positions}))
+        failure = rules.place_ships(game, user_id, positions)
+        if failure:
+            return error(failure)
+        self.journaled("place", room_id, user_id, positions)
+
+        placed = (game['ships1'] is not None) + (game['ships2'] is not None)
+        messages.append(broadcast('ships-placed', {'userId': user_id, 'version': placed}))
+
+        if rules.ready(game):
+            messages.append(broadcast('game-ready', {
+                'turn': game['current_turn'],
+                'width': game['width'], 'height': game['height'], 'version': placed}))
+        return messages
+
+    def _fire(self, room_id, user_id, x, y):
+        game = self.games.get(room_id)
+        if game is None:
+            return error('Game is over') if room_id in self.finished else []
+        if game.get('salvo', 1) > 1:
+            return error(f"A salvo is {game['salvo']} shots: send fire-salvo")
+        failure, hit = rules.fire(game, user_id, x, y)
+        if failure:
+            return error(failure)
+        game['moves'].extend((x, y))
+        self.journaled("fire", room_id, user_id, x, y)
+
+        current = version(2, game['moves'])  # shots need both fleets placed
+
+        if game['winner'] is not None:
+            return self._finish(room_id, game, current)
+        return [broadcast('move-update', {
+            'hit': hit,
+            'x': x, 'y': y,
+            'turn': game['current_turn'],
+            'version': current
+        })]
+
+    def _fire_salvo(self, room_id, user_id, positions):
+        game = self.games.get(room_id)
+        if game is None:
+            return error('Game is over') if room_id in self.finished else []
+        if game.get('salvo', 1) == 1 and len(positions) == 1:
+            # A classic game: one shot, broadcast as the move-update every
+            # client knows
+            (x, y), = positions
+            return self._fire(room_id, user_id, x, y)
+        failure, hits = rules.fire_salvo(game, user_id, positions)
+        if failure:
+            return error(failure)
+        game['moves'].extend(c for cell in positions for c in cell)
+        self.journaled("salvo", room_id, user_id, positions)
+
+        current = version(2, game['moves'])
+        if game['winner'] is not None:
+            return self._finish(room_id, game, current)
+        return [broadcast('salvo-update', {
+            'shots': [[x, y, hit] for (x, y), hit in zip(positions, hits)],
+            'turn': game['current_turn'],
+            'version': current
+        })]
+
+    def _finish(self, room_id, game, current):
+        # Keep who played and how, drop the boards
+        del self.games[room_id]
+        self.finished[room_id] = GameSummary(game)
+        self.count("compacted")
+        return [broadcast('game-over', {'winner': game['winner'], 'version': current}),
+                result(room_id, game)]
+
+    # === EVICTION ===
+    def discard(self, room_id):
+        """Forget a game, live or finished."""
+        with self.locks(room_id):
+            self.games.pop(room_id, None)
+            self.finished.pop(room_id, None)
+            self.journaled("discard", room_id)
+
+    def evict_if(self, table, room_id, counter, check=lambda entry: True):
+        """Discard room_id from table if check(entry) still holds under the
+        room's lock; the game may have moved on since the sweep looked."""
+        with self.locks(room_id):
+            entry = table.get(room_id)
+            if entry is None or not check(entry):
+                return False
+            del table[room_id]
+            self.journaled("discard", room_id)
+        self.count(counter)
+        return True
+
+    def evict(self, now=None):
+        """Drop expired summaries, abandoned games and, over the memory
+        budget, the oldest of both. Returns the number evicted."""
+        now = time.time() if now is None else now
+        evicted = 0
+        # Both tables are ordered oldest first, so stop at the first keeper
+        for room_id, summary in list(self.finished.items()):
+            if now - summary.finished_at < self.finished_ttl:
+                break
+            evicted += self.evict_if(self.finished, room_id, "evictedFinished")
+        idle = lambda game: now - game["last_active"] >= self.idle_ttl
+        for room_id, game in list(self.games.items()):
+            if not idle(game):
+                break
+            evicted += self.evict_if(self.games, room_id, "evictedAbandoned", idle)
+        if self.memory_budget:
+            stats = self.stats()
+            excess = stats["liveBytes"] + stats["finishedBytes"] - self.memory_budget
+            for table, per_entry in ((self.finished, stats["bytesPerFinishedGame"]),
+                                     (self.games, stats["bytesPerLiveGame"])):
+                for room_id in list(table):
+                    if excess <= 0:
+                        break
+                    if self.evict_if(table, room_id, "evictedOverBudget"):
+                        evicted += 1
+                        excess -= per_entry
+        return evicted
+
+    def sizes(self):
+        """Game counts, cheap enough for every metrics scrape."""
+        return {"live": len(self.games), "finished": len(self.finished)}
+
+    def stats(self):
+        """Counters plus the estimated memory of live and finished games,
+        from a sample of each."""
+        live, finished = list(self.games.values()), list(self.finished.values())
+        per_live = per_finished = 0
+        if live:
+            sizes = [footprint(game) for game in sample(live)]
+            per_live = sum(sizes) // len(sizes)
+        if finished:
+            sizes = [footprint(summary) for summary in sample(finished)]
+            per_finished = sum(sizes) // len(sizes)
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return dict(counters, live=len(live), finished=len(finished),
+                    liveBytes=per_live * len(live), finishedBytes=per_finished * len(finished),
+                    bytesPerLiveGame=per_live, bytesPerFinishedGame=per_finished,
+                    memoryBudget=self.memory_budget)
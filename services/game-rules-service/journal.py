@@ -0,0 +1,226 @@
+"""Append-only move journal with snapshots for crash recovery.
+
+Every successful start, ship placement, shot and salvo, and every
+eviction, is appended to the current journal segment as a small binary
+record (length, CRC32, type, fields).
+A background thread flushes and fsyncs at most every fsync_interval
+seconds, so many records share one fsync. Turn changes are not stored:
+replaying a shot through the engine switches the turn exactly as it did
+live.
+
+Every snapshot_every records the engine's live and finished games are
+pickled to snapshot.pkl and a new segment is started, so recovery loads one
+snapshot and replays at most one segment's worth of records. Replaying a record that
+is already in the snapshot is a no-op, because the engine rejects the
+repeated start/placement/shot.
+"""
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+START, PLACE, FIRE, DISCARD, SALVO = 1, 2, 3, 4, 5
+
+HEADER = struct.Struct("<II")          # payload length, crc32
+START_REC = struct.Struct("<BqqqHHH")  # type, room, player1, player2, width, height, ships
+PLACE_REC = struct.Struct("<BqqI")     # type, room, user, cells
+FIRE_REC = struct.Struct("<BqqHH")     # type, room, user, x, y
+DISCARD_REC = struct.Struct("<Bq")     # type, room
+SALVO_REC = struct.Struct("<BqqH")     # type, room, user, shots
+SALVO_SIZE = struct.Struct("<H")       # after a start record's fleet; absent = 1
+
+SNAPSHOT = "snapshot.pkl"
+
+
+def encode_start(room_id, room, width, height, fleet, salvo=1):
+    return (START_REC.pack(START, room_id, room["player1_id"], room["player2_id"],
+                           width, height, len(fleet))
+            + struct.pack(f"<{len(fleet)}H", *fleet) + SALVO_SIZE.pack(salvo))
+
+
+def encode_place(room_id, user_id, positions):
+    flat = [c for cell in positions for c in cell]
+    return (PLACE_REC.pack(PLACE, room_id, user_id, len(positions))
+            + struct.pack(f"<{len(flat)}H", *flat))
+
+
+def encode_fire(room_id, user_id, x, y):
+    return FIRE_REC.pack(FIRE, room_id, user_id, x, y)
+
+
+def encode_salvo(room_id, user_id, positions):
+    flat = [c for cell in positions for c in cell]
+    return (SALVO_REC.pack(SALVO, room_id, user_id, len(positions))
+            + struct.pack(f"<{len(flat)}H", *flat))
+
+
+def encode_discard(room_id):
+    return DISCARD_REC.pack(DISCARD, room_id)
+
+
+def decode(payload):
+    """Record payload -> (engine method name, args)."""
+    kind = payload[0]
+    if kind == FIRE:
+        _, room_id, user_id, x, y = FIRE_REC.unpack(payload)
+        return "fire", (room_id, user_id, x, y)
+    if kind == SALVO:
+        _, room_id, user_id, count = SALVO_REC.unpack_from(payload)
+        flat = struct.unpack_from(f"<{count * 2}H", payload, SALVO_REC.size)
+        return "fire_salvo", (room_id, user_id, [list(flat[i:i + 2]) for i in range(0, len(flat), 2)])
+    if kind == PLACE:
+        _, room_id, user_id, count = PLACE_REC.unpack_from(payload)
+        flat = struct.unpack_from(f"<{count * 2}H", payload, PLACE_REC.size)
+        return "place_ships", (room_id, user_id, [list(flat[i:i + 2]) for i in range(0, len(flat), 2)])
+    if kind == START:
+        _, room_id, p1, p2, width, height, ships = START_REC.unpack_from(payload)
+        fleet = list(struct.unpack_from(f"<{ships}H", payload, START_REC.size))
+        end = START_REC.size + 2 * ships
+        # Records written before the salvo variant end with the fleet
+        salvo = SALVO_SIZE.unpack_from(payload, end)[0] if len(payload) > end else 1
+        room = {"player1_id": p1, "player2_id": p2, "status": "full"}
+        return "start", (room_id, room, width, height, fleet, salvo)
+    if kind == DISCARD:
+        _, room_id = DISCARD_REC.unpack(payload)
+        return "discard", (room_id,)
+    raise ValueError(f"unknown journal record type {kind}")
+
+
+def read_segment(path):
+    """Yield record payloads, stopping at the first torn or corrupt record."""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        length, crc = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield payload
+        offset = start + length
+
+
+class Journal:
+    def __init__(self, directory, fsync_interval=0.05, snapshot_every=200000):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.segment = max(self.segments(), default=0) + 1
+        self.file = open(self.segment_path(self.segment), "ab")
+        self.records_since_snapshot = 0
+        self.dirty = False
+        self.closed = False
+        threading.Thread(target=self.flush_loop, daemon=True).start()
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"journal-{number:08d}.log")
+
+    def segments(self):
+        return sorted(int(os.path.basename(p)[8:16])
+                      for p in glob.glob(os.path.join(self.directory, "journal-*.log")))
+
+    # --- writing ---
+    def append(self, payload):
+        record = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.lock:
+            self.file.write(record)
+            self.dirty = True
+            self.records_since_snapshot += 1
+
+    def start(self, room_id, room, width, height, fleet, salvo=1):
+        self.append(encode_start(room_id, room, width, height, fleet, salvo))
+
+    def place(self, room_id, user_id, positions):
+        self.append(encode_place(room_id, user_id, positions))
+
+    def fire(self, room_id, user_id, x, y):
+        self.append(encode_fire(room_id, user_id, x, y))
+
+    def salvo(self, room_id, user_id, positions):
+        self.append(encode_salvo(room_id, user_id, positions))
+
+    def discard(self, room_id):
+        self.append(encode_discard(room_id))
+
+    def snapshot_due(self):
+        return self.records_since_snapshot >= self.snapshot_every
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            self.file.flush()
+            self.dirty = False
+            # fsync a duplicate outside the lock so appends don't wait for
+            # the disk: snapshot() may close the segment's own fd meanwhile
+            fd = os.dup(self.file.fileno())
+        try:
+            os.fsync(fd)
+        except OSError:
+            self.dirty = True  # try again next time
+            raise
+        finally:
+            os.close(fd)
+
+    def flush_loop(self):
+        while not self.closed:
+            time.sleep(self.fsync_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Journal fsync failed: {e!r}")
+
+    def snapshot(self, state):
+        """Persist the engine's state ({attribute: dict}) and start a new
+        segment. The caller must make sure state is not modified until this
+        returns."""
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.segment += 1
+            self.file = open(self.segment_path(self.segment), "ab")
+            self.records_since_snapshot = 0
+            first_segment = self.segment
+            data = pickle.dumps((first_segment, state), protocol=pickle.HIGHEST_PROTOCOL)
+        tmp = os.path.join(self.directory, SNAPSHOT + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, SNAPSHOT))
+        for number in self.segments():
+            if number < first_segment:
+                os.remove(self.segment_path(number))
+
+    def close(self):
+        self.closed = True
+        self.flush()
+        with self.lock:
+            self.file.close()
+
+    # --- recovery ---
+    def recover(self, engine):
+        """Load the latest snapshot into the engine and replay the journal
+        segments written after it. Returns the number of records replayed."""
+        first_segment = 0
+        path = os.path.join(self.directory, SNAPSHOT)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                first_segment, state = pickle.load(f)
+            for name, table in state.items():
+                getattr(engine, name).update(table)
+        replayed = 0
+        for number in self.segments():
+            if first_segment <= number < self.segment:
+                for payload in read_segment(self.segment_path(number)):
+                    method, args = decode(payload)
+                    getattr(engine, method)(*args)
+                    replayed += 1
+        return replayed
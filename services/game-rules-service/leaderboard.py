@@ -0,0 +1,93 @@
+"""Per-player statistics and the leaderboard, kept up to date per game.
+
+The engine ends every game with a 'game-result' message for the server
+(never sent to clients): the winner and, per player, the shots fired and
+ship cells hit. record() folds it into the players' running totals
+(games, wins, losses, shots, hits, shots of their games) in O(log n), so
+nothing is recomputed from past games and reads cost the same however
+many games have been played.
+
+The ranking is a sorted index of one int per player that orders like
+(-wins, losses, user id): most wins first, then fewest losses, then the
+older account (ints compare faster than tuples, see rank_key()). Recording a game
+moves its two players in the index (remove + insert, O(log n) each); a
+page of K players at any offset is O(log n + K) and a player's rank is
+O(log n), so paging stays fast with millions of players.
+
+Everything is in memory, like users and rooms, and starts empty.
+"""
+import threading
+
+from sortedcontainers import SortedList
+
+MAX_PAGE = 100  # players per leaderboard page
+ID_MASK = (1 << 32) - 1  # the user id bits of a rank_key()
+
+
+class PlayerStats:
+    __slots__ = ("games", "wins", "losses", "shots", "hits", "game_shots")
+
+    def __init__(self):
+        self.games = self.wins = self.losses = 0
+        self.shots = self.hits = 0  # this player's own shots
+        self.game_shots = 0  # both players' shots, summed over the games
+
+    def to_json(self):
+        return {"games": self.games, "wins": self.wins, "losses": self.losses,
+                "shots": self.shots, "hits": self.hits,
+                "hitRate": round(self.hits / self.shots, 4) if self.shots else 0.0,
+                "avgGameLength": round(self.game_shots / self.games, 1) if self.games else 0.0}
+
+
+def rank_key(user_id, stats):
+    # losses and user ids below 2**32
+    return (-stats.wins << 64) + (stats.losses << 32) + user_id
+
+
+class Leaderboard:
+    def __init__(self):
+        self.players = {}  # user_id -> PlayerStats
+        self.ranking = SortedList()  # rank_key() of every player
+        self.games = 0
+        self.lock = threading.Lock()
+
+    def record(self, result):
+        """Fold in one finished game: {"winner", "shots" (both players'),
+        "players": [[user_id, shots, hits], ...]}."""
+        with self.lock:
+            self.games += 1
+            for user_id, shots, hits in result["players"]:
+                stats = self.players.get(user_id)
+                if stats is None:
+                    stats = self.players[user_id] = PlayerStats()
+                else:
+                    self.ranking.remove(rank_key(user_id, stats))
+                stats.games += 1
+                if user_id == result["winner"]:
+                    stats.wins += 1
+                else:
+                    stats.losses += 1
+                stats.shots += shots
+                stats.hits += hits
+                stats.game_shots += result["shots"]
+                self.ranking.add(rank_key(user_id, stats))
+
+    def page(self, offset=0, limit=20):
+        """(players ranked, [(rank, user_id, stats JSON)]) for ranks
+        offset + 1 to offset + limit."""
+        with self.lock:
+            keys = list(self.ranking.islice(offset, offset + limit))
+            rows = [(offset + i + 1, key & ID_MASK, self.players[key & ID_MASK].to_json())
+                    for i, key in enumerate(keys)]
+            return len(self.ranking), rows
+
+    def player(self, user_id):
+        """(rank, stats JSON) of user_id, or None before their first game."""
+        with self.lock:
+            stats = self.players.get(user_id)
+            if stats is None:
+                return None
+            return self.ranking.index(rank_key(user_id, stats)) + 1, stats.to_json()
+
+    def stats(self):
+        return {"players": len(self.players), "games": self.games}
@@ -0,0 +1,449 @@
+"""Fleet placement tables: every legal position of every ship, as bitmasks.
+
+A ship of length L whose first cell is c (index x * height + y, as in
+board.py) covers c, c + height, ... lying across (along x), or c, c + 1,
+... lying down (along y). FleetTable holds those masks for each length in
+a fleet, and for the no-touch rule each ship's halo (its cells and every
+cell around them, diagonals included). Tables are built on first use and
+cached per (width, height, fleet, no_touch) by fleet_table().
+
+Boards above TABLE_MAX_CELLS would need megabytes of masks per ship
+length, so there the same masks are computed by shifting when asked for.
+
+is_valid() checks a player's ship cells against the fleet. On boards
+with tables the cells are first cut greedily into ships from the lowest
+cell up, a few mask operations per ship. On large boards the cells are
+read in the order listed, and when ships may touch, a list that already
+gives each ship's cells one after the other (as every client sends them)
+is checked in that same pass, about twice the cost of the bounds and
+overlap check. Otherwise one pass over a set of the cells finds the
+straight lines no other cell touches, diagonals included: usually each
+of those is a whole ship and that is the whole check, at a few times the
+cost of the bounds and overlap check. The other cells are grouped by
+touch and cut up depth first: the lowest cell left must be the first
+cell of some ship, so each length still owed is tried across and down
+from there, longest first, and the ship taken away until every group is
+used up, without trying the same state twice. That checks the shapes,
+the number and lengths of the ships and, with no_touch, that no two
+ships touch. Fleets so ambiguous that this passes MAX_SPLIT_STEPS are
+refused.
+
+random_fleet() draws a random legal fleet from the same tables (on
+large boards, from sets of cells).
+"""
+import random
+from functools import lru_cache
+
+# 32 x 32: about 200 KB of masks per ship length
+TABLE_MAX_CELLS = 1024
+TABLE_CACHE_SIZE = 32
+# Partial tilings is_valid() may try before giving up; a legal fleet needs
+# about one per ship that touches another
+MAX_SPLIT_STEPS = 20000
+DRAWS_PER_SHIP = 100
+FLEET_ATTEMPTS = 100
+
+
+def bits(cells):
+    """Mask with the given cell indices set, built without big-int
+    arithmetic per cell."""
+    cells = list(cells)
+    if not cells:
+        return 0
+    buf = bytearray(max(cells) // 8 + 1)
+    for cell in cells:
+        buf[cell >> 3] |= 1 << (cell & 7)
+    return int.from_bytes(buf, "little")
+
+
+class FleetTable:
+    def __init__(self, width, height, fleet, no_touch=False):
+        self.width = width
+        self.height = height
+        self.fleet = sorted(fleet, reverse=True)
+        self.cells = sum(fleet)
+        self.lengths = sorted(set(fleet), reverse=True)
+        self.counts = [self.fleet.count(length) for length in self.lengths]
+        self.fleet_counts = dict(zip(self.lengths, self.counts))
+        self.no_touch = no_touch
+        self.tabled = width * height <= TABLE_MAX_CELLS
+        self.ships = {}  # length -> masks indexed 2 * cell + across, None if off the board
+        self.halos = {}  # length -> halo of each of those, for no_touch
+        self.runs = {}   # (length, across) -> mask of a ship starting at cell 0
+        self.board = (1 << width * height) - 1
+        # Cells that can move one up / down without leaving their column
+        self.not_bottom = self.board & ~bits(range(height - 1, width * height, height))
+        self.not_top = self.board & ~bits(range(0, width * height, height))
+
+    # === MASKS ===
+    def fits(self, length, cell, across):
+        x, y = divmod(cell, self.height)
+        return x + length <= self.width if across else y + length <= self.height
+
+    def run(self, length, across):
+        """Mask of a ship whose first cell is cell 0."""
+        run = self.runs.get((length, across))
+        if run is None:
+            step = self.height if across else 1
+            run = bits(range(0, length * step, step))
+            self.runs[length, across] = run
+        return run
+
+    def table(self, length):
+        ships = self.ships.get(length)
+        if ships is None:
+            ships = [self.run(length, index & 1) << (index >> 1)
+                     if self.fits(length, index >> 1, index & 1) else None
+                     for index in range(2 * self.width * self.height)]
+            self.ships[length] = ships
+        return ships
+
+    def halo_table(self, length):
+        halos = self.halos.get(length)
+        if halos is None:
+            halos = [None if ship is None else self.dilate(ship) for ship in self.table(length)]
+            self.halos[length] = halos
+        return halos
+
+    def ship(self, length, cell, across, base=0):
+        """Mask of a ship, or None if it would run off the board. Large
+        boards may pass base, a whole number of columns, to get the mask
+        shifted down by that many cells (and keep the integers small)."""
+        if self.tabled:
+            return self.table(length)[2 * cell + across]
+        if not self.fits(length, cell, across):
+            return None
+        return self.run(length, across) << (cell - base)
+
+    def halo(self, length, cell, across, base=0):
+        if self.tabled:
+            return self.halo_table(length)[2 * cell + across]
+        return self.dilate(self.ship(length, cell, across, base))
+
+    def dilate(self, mask):
+        """mask plus every cell next to it, diagonals included."""
+        column = mask | (mask & self.not_bottom) << 1 | (mask & self.not_top) >> 1
+        return (column | column << self.height | column >> self.height) & self.board
+
+    # === VALIDATION ===
+    def mask(self, positions):
+        """Bitmask of [x, y] cells, or None if any is not a pair of ints,
+        is off the board or is listed twice."""
+        mask = 0
+        width, height = self.width, self.height
+        try:
+            for x, y in positions:
+                if not (type(x) is int and type(y) is int and 0 <= x < width and 0 <= y < height):
+                    return None
+                bit = 1 << (x * height + y)
+                if mask & bit:
+                    return None
+                mask |= bit
+        except (TypeError, ValueError):  # not a pair
+            return None
+        return mask
+
+    def greedy(self, mask):
+        """Cut mask into ships from the lowest cell up, each as long as
+        its line of cells; True if that gives exactly the fleet (and,
+        under no_touch, no ship touches the rest)."""
+        height = self.height
+        counts = dict(self.fleet_counts)
+        remaining = mask
+        while remaining:
+            low = (remaining & -remaining).bit_length() - 1
+            # A ship cell below means this ship lies down
+            across = not ((low + 1) % height and remaining >> (low + 1) & 1)
+            step = height if across else 1
+            length = 1
+            while remaining >> (low + length * step) & 1 and (across or (low + length) % height):
+                length += 1
+            if not counts.get(length):
+                return False
+            ship = self.ship(length, low, across)
+            if self.no_touch and self.halo(length, low, across) & (remaining ^ ship):
+                return False
+            remaining ^= ship
+            counts[length] -= 1
+        return True
+
+    def cell_set(self, positions):
+        """Set of cell indices of [x, y] cells, or None if any is not a
+        pair of ints, is off the board or is listed twice."""
+        cells = set()
+        width, height = self.width, self.height
+        try:
+            for x, y in positions:
+                if not (type(x) is int and type(y) is int and 0 <= x < width and 0 <= y < height):
+                    return None
+                cells.add(x * height + y)
+        except (TypeError, ValueError):  # not a pair
+            return None
+        if len(cells) != len(positions):
+            return None
+        return cells
+
+    def in_order(self, positions):
+        """cell_set() that also cuts the cells, as listed, into runs of
+        consecutive cells in a straight line. Returns (set of cells,
+        {length: runs}), or None as cell_set() does."""
+        cells = set()
+        add = cells.add
+        runs = {}
+        width, height = self.width, self.height
+        px = py = dx = dy = length = 0
+        try:
+            for x, y in positions:
+                if not (type(x) is int and type(y) is int and 0 <= x < width and 0 <= y < height):
+                    return None
+                add(x * height + y)
+                if x - px == dx and y - py == dy:
+                    length += 1
+                elif length == 1 and abs(x - px) + abs(y - py) == 1:
+                    dx, dy, length = x - px, y - py, 2  # the run's second cell
+                else:
+                    if length:
+                        runs[length] = runs.get(length, 0) + 1
+                    dx = dy = 0
+                    length = 1
+                px, py = x, y
+        except (TypeError, ValueError):  # not a pair
+            return None
+        if length:
+            runs[length] = runs.get(length, 0) + 1
+        if len(cells) != len(positions):
+            return None
+        return cells, runs
+
+    def lines(self, cells):
+        """Straight lines of cells from the first cell of each (the one
+        with no cell above it or to its left), as long as they go. Returns
+        the lines no other cell touches, diagonals included, as (first
+        cell, length, across), and the first cells of the other lines.
+        One lookup or two per cell and a few range lookups per line; no
+        masks, so it costs the same on any board size."""
+        height = self.height
+        alone, touched = [], []
+        for cell in cells:
+            y = cell % height
+            if y and cell - 1 in cells or cell - height in cells:
+                continue
+            end = cell + 1
+            if y + 1 < height and end in cells:
+                while end % height and end in cells:
+                    end += 1
+                # the columns beside it, from the row above to the row below
+                top, bottom = cell - (y > 0), end + (end % height > 0)
+                if (cells.isdisjoint(range(top - height, bottom - height))
+                        and cells.isdisjoint(range(top + height, bottom + height))):
+                    alone.append((cell, end - cell, 0))
+                    continue
+            else:
+                end = cell + height
+                while end in cells:
+                    end += height
+                # the rows above and below it, from the column before to the one after
+                if ((not y or cells.isdisjoint(range(cell - height - 1, end + height - 1, height)))
+                        and (y + 1 == height
+                             or cells.isdisjoint(range(cell - height + 1, end + height + 1, height)))):
+                    alone.append((cell, (end - cell) // height, 1))
+                    continue
+            touched.append(cell)
+        return alone, touched
+
+    def groups(self, cells, seeds):
+        """The groups of touching cells (diagonals included) in the set
+        cells that hold any of seeds, as lists of cells."""
+        height = self.height
+        groups = []
+        seen = set()
+        for seed in seeds:
+            if seed in seen:
+                continue
+            seen.add(seed)
+            stack = [seed]
+            group = []
+            while stack:
+                cell = stack.pop()
+                group.append(cell)
+                x, y = divmod(cell, height)
+                for nx in (x - 1, x, x + 1):
+                    for ny in (y - 1, y, y + 1):
+                        near = nx * height + ny
+                        if near in cells and near not in seen and 0 <= ny < height:
+                            seen.add(near)
+                            stack.append(near)
+            groups.append(group)
+        return groups
+
+    def is_valid(self, positions):
+        if not isinstance(positions, list) or len(positions) != self.cells:
+            return False
+        if self.tabled:
+            mask = self.mask(positions)
+            if mask is None:
+                return False
+            if self.greedy(mask):
+                return True
+            cells = self.cell_set(positions)
+        else:
+            read = self.in_order(positions)
+            if read is None:
+                return False
+            cells, runs = read
+            # Clients list each ship's cells together. If that order cuts
+            # the cells into exactly the fleet, it is legal when ships may
+            # touch, without looking at any cell's neighbours.
+            if runs == self.fleet_counts and not self.no_touch:
+                return True
+        alone, touched = self.lines(cells)
+        counts = dict(self.fleet_counts)
+        whole = []  # lines alone that are a ship of the fleet
+        masks = []  # (base, mask shifted down by base) per group to cut up
+        for low, length, across in alone:
+            if counts.get(length):
+                counts[length] -= 1
+                whole.append((low, length, across))
+            else:
+                masks.append(self.line_mask(low, length, across))
+        for group in self.groups(cells, touched):
+            base = 0 if self.tabled else min(group) // self.height * self.height
+            masks.append((base, bits(cell - base for cell in group)))
+        # Usually every line stands alone and is a ship. If not, try
+        # cutting up only the others before trying every way of cutting
+        # up all of them.
+        return (self.split(masks, [counts[length] for length in self.lengths])
+                or bool(whole) and self.split(
+                    [self.line_mask(*line) for line in whole] + masks, self.counts))
+
+    def line_mask(self, low, length, across):
+        """A line of cells as split() takes it: (base, mask)."""
+        base = 0 if self.tabled else low - low % self.height
+        return base, self.run(length, across) << (low - base)
+
+    def split(self, masks, counts):
+        """Whether the groups, (base, mask) each, can be cut into exactly
+        counts ships of each length. Depth first, longest ships first, so
+        a legal fleet usually takes one step per ship; states that led
+        nowhere are not tried again."""
+        options = [(i, across) for i, length in enumerate(self.lengths)
+                   for across in ((1, 0) if length > 1 else (0,))]
+        options.reverse()  # pushed in this order, so longest first off the stack
+        height = self.height
+        stack = [(0, masks[0][1], tuple(counts))] if masks else []
+        seen = set()
+        steps = 0
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            group, remaining, owed = state
+            if not remaining:
+                group += 1
+                if group == len(masks):
+                    return True
+                stack.append((group, masks[group][1], owed))
+                continue
+            steps += 1
+            if steps > MAX_SPLIT_STEPS:
+                return False
+            base = masks[group][0]
+            low = (remaining & -remaining).bit_length() - 1
+            # Cells next to low across / down, needed by any ship longer
+            # than one cell
+            beside = (remaining >> (low + height) & 1,
+                      (low + 1) % height and remaining >> (low + 1) & 1)
+            for i, across in options:
+                length = self.lengths[i]
+                if not owed[i] or length > 1 and not beside[across ^ 1]:
+                    continue
+                ship = self.ship(length, low + base, across, base)
+                if ship is None or ship & remaining != ship:
+                    continue
+                rest = remaining ^ ship
+                if self.no_touch and self.halo(length, low + base, across, base) & rest:
+                    continue
+                stack.append((group, rest, owed[:i] + (owed[i] - 1,) + owed[i + 1:]))
+        return not masks
+
+    # === RANDOM FLEETS ===
+    def draw(self, length, rng):
+        """A random (cell, across) for a ship of length that fits the board."""
+        across = rng.random() < 0.5 if length <= min(self.width, self.height) \
+            else length <= self.width
+        # one draw for both coordinates; random() is several times cheaper
+        # than randrange() and its bias is far below 1 in 10**9 here
+        random = rng.random
+        if across:
+            x, y = divmod(int(random() * ((self.width - length + 1) * self.height)), self.height)
+        else:
+            rows = self.height - length + 1
+            x, y = divmod(int(random() * (self.width * rows)), rows)
+        return x * self.height + y, across
+
+    def place(self, length, taken, rng):
+        """A random placement clear of the taken mask, or None if there is
+        none."""
+        for _ in range(DRAWS_PER_SHIP):
+            cell, across = self.draw(length, rng)
+            if not self.ship(length, cell, across) & taken:
+                return cell, across
+        # Crowded board: pick among every placement that is still free
+        free = [index for index, ship in enumerate(self.table(length))
+                if ship is not None and not ship & taken]
+        if not free:
+            return None
+        index = rng.choice(free)
+        return index >> 1, index & 1
+
+    def place_in_set(self, length, taken, rng):
+        """place() for boards without tables: taken is a set of cells."""
+        for _ in range(DRAWS_PER_SHIP):
+            cell, across = self.draw(length, rng)
+            step = self.height if across else 1
+            if taken.isdisjoint(range(cell, cell + length * step, step)):
+                return cell, across
+        return None
+
+    def random_fleet(self, rng=random):
+        """[x, y] cells of a random legal fleet. Raises ValueError if the
+        fleet does not fit after FLEET_ATTEMPTS tries."""
+        height = self.height
+        for _ in range(FLEET_ATTEMPTS):
+            # Ship cells, or with no_touch their halos: a mask, or on large
+            # boards a set (masks there would be megabits each)
+            taken = 0 if self.tabled else set()
+            positions = []
+            for length in self.fleet:
+                if self.tabled:
+                    placed = self.place(length, taken, rng)
+                else:
+                    placed = self.place_in_set(length, taken, rng)
+                if placed is None:
+                    break
+                cell, across = placed
+                x, y = divmod(cell, height)
+                cells = [[x + i, y] if across else [x, y + i] for i in range(length)]
+                positions += cells
+                if self.tabled:
+                    taken |= (self.halo if self.no_touch else self.ship)(length, cell, across)
+                elif self.no_touch:
+                    taken.update((x + dx) * height + y + dy for x, y in cells
+                                 for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                                 if 0 <= y + dy < height)
+                else:
+                    step = height if across else 1
+                    taken.update(range(cell, cell + length * step, step))
+            else:
+                return positions
+        raise ValueError("Could not place fleet")
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def cached_table(width, height, fleet, no_touch):
+    return FleetTable(width, height, fleet, no_touch)
+
+
+def fleet_table(width, height, fleet, no_touch=False):
+    return cached_table(width, height, tuple(sorted(fleet)), no_touch)
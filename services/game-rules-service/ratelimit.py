@@ -0,0 +1,79 @@
+"""Flood control for Socket.IO events: token buckets and outbound limits.
+
+RateLimiter keeps a token bucket per key (a connection's sid, or a user
+id across all of that user's connections): up to burst events at once,
+refilled at rate events per second. allow() is one dict lookup and a
+little arithmetic, so it runs in front of every event; an event it
+refuses is answered with an error before the handler decodes tokens,
+takes locks or touches the game. A bucket is a [tokens, last refill]
+list updated without a lock: two events of the same key racing on two
+threads may both spend the same token, which only makes the limit a
+little loose, never blocks anyone else.
+
+A bucket that has been idle long enough to be full again is the same as
+no bucket, so sweep() drops those and memory follows active keys only.
+
+drop_slow(): the outbound side. Engine.IO queues every packet for a
+connection until its writer sends it, without bound, so a client that
+sends events but never reads (or a dead network path) would grow the
+server's memory with every broadcast. A connection with more than
+max_queue packets unsent is closed instead; the client reconnects and
+catches up with resync, as after any other disconnect.
+"""
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate, burst):
+        self.rate = rate  # events per second; 0 = no limit
+        self.burst = burst
+        self.buckets = {}  # key -> [tokens, monotonic time of last refill]
+        self.rejected = 0
+
+    def allow(self, key):
+        """Spend one token of key's bucket; False if it is empty."""
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = [self.burst - 1, now]
+            return True
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            self.rejected += 1
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def forget(self, key):
+        self.buckets.pop(key, None)
+
+    def sweep(self, now=None):
+        """Drop buckets that have refilled completely. Returns how many."""
+        now = time.monotonic() if now is None else now
+        full = [key for key, (tokens, last) in list(self.buckets.items())
+                if tokens + (now - last) * self.rate >= self.burst]
+        for key in full:
+            self.buckets.pop(key, None)
+        return len(full)
+
+    def stats(self):
+        return {"rate": self.rate, "burst": self.burst,
+                "buckets": len(self.buckets), "rejected": self.rejected}
+
+
+def drop_slow(eio_server, max_queue):
+    """Close every connection with more than max_queue packets unsent.
+    Returns the Engine.IO sids closed."""
+    closed = []
+    for eio_sid, socket in list(eio_server.sockets.items()):
+        if not socket.closed and socket.queue.qsize() > max_queue:
+            # abort: don't queue a CLOSE packet behind the backlog or wait
+            # for the writer to drain it
+            socket.close(wait=False, abort=True)
+            eio_server.sockets.pop(eio_sid, None)
+            closed.append(eio_sid)
+    return closed
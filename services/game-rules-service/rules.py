@@ -0,0 +1,139 @@
+"""The rules of Battleship, free of Flask, Socket.IO and the engine.
+
+A game is a plain dict (see new_game); the functions here validate and
+apply one action to it and return an error message for illegal ones, so
+the same rules serve the server (engine.py wraps them with messages,
+journaling and locking) and offline tools (simulate.py, bots).
+
+    game = new_game(1, 2, 10, 10, [5, 4, 3, 3, 2])
+    place_ships(game, 1, positions1)
+    place_ships(game, 2, positions2)
+    error, hit = fire(game, 1, 3, 4)   # game["current_turn"] is now 2
+
+Player 1 fires first and turns alternate after every legal shot; the
+first player to hit every ship cell of the opponent wins.
+
+In the salvo variant (new_game(..., salvo=n), n > 1) a turn is n shots
+fired together with fire_salvo(); only the last salvo of a game may be
+shorter, when fewer cells than that are left to fire at. Shot i of a game
+(from 0) is then fired by player 1 if i // n is even.
+"""
+import random
+
+from board import create_board
+from placement import fleet_table
+
+
+def new_game(player1, player2, width, height, fleet, no_touch=False, salvo=1):
+    return {
+        "player1": player1,
+        "player2": player2,
+        "width": width,
+        "height": height,
+        "fleet": fleet,
+        "no_touch": no_touch,  # ships may not touch, not even diagonally
+        "salvo": salvo,  # shots per turn
+        "board1": create_board(width, height),  # Player 1
+        "board2": create_board(width, height),  # Player 2
+        "ships1": None,
+        "ships2": None,
+        "current_turn": player1,
+        "winner": None,
+    }
+
+
+def other_player(game, user_id):
+    return game["player2"] if user_id == game["player1"] else game["player1"]
+
+
+def is_valid_placement(board, fleet, positions, no_touch=False):
+    """All of a player's ship cells: on the board, no cell twice, and
+    exactly the fleet's ships, each a straight line across or down (see
+    placement.py)."""
+    return fleet_table(board.width, board.height, fleet, no_touch).is_valid(positions)
+
+
+def random_placement(game, rng=random):
+    """Ship cells of a random legal fleet for game. Raises ValueError if
+    none is found."""
+    return fleet_table(game["width"], game["height"], game["fleet"],
+                       game.get("no_touch", False)).random_fleet(rng)
+
+
+def place_ships(game, user_id, positions):
+    """Place user_id's fleet. Returns an error message or None."""
+    if user_id == game["player1"]:
+        board, ships_key = game["board1"], "ships1"
+    elif user_id == game["player2"]:
+        board, ships_key = game["board2"], "ships2"
+    else:
+        return "Not a player in this game"
+    if game[ships_key] is not None:
+        return "Ships already placed"
+    # Games restored from snapshots older than the rule lack no_touch
+    if not is_valid_placement(board, game["fleet"], positions, game.get("no_touch", False)):
+        return "Invalid ship placement"
+    board.place_ships(positions)
+    game[ships_key] = positions
+    return None
+
+
+def ready(game):
+    """Both fleets are placed; the first shot may be fired."""
+    return game["ships1"] is not None and game["ships2"] is not None
+
+
+def check_turn(game, user_id):
+    """Why user_id may not fire now, or None."""
+    if game["winner"] is not None:
+        return "Game is over"
+    if user_id != game["current_turn"]:
+        return "Not your turn"
+    if not ready(game):
+        return "Ships not placed yet"
+    return None
+
+
+def target_board(game, user_id):
+    return game["board2"] if user_id == game["player1"] else game["board1"]
+
+
+def fire(game, user_id, x, y):
+    """user_id fires at (x, y) on the opponent's board. Returns
+    (error message or None, hit). A legal shot passes the turn and, if it
+    sinks the last ship cell, sets game["winner"]."""
+    failure = check_turn(game, user_id)
+    if failure:
+        return failure, False
+    opponent = other_player(game, user_id)
+    opponent_board = target_board(game, user_id)
+    if not (type(x) is int and type(y) is int and opponent_board.in_bounds(x, y)):
+        return "Invalid coordinates", False
+    hit = opponent_board.fire(x, y)
+    if hit is None:
+        return "Already fired here", False
+    game["current_turn"] = opponent
+    if opponent_board.all_ships_sunk():
+        game["winner"] = user_id
+    return None, hit
+
+
+def fire_salvo(game, user_id, positions):
+    """user_id fires at every [x, y] of positions at once. Returns (error
+    message or None, [hit per shot]). The salvo is checked as a whole and
+    either fired entirely or not at all; it then passes the turn and, if
+    it leaves no ship cell unhit, sets game["winner"]."""
+    failure = check_turn(game, user_id)
+    if failure:
+        return failure, []
+    size = game.get("salvo", 1)
+    opponent_board = target_board(game, user_id)
+    if len(positions) != min(size, opponent_board.unfired()):
+        return f"Wrong salvo size: {size} per turn", []
+    hits = opponent_board.fire_cells(positions)
+    if hits is None:
+        return "Invalid coordinates or already fired here", []
+    game["current_turn"] = other_player(game, user_id)
+    if opponent_board.all_ships_sunk():
+        game["winner"] = user_id
+    return None, hits
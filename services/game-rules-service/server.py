@@ -1,141 +1,398 @@
+import os
+
+# Serving backend: "threading" (Werkzeug dev server, default), "eventlet" or
+# "gevent". The async backends must monkey-patch before anything else is
+# imported so that sockets, and therefore requests, become cooperative.
+ASYNC_MODE = os.environ.get("GAME_ASYNC_MODE", "threading")
+# Max concurrent green threads (connections + in-flight handlers) per process
+WORKERS = int(os.environ.get("GAME_WORKERS", "20000"))
+# Game state worker processes; 0 or 1 keeps games in this process
+SHARDS = int(os.environ.get("GAME_SHARDS", "0"))
+# Directory for the move journal and snapshots; unset keeps games in memory only
+JOURNAL_DIR = os.environ.get("GAME_JOURNAL_DIR")
+# Eviction: seconds a finished game's summary is kept, seconds before an
+# untouched game counts as abandoned, and max bytes of games per process
+# (each shard worker is a process; 0 = no limit)
+LIMITS = {
+    "finished_ttl": float(os.environ.get("GAME_FINISHED_TTL", "600")),
+    "idle_ttl": float(os.environ.get("GAME_IDLE_TTL", "3600")),
+    "memory_budget": int(os.environ.get("GAME_MEMORY_BUDGET", "0")),
+}
+# Packed clients get a room's broadcasts coalesced into one frame per tick;
+# 0 sends each event's messages at once (one frame per event)
+TICK = float(os.environ.get("GAME_TICK_MS", "0")) / 1000
+# Spectators get updates coalesced per tick; one whose connection has more
+# than SPECTATOR_BACKLOG packets unsent skips updates until it catches up
+SPECTATOR_TICK = float(os.environ.get("GAME_SPECTATOR_TICK_MS", "100")) / 1000
+SPECTATOR_BACKLOG = int(os.environ.get("GAME_SPECTATOR_BACKLOG", "64"))
+# Flood control: each connection may send GAME_RATE_LIMIT events per second
+# in bursts of up to GAME_RATE_BURST, and each user GAME_USER_RATE_LIMIT
+# over all of their connections (0 = no limit). A connection with more than
+# GAME_OUTBOUND_LIMIT packets waiting to be sent is closed (0 = no limit).
+RATE_LIMIT = float(os.environ.get("GAME_RATE_LIMIT", "50"))
+RATE_BURST = int(os.environ.get("GAME_RATE_BURST", "100"))
+USER_RATE_LIMIT = float(os.environ.get("GAME_USER_RATE_LIMIT", "100"))
+USER_RATE_BURST = int(os.environ.get("GAME_USER_RATE_BURST", "200"))
+OUTBOUND_LIMIT = int(os.environ.get("GAME_OUTBOUND_LIMIT", "1000"))
+# Fleet rule for new games: ships may not touch, not even diagonally
+NO_TOUCH = os.environ.get("GAME_NO_TOUCH", "0") == "1"
+# Port for internal endpoints (cache invalidation), on 127.0.0.1 only:
+# the public port takes browser traffic from any origin
+INTERNAL_PORT = int(os.environ.get("GAME_INTERNAL_PORT", "3013"))
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+
+import functools
+import sys
+import time
+
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
-import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from service_client import (ServiceClient, ServiceError, ServiceResponse, invalidation_blueprint,
+                            serve_internal)
+from tokens import authenticate, check_secret, verify_token
+from metrics import (REGISTRY, instrument_app, instrument_socketio, process_gauges,
+                     start_lag_monitor)
+
+from board import MAX_SALVO, board_config
+from engine import EVICT_INTERVAL, RESULT, GameEngine
+from journal import Journal
+from leaderboard import MAX_PAGE, Leaderboard
+from ratelimit import RateLimiter, drop_slow
+from spectators import SpectatorHub
+from wire import PACKED, FrameBatcher, encode_frame, unpack_cells
 
 app = Flask(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
 
-# In-memory games
-games = {}  # room_id -> game state
+# In-memory games; create_engine() swaps in the configured engine at startup
+engine = GameEngine()
 ROOM_SERVICE_URL = "http://localhost:3002"
+room_service = ServiceClient("room-service", ROOM_SERVICE_URL)
+USER_SERVICE_URL = "http://localhost:3001"
+user_service = ServiceClient("user-service", USER_SERVICE_URL)
+instrument_app(app)
+internal_app = Flask("game_rules_internal")
+internal_app.register_blueprint(invalidation_blueprint(room_service, user_service))
 
-# 5x5 empty board
-EMPTY = 0
-SHIP = 1
-HIT = 2
-MISS = 3
-
-def create_board():
-    return [[EMPTY for _ in range(5)] for _ in range(5)]
-
-def place_ship(board, positions):
-    for x, y in positions:
-        board[x][y] = SHIP
-
-def is_valid_placement(board, positions):
-    for x, y in positions:
-        if not (0 <= x < 5 and 0 <= y < 5) or board[x][y] != EMPTY:
-            return False
-    return True
-
-def fire(board, x, y):
-    if board[x][y] == SHIP:
-        board[x][y] = HIT
-        return True
-    elif board[x][y] == EMPTY:
-        board[x][y] = MISS
-        return False
-    return None  # Already fired
-
-def all_ships_sunk(board):
-    return all(cell != SHIP for row in board for cell in row)
+# Connections that negotiated the packed encoding. They join the game's
+# "<roomId>:packed" Socket.IO room instead of "<roomId>".
+packed_sids = set()
+batcher = FrameBatcher(lambda room, frame: socketio.emit('frame', frame, to=room),
+                       TICK, socketio.start_background_task, socketio.sleep)
+spectators = SpectatorHub(socketio.server, lambda room_id: engine.spectate(room_id),
+                          SPECTATOR_TICK, SPECTATOR_BACKLOG,
+                          socketio.start_background_task, socketio.sleep)
+leaderboard = Leaderboard()
+connection_limiter = RateLimiter(RATE_LIMIT, RATE_BURST)  # by sid
+user_limiter = RateLimiter(USER_RATE_LIMIT, USER_RATE_BURST)  # by user id
+limit_counters = {"slowConnectionsClosed": 0}
+OUTBOUND_INTERVAL = 1  # seconds between checks of the outbound queues
+
+REGISTRY.gauge("battleship_games", "Games in memory", ("state",), fn=lambda: engine.sizes())
+REGISTRY.gauge("battleship_connections", "Open Socket.IO connections",
+               fn=lambda: sum(not s.closed for s in list(socketio.server.eio.sockets.values())))
+REGISTRY.gauge("battleship_spectators", "Spectating connections",
+               fn=lambda: len(spectators.watching))
+RATE_LIMITED = REGISTRY.counter("battleship_rate_limited_total",
+                                "Socket.IO events refused by a rate limit", ("scope",))
+SLOW_CLOSED = REGISTRY.counter("battleship_slow_connections_closed_total",
+                               "Connections closed with too many packets unsent")
+REGISTRY.gauge("battleship_ranked_players", "Players on the leaderboard",
+               fn=lambda: len(leaderboard.players))
 
 @app.route('/games/<int:room_id>/start', methods=['POST'])
 def start_game(room_id):
-    # Validate room exists and is full
-    resp = requests.get(f"{ROOM_SERVICE_URL}/rooms/{room_id}")
+    try:
+        width, height, fleet, salvo = board_config(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Validate room exists. A full room's players never change, so that
+    # answer is cached.
+    try:
+        resp = room_service.get(
+            f"/rooms/{room_id}",
+            cache_if=lambda status, data: status == 200 and data.get("status") == "full")
+    except ServiceError:
+        return jsonify({"error": "Room service unavailable"}), 503
     if resp.status_code != 200:
         return jsonify({"error": "Room not found"}), 404
-    room = resp.json()
-    if room.get("status") != "full":
-        return jsonify({"error": "Room not full"}), 400
-
-    p1 = room["player1_id"]
-    p2 = room["player2_id"]
-
-    games[room_id] = {
-        "board1": create_board(),  # Player 1
-        "board2": create_board(),  # Player 2
-        "ships1": None,
-        "ships2": None,
-        "current_turn": p1,
-        "winner": None
-    }
-    return jsonify({"message": "Game started", "roomId": room_id})
+
+    body, status = engine.start(room_id, resp.data, width, height, fleet, salvo)
+    return jsonify(body), status
+
+@app.route('/games/<int:room_id>/state', methods=['GET'])
+def game_state(room_id):
+    # ?since=<version> for just the events after it; with the player's
+    # session token the snapshot includes their own ships. A bare userId
+    # proves nothing, so it only gets the public shot history.
+    token = request.args.get("token")
+    user_id = verify_token(token) if token is not None else None
+    state = engine.sync(room_id, user_id, request.args.get("since", type=int))
+    if state is None:
+        return jsonify({"error": "Game not found"}), 404
+    return jsonify(state)
+
+@app.route('/games/stats', methods=['GET'])
+def game_stats():
+    return jsonify(dict(engine.stats(), spectators=spectators.stats(),
+                        leaderboard=leaderboard.stats(), limits=limit_stats()))
+
+def limit_stats():
+    return dict(limit_counters, connection=connection_limiter.stats(),
+                user=user_limiter.stats(), outboundLimit=OUTBOUND_LIMIT)
+
+def usernames(ids):
+    """user id -> username, in one batch request for the ids not cached.
+    Usernames never change, so they are cached like /users/<id>."""
+    names, missing = {}, []
+    for user_id in ids:
+        cached = user_service.cache.get(f"/users/{user_id}")
+        if cached is None:
+            missing.append(user_id)
+        else:
+            names[user_id] = cached.data["username"]
+    if missing:
+        try:
+            resp = user_service.post("/users/batch", json={"ids": missing})
+        except ServiceError:
+            return names  # the ranking is still served, without those names
+        if resp.status_code == 200:
+            for user in resp.data["users"]:
+                user_service.cache.set(f"/users/{user['id']}", ServiceResponse(200, user))
+                names[user["id"]] = user["username"]
+    return names
+
+@app.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", 20, type=int)
+    if offset < 0 or not 0 < limit <= MAX_PAGE:
+        return jsonify({"error": f"offset must be >= 0 and limit 1-{MAX_PAGE}"}), 400
+    total, rows = leaderboard.page(offset, limit)
+    names = usernames([user_id for _, user_id, _ in rows])
+    return jsonify({"total": total, "offset": offset, "players": [
+        dict(stats, rank=rank, userId=user_id, username=names.get(user_id))
+        for rank, user_id, stats in rows]})
+
+@app.route('/leaderboard/users/<int:user_id>', methods=['GET'])
+def get_player_stats(user_id):
+    found = leaderboard.player(user_id)
+    if found is None:
+        return jsonify({"error": "No finished games"}), 404
+    rank, stats = found
+    return jsonify(dict(stats, rank=rank, userId=user_id,
+                        username=usernames([user_id]).get(user_id)))
+
+def create_engine():
+    if SHARDS > 1:
+        from sharding import ShardedEngine
+        # workers evict themselves
+        return ShardedEngine(SHARDS, JOURNAL_DIR, no_touch=NO_TOUCH, **LIMITS)
+    if JOURNAL_DIR:
+        created = GameEngine(Journal(JOURNAL_DIR), no_touch=NO_TOUCH, **LIMITS)
+        replayed = created.recover()
+        print(f"Recovered {len(created.games) + len(created.finished)} games "
+              f"({replayed} journal records)")
+    else:
+        created = GameEngine(no_touch=NO_TOUCH, **LIMITS)
+    socketio.start_background_task(evict_loop, created)
+    return created
+
+def flood_loop():
+    # Close connections that stopped reading; now and then forget the
+    # rate limit buckets that have refilled
+    next_sweep = time.monotonic() + EVICT_INTERVAL
+    while True:
+        socketio.sleep(OUTBOUND_INTERVAL)
+        if OUTBOUND_LIMIT:
+            closed = len(drop_slow(socketio.server.eio, OUTBOUND_LIMIT))
+            if closed:
+                limit_counters["slowConnectionsClosed"] += closed
+                SLOW_CLOSED.inc(closed)
+        if time.monotonic() >= next_sweep:
+            connection_limiter.sweep()
+            user_limiter.sweep()
+            next_sweep = time.monotonic() + EVICT_INTERVAL
+
+def evict_loop(engine):
+    while True:
+        socketio.sleep(EVICT_INTERVAL)
+        engine.evict()
+
+def deliver(room_id, messages):
+    room = str(room_id)
+    packed = request.sid in packed_sids
+    replies, broadcasts = [], []
+    for event, payload, to_room in messages:
+        if event == RESULT:  # for the leaderboard, not the players
+            leaderboard.record(payload)
+            continue
+        if event in ('joined', 'resync'):
+            join_room(f"{room}:{PACKED}" if packed else room)
+        if to_room:
+            emit(event, payload, room=room)  # JSON subscribers
+            broadcasts.append((event, payload))
+        elif packed:
+            replies.append((event, payload))
+        else:
+            emit(event, payload)
+    if replies:
+        emit('frame', encode_frame(replies))
+    if broadcasts:
+        batcher.add(f"{room}:{PACKED}", broadcasts)
+        spectators.publish(room_id, broadcasts)
+
+def too_many(scope):
+    RATE_LIMITED.labels(scope).inc()
+    emit('error', {'message': 'Too many events, slow down'})
+
+def limited(handler):
+    # The connection's rate limit, checked before the handler does any work
+    @functools.wraps(handler)
+    def checked(data):
+        if not connection_limiter.allow(request.sid):
+            too_many("connection")
+            return
+        return handler(data)
+    return checked
+
+def authorized(data):
+    """The caller's user id, or None once they have been told why not."""
+    user_id = authenticate(data)
+    if user_id is None:
+        emit('error', {'message': 'Invalid session token'})
+        return None
+    if not user_limiter.allow(user_id):
+        too_many("user")
+        return None
+    return user_id
+
+@socketio.on('disconnect')
+def on_disconnect():
+    packed_sids.discard(request.sid)
+    connection_limiter.forget(request.sid)
+    spectators.unwatch(request.sid)
 
 @socketio.on('join-game')
+@limited
 def on_join(data):
     room_id = data['roomId']
-    user_id = data['userId']
-    if room_id not in games:
-        emit('error', {'message': 'Game not started'})
+    user_id = authorized(data)
+    if user_id is None:
         return
-    join_room(str(room_id))
-    emit('joined', {'roomId': room_id, 'yourId': user_id})
+    if data.get('encoding') == PACKED:
+        packed_sids.add(request.sid)
+    deliver(room_id, engine.join(room_id, user_id))
 
-@socketio.on('place-ships')
-def on_place_ships(data):
+@socketio.on('resync')
+@limited
+def on_resync(data):
+    # A reconnecting player: rejoins like join-game and gets the events
+    # after data['version'], or a snapshot
     room_id = data['roomId']
-    user_id = data['userId']
-    positions = data['positions']  # [[x,y], [x,y]]
-
-    if room_id not in games:
-        emit('error', {'message': 'Game not found'})
+    user_id = authorized(data)
+    if user_id is None:
         return
+    if data.get('encoding') == PACKED:
+        packed_sids.add(request.sid)
+    # Own ships only for a verified token, not a bare userId
+    deliver(room_id, engine.resync(room_id, user_id, data.get('version'),
+                                   data.get('token') is not None))
 
-    game = games[room_id]
-    board = game['board1'] if user_id == game['current_turn'] else game['board2']
+@socketio.on('spectate-game')
+@limited
+def on_spectate(data):
+    # Open to anyone: spectators never see ships before game-over
+    spectators.watch(request.sid, data['roomId'], data.get('encoding') == PACKED)
 
-    if not is_valid_placement(board, positions):
-        emit('error', {'message': 'Invalid ship placement'})
+@socketio.on('place-ships')
+@limited
+def on_place_ships(data):
+    room_id = data['roomId']
+    user_id = authorized(data)
+    if user_id is None:
         return
-
-    place_ship(board, positions)
-    if user_id == list(game.keys())[2]:  # p1
-        game['ships1'] = positions
+    if 'cells' in data:  # packed clients: base64 of x/y u16 pairs
+        positions = unpack_cells(data['cells'])
+        if positions is None:
+            emit('error', {'message': 'Invalid ship placement'})
+            return
+    elif data.get('random'):  # quick play: the server picks the fleet
+        positions = None
     else:
-        game['ships2'] = positions
-
-    emit('ships-placed', {'userId': user_id}, room=str(room_id))
-
-    # Check if both placed
-    if game['ships1'] and game['ships2']:
-        emit('game-ready', {'turn': game['current_turn']}, room=str(room_id))
+        positions = data.get('positions')  # [[x,y], [x,y]]
+        if not (isinstance(positions, list) and all(
+                isinstance(cell, list) and len(cell) == 2 and all(type(c) is int for c in cell)
+                for cell in positions)):
+            emit('error', {'message': 'Invalid ship placement'})
+            return
+    deliver(room_id, engine.place_ships(room_id, user_id, positions))
 
 @socketio.on('fire')
+@limited
 def on_fire(data):
     room_id = data['roomId']
-    user_id = data['userId']
-    x, y = data['x'], data['y']
-
-    if room_id not in games:
+    user_id = authorized(data)
+    if user_id is None:
         return
-    game = games[room_id]
-    if user_id != game['current_turn']:
-        emit('error', {'message': 'Not your turn'})
+    x, y = data.get('x'), data.get('y')
+    if not (type(x) is int and type(y) is int):  # not bool, float or str
+        emit('error', {'message': 'Invalid coordinates'})
         return
+    deliver(room_id, engine.fire(room_id, user_id, x, y))
 
-    opponent_board = game['board2'] if user_id == list(game.keys())[2] else game['board1']
-    result = fire(opponent_board, x, y)
-    if result is None:
-        emit('error', {'message': 'Already fired here'})
+@socketio.on('fire-salvo')
+@limited
+def on_fire_salvo(data):
+    # A whole turn at once: checked and applied in one pass, answered with
+    # one salvo-update (or game-over) for the room
+    room_id = data['roomId']
+    user_id = authorized(data)
+    if user_id is None:
         return
+    if 'cells' in data:  # packed clients: base64 of x/y u16 pairs
+        shots = unpack_cells(data['cells'])
+    else:
+        shots = data.get('shots')  # [[x,y], [x,y]]
+    if not (isinstance(shots, list) and 0 < len(shots) <= MAX_SALVO and all(
+            isinstance(shot, list) and len(shot) == 2 and all(type(c) is int for c in shot)
+            for shot in shots)):
+        emit('error', {'message': 'Invalid salvo'})
+        return
+    deliver(room_id, engine.fire_salvo(room_id, user_id, shots))
 
-    hit = result
-    # Switch turn
-    game['current_turn'] = game['board2'] if user_id == list(game.keys())[2] else list(game.keys())[2]
+instrument_socketio(socketio)  # after every handler above is registered
 
-    # Check win
-    if all_ships_sunk(opponent_board):
-        game['winner'] = user_id
-        emit('game-over', {'winner': user_id}, room=str(room_id))
-    else:
-        emit('move-update', {
-            'hit': hit,
-            'x': x, 'y': y,
-            'turn': game['current_turn']
-        }, room=str(room_id))
+def start_monitors():
+    process_gauges(WORKERS if ASYNC_MODE != "threading" else 0)
+    start_lag_monitor(socketio.start_background_task, socketio.sleep)
+    socketio.start_background_task(flood_loop)
+
+def start_internal():
+    serve_internal(internal_app, INTERNAL_PORT, socketio.start_background_task)
 
 if __name__ == '__main__':
-    print("Game Rules Service running on http://localhost:3003 (WebSocket)")
-    socketio.run(app, port=3003, debug=True)
\ No newline at end of file
+    check_secret("Game Rules Service")
+    engine = create_engine()
+    start_monitors()
+    # The reloader would run a second engine (shard workers, journal)
+    reloader = ASYNC_MODE == "threading" and SHARDS <= 1 and not JOURNAL_DIR
+    if not reloader or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_internal()  # in the reloader's child, which serves, only
+    print(f"Game Rules Service running on http://localhost:3003 (WebSocket, {ASYNC_MODE})")
+    if ASYNC_MODE == "eventlet":
+        socketio.run(app, port=3003, log_output=False, max_size=WORKERS)
+    elif ASYNC_MODE == "gevent":
+        socketio.run(app, port=3003, log_output=False, spawn=WORKERS)
+    else:
+        # allow_unsafe_werkzeug: the dev server refuses to start without a TTY
+        socketio.run(app, port=3003, debug=True, use_reloader=reloader,
+                     allow_unsafe_werkzeug=True)
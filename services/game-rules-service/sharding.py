@@ -0,0 +1,153 @@
+"""Sharded game state: N worker processes, partitioned by room_id.
+
+ShardedEngine has the same methods as GameEngine. Each call is queued to
+the worker that owns the room and the worker's messages come back on a
+shared reply queue. Calls for one room always go to the same worker queue,
+so they are applied in order. The Socket.IO server stays in the front
+process, which delivers the returned messages, so room broadcasts still
+reach both players. The bus is plain multiprocessing queues; no external
+broker is needed. With a journal directory each worker journals its own
+games under shard-<n>/, so GAME_SHARDS must stay the same across restarts.
+"""
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from engine import EVICT_INTERVAL, GameEngine
+from journal import Journal
+
+CALL_TIMEOUT = 10  # seconds to wait for a shard before failing the event
+# Queues are read with a timeout: under eventlet/gevent the wait is then a
+# cooperative poll instead of a read that would block the whole hub.
+POLL_INTERVAL = 0.5
+
+
+class ShardError(Exception):
+    pass
+
+
+def worker_main(shard, requests, replies, journal_dir, limits):
+    if journal_dir:
+        engine = GameEngine(Journal(os.path.join(journal_dir, f"shard-{shard}")), **limits)
+        engine.recover()
+    else:
+        engine = GameEngine(**limits)
+    replies.put((None, "ready", None))
+    next_evict = time.monotonic() + EVICT_INTERVAL
+    while True:
+        if time.monotonic() >= next_evict:
+            engine.evict()
+            next_evict = time.monotonic() + EVICT_INTERVAL
+        try:
+            call = requests.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            if not multiprocessing.parent_process().is_alive():
+                return  # front process was killed without shutting us down
+            continue
+        if call is None:
+            return
+        call_id, method, args = call
+        try:
+            replies.put((call_id, getattr(engine, method)(*args), None))
+        except Exception as e:
+            replies.put((call_id, None, repr(e)))
+
+
+class ShardedEngine:
+    def __init__(self, shards, journal_dir=None, **limits):
+        # limits: GameEngine eviction and rule settings, applied per worker
+        ctx = multiprocessing.get_context("spawn")
+        self.shards = shards
+        self.requests = [ctx.Queue() for _ in range(shards)]
+        self.replies = ctx.Queue()
+        self.workers = [
+            ctx.Process(target=worker_main, args=(i, inbox, self.replies, journal_dir, limits),
+                        name=f"game-shard-{i}", daemon=True)
+            for i, inbox in enumerate(self.requests)
+        ]
+        for worker in self.workers:
+            worker.start()
+        # Don't accept events until every worker has loaded its games
+        for _ in self.workers:
+            self.replies.get(timeout=60)
+        self.pending = {}  # call id -> Future
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        threading.Thread(target=self.read_replies, daemon=True).start()
+
+    def shard_for(self, room_id):
+        return hash(room_id) % self.shards
+
+    def call(self, method, room_id, *args):
+        return self.call_shard(self.shard_for(room_id), method, room_id, *args)
+
+    def call_shard(self, shard, method, *args):
+        future = Future()
+        with self.lock:
+            call_id = next(self.ids)
+            self.pending[call_id] = future
+        self.requests[shard].put((call_id, method, args))
+        return future.result(timeout=CALL_TIMEOUT)
+
+    def read_replies(self):
+        while True:
+            try:
+                call_id, result, error = self.replies.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            with self.lock:
+                future = self.pending.pop(call_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(ShardError(error))
+            else:
+                future.set_result(result)
+
+    def start(self, room_id, room, width, height, fleet, salvo=1):
+        return self.call("start", room_id, room, width, height, fleet, salvo)
+
+    def join(self, room_id, user_id):
+        return self.call("join", room_id, user_id)
+
+    def place_ships(self, room_id, user_id, positions):
+        return self.call("place_ships", room_id, user_id, positions)
+
+    def fire(self, room_id, user_id, x, y):
+        return self.call("fire", room_id, user_id, x, y)
+
+    def fire_salvo(self, room_id, user_id, positions):
+        return self.call("fire_salvo", room_id, user_id, positions)
+
+    def spectate(self, room_id):
+        return self.call("spectate", room_id)
+
+    def sync(self, room_id, user_id=None, since=None):
+        return self.call("sync", room_id, user_id, since)
+
+    def resync(self, room_id, user_id, since=None, verified=True):
+        return self.call("resync", room_id, user_id, since, verified)
+
+    def sizes(self):
+        total = {}
+        for shard in range(self.shards):
+            for name, value in self.call_shard(shard, "sizes").items():
+                total[name] = total.get(name, 0) + value
+        return total
+
+    def stats(self):
+        """GameEngine.stats() summed over the workers, except memoryBudget:
+        every worker has the same one, for its own games."""
+        total = {}
+        for shard in range(self.shards):
+            stats = self.call_shard(shard, "stats")
+            for name, value in stats.items():
+                total[name] = total.get(name, 0) + value
+        total["memoryBudget"] = stats["memoryBudget"]
+        total["bytesPerLiveGame"] = total["liveBytes"] // max(1, total["live"])
+        total["bytesPerFinishedGame"] = total["finishedBytes"] // max(1, total["finished"])
+        return total
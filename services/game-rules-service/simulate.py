@@ -0,0 +1,246 @@
+"""Offline batch simulator: play millions of games without the server.
+
+Run from this directory:
+    python simulate.py --games 1000000 --workers 8 [--strategies random,hunt]
+                       [--width 10 --height 10 --fleet 5,4,3,3,2] [--verify 200]
+
+Games are played in chunks of --chunk at a time as stacked NumPy arrays:
+ships is a (games, cells) bool array per player, cell index x * height + y
+as in board.py. A player's shots never depend on the opponent's, so each
+strategy plays every board of a chunk to the end in lockstep and reports
+how many shots it needed; the turn rule then decides the game (player 1
+fires first, so it wins if it needs no more shots than player 2). Chunks
+are spread over a process pool. The first --verify games of every chunk
+are replayed shot by shot through rules.py and must end the same way.
+
+Strategies:
+    random  fire at unknown cells in random order
+    parity  random, but every other cell (a checkerboard) first
+    hunt    parity until a hit, then the unknown neighbours of hits
+
+With two strategies, each plays first in half of the games, so the report
+separates strategy strength from first-move advantage.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import rules
+
+
+class SimulationError(Exception):
+    pass
+
+
+# === FLEETS ===
+def place_fleets(rng, games, width, height, fleet):
+    """Random legal fleets: (games, width * height) bool, one per row.
+    Every ship is placed in all rows at once; rows where it overlaps an
+    earlier ship draw again."""
+    ships = np.zeros((games, width * height), dtype=bool)
+    steps = np.arange(max(fleet))
+    for length in sorted(fleet, reverse=True):
+        pending = np.arange(games)
+        for _ in range(1000):
+            if not len(pending):
+                break
+            n = len(pending)
+            across = rng.random(n) < 0.5 if length <= min(width, height) else \
+                np.full(n, length <= width)
+            x = np.where(across, rng.integers(0, max(1, width - length + 1), n),
+                         rng.integers(0, width, n))
+            y = np.where(across, rng.integers(0, height, n),
+                         rng.integers(0, max(1, height - length + 1), n))
+            offsets = np.where(across[:, None], steps[:length] * height, steps[:length])
+            cells = (x * height + y)[:, None] + offsets
+            clear = ~ships[pending[:, None], cells].any(axis=1)
+            rows = pending[clear]
+            ships[rows[:, None], cells[clear]] = True
+            pending = pending[~clear]
+        else:
+            raise SimulationError("could not place fleet; the board is too crowded")
+    return ships
+
+
+# === STRATEGIES ===
+def parity_mask(width, height):
+    x, y = np.divmod(np.arange(width * height), height)
+    return (x + y) % 2 == 0
+
+
+def ranks_to_result(ships, order, record):
+    """shots needed = 1 + the latest position in order of any ship cell."""
+    games, cells = ships.shape
+    rank = np.empty_like(order)
+    rank[np.arange(games)[:, None], order] = np.arange(cells)
+    need = np.where(ships, rank, -1).max(axis=1) + 1
+    return need, order[:record]
+
+
+def play_random(rng, ships, width, height, record):
+    return ranks_to_result(ships, np.argsort(rng.random(ships.shape), axis=1), record)
+
+
+def play_parity(rng, ships, width, height, record):
+    keys = rng.random(ships.shape) + ~parity_mask(width, height)
+    return ranks_to_result(ships, np.argsort(keys, axis=1), record)
+
+
+def play_hunt(rng, ships, width, height, record):
+    games, cells = ships.shape
+    shot = np.zeros_like(ships)
+    remaining = ships.sum(axis=1)
+    need = np.zeros(games, dtype=np.int64)
+    order = np.full((min(record, games), cells), -1, dtype=np.int64)
+    bonus = parity_mask(width, height) * 0.5
+    active = np.flatnonzero(remaining)
+    while len(active):
+        fired = shot[active].reshape(-1, width, height)
+        hits = fired & ships[active].reshape(-1, width, height)
+        near = np.zeros_like(hits)
+        near[:, 1:] |= hits[:, :-1]
+        near[:, :-1] |= hits[:, 1:]
+        near[:, :, 1:] |= hits[:, :, :-1]
+        near[:, :, :-1] |= hits[:, :, 1:]
+        scores = rng.random((len(active), cells)) + bonus + 2 * near.reshape(len(active), cells)
+        scores[fired.reshape(len(active), cells)] = -1
+        target = scores.argmax(axis=1)
+        shot[active, target] = True
+        recorded = active < len(order)
+        order[active[recorded], need[active[recorded]]] = target[recorded]
+        need[active] += 1
+        remaining[active] -= ships[active, target]
+        active = active[remaining[active] > 0]
+    return need, order
+
+
+STRATEGIES = {"random": play_random, "parity": play_parity, "hunt": play_hunt}
+
+
+# === GAMES ===
+def decide(need1, need2):
+    """Player 1 fires first: it wins ties. Returns (player 1 won, shots fired)."""
+    first_wins = need1 <= need2
+    return first_wins, np.where(first_wins, 2 * need1 - 1, 2 * need2)
+
+
+def replay(width, height, fleet, ships, orders, first_wins, shots):
+    """Play one game through rules.py and check it ends as simulated."""
+    game = rules.new_game(1, 2, width, height, list(fleet))
+    for player, board in zip((1, 2), ships):
+        cells = np.flatnonzero(board)
+        if rules.place_ships(game, player, [[int(c // height), int(c % height)] for c in cells]):
+            raise SimulationError("simulated fleet rejected by the rules")
+    fired = 0
+    turns = {1: iter(orders[0]), 2: iter(orders[1])}
+    while game["winner"] is None:
+        player = game["current_turn"]
+        cell = int(next(turns[player]))
+        failure, _ = rules.fire(game, player, cell // height, cell % height)
+        if failure:
+            raise SimulationError(f"simulated shot rejected: {failure}")
+        fired += 1
+    if (game["winner"] == 1) != bool(first_wins) or fired != shots:
+        raise SimulationError("simulated game disagrees with rules.py")
+
+
+def run_chunk(task):
+    """Play one chunk. Returns totals for the report."""
+    games, width, height, fleet, strategies, verify, seed = task
+    rng = np.random.default_rng(seed)
+    ships1 = place_fleets(rng, games, width, height, fleet)
+    ships2 = place_fleets(rng, games, width, height, fleet)
+    # Strategy a plays first in the first half of the chunk, b in the second
+    a, b = strategies
+    half = games // 2
+    verify = min(verify, half)
+
+    def play(name, ships):
+        return STRATEGIES[name](rng, ships, width, height, verify)
+
+    first_a, order1 = play(a, ships2[:half])   # player 1 fires at player 2's fleet
+    second_b, order2 = play(b, ships1[:half])
+    first_b, _ = play(b, ships2[half:])
+    second_a, _ = play(a, ships1[half:])
+    need1 = np.concatenate([first_a, first_b])
+    need2 = np.concatenate([second_b, second_a])
+    first_wins, shots = decide(need1, need2)
+    for g in range(verify):
+        replay(width, height, fleet, (ships1[g], ships2[g]), (order1[g], order2[g]),
+               first_wins[g], shots[g])
+    return {
+        "games": games, "firstWins": int(first_wins.sum()),
+        "aWins": int(first_wins[:half].sum() + (~first_wins[half:]).sum()),
+        "shots": int(shots.sum()),
+        "needA": int(first_a.sum() + second_a.sum()),
+        "needB": int(first_b.sum() + second_b.sum()),
+        "winnerShots": np.bincount(np.where(first_wins, need1, need2),
+                                   minlength=width * height + 1),
+        "verified": verify,
+    }
+
+
+def percentile(histogram, pct):
+    return int(np.searchsorted(np.cumsum(histogram), pct / 100 * histogram.sum()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=5000, help="games per array batch")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--fleet", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[5, 4, 3, 3, 2])
+    parser.add_argument("--strategies", type=lambda s: s.split(","), default=["random", "hunt"],
+                        help="one strategy for both players, or two to pit against each other")
+    parser.add_argument("--verify", type=int, default=20,
+                        help="games per chunk replayed through rules.py")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    strategies = (args.strategies * 2)[:2]
+    for name in strategies:
+        if name not in STRATEGIES:
+            parser.error(f"unknown strategy {name}; choose from {', '.join(STRATEGIES)}")
+
+    sizes = [args.chunk] * (args.games // args.chunk)
+    if args.games % args.chunk:
+        sizes.append(args.games % args.chunk)
+    seeds = np.random.SeedSequence(args.seed).spawn(len(sizes))
+    tasks = [(size, args.width, args.height, args.fleet, strategies, args.verify, seed)
+             for size, seed in zip(sizes, seeds)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(run_chunk, tasks))
+    elapsed = time.perf_counter() - start
+
+    games = sum(r["games"] for r in results)
+    total = {key: sum(r[key] for r in results)
+             for key in ("firstWins", "aWins", "shots", "needA", "needB", "verified")}
+    histogram = sum(r["winnerShots"] for r in results)
+
+    def rate(wins):
+        p = wins / games
+        return f"{p:.1%} ± {1.96 * (p * (1 - p) / games) ** 0.5:.1%}"
+
+    a, b = strategies
+    print(f"{games} games on {args.width}x{args.height}, fleet {args.fleet}, "
+          f"{args.workers} workers: {elapsed:.1f}s, {games / elapsed:,.0f} games/s")
+    print(f"shots to win: mean {(histogram * np.arange(len(histogram))).sum() / games:.1f}, "
+          f"p50 {percentile(histogram, 50)}, p90 {percentile(histogram, 90)}; "
+          f"shots per game {total['shots'] / games:.1f}")
+    print(f"first player wins {rate(total['firstWins'])}")
+    if a != b:
+        print(f"{a} (mean {total['needA'] / games:.1f} shots to sink a fleet) beats "
+              f"{b} (mean {total['needB'] / games:.1f}) in {rate(total['aWins'])} of games")
+    else:
+        print(f"{a}: mean {(total['needA'] + total['needB']) / (2 * games):.1f} shots to sink a fleet")
+    print(f"{total['verified']} games replayed through rules.py: all agree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Spectator fan-out, kept off the players' event path.
+
+A spectate-game connection first gets a 'spectate-snapshot' (see
+GameEngine.spectate(): board size, players, turn, every shot so far with
+its result; ship positions only once the game is over), then the game's
+broadcasts (ships-placed, game-ready, move-update or, in salvo games,
+salvo-update) as 'spectate-update'
+events: {"roomId", "events": [[event, payload], ...]}. A packed spectator
+gets them as 'frame' events instead, like a packed player (wire.py). At
+game-over every spectator gets a final snapshot, which reveals the ships.
+
+The players' handlers only call publish(), which appends to the room's
+pending list. A background task wakes every interval, encodes each room's
+pending updates once and puts the same packet on every spectator's
+Engine.IO queue, so the number of spectators adds no work to fire.
+
+A spectator whose queue already holds more than max_backlog packets (a
+slow reader) is skipped rather than buffered further, and marked stale.
+Once its queue has drained it gets one fresh snapshot in place of the
+updates it missed. New spectators start out stale, so snapshots and
+updates for a room are only ever sent from the background task, in order.
+An update may repeat a shot already in the snapshot; JSON updates carry
+the game version, so one not above the snapshot's can be skipped, and
+applying a move-update or salvo-update twice is harmless anyway.
+"""
+import threading
+
+from engineio import packet as eio_packet
+from socketio import packet
+
+from wire import encode_frame
+
+
+class SpectatorHub:
+    def __init__(self, server, snapshot, interval=0.1, max_backlog=64,
+                 start_task=None, sleep=None):
+        self.server = server  # python-socketio Server
+        self.snapshot = snapshot  # room_id -> dict or None
+        self.interval = interval
+        self.max_backlog = max_backlog
+        self.start_task = start_task
+        self.sleep = sleep
+        self.watchers = {}  # room_id -> {sid: (eio_sid, packed)}
+        self.watching = {}  # sid -> room_id
+        self.stale = set()  # sids waiting for a snapshot
+        self.pending = {}  # room_id -> [(event, payload)]
+        self.lock = threading.Lock()
+        self.started = False
+        self.counters = {"updatesSent": 0, "updatesDropped": 0, "snapshotsSent": 0}
+
+    def watch(self, sid, room_id, packed=False):
+        eio_sid = self.server.manager.eio_sid_from_sid(sid, "/")
+        with self.lock:
+            self._unwatch(sid)
+            self.watchers.setdefault(room_id, {})[sid] = (eio_sid, packed)
+            self.watching[sid] = room_id
+            self.stale.add(sid)
+            if not self.started:
+                self.started = True
+                self.start_task(self.run)
+
+    def unwatch(self, sid):
+        with self.lock:
+            self._unwatch(sid)
+
+    def _unwatch(self, sid):
+        room_id = self.watching.pop(sid, None)
+        if room_id is None:
+            return
+        self.stale.discard(sid)
+        watchers = self.watchers[room_id]
+        del watchers[sid]
+        if not watchers:
+            del self.watchers[room_id]
+            self.pending.pop(room_id, None)
+
+    def publish(self, room_id, messages):
+        """Queue a room's broadcasts for its spectators. Called from the
+        players' handlers, so it only appends."""
+        if room_id not in self.watchers:
+            return
+        with self.lock:
+            if room_id in self.watchers:
+                self.pending.setdefault(room_id, []).extend(messages)
+
+    def run(self):
+        while True:
+            self.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:  # keep fanning out other rooms
+                print(f"Spectator flush failed: {e!r}")
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            watchers = {room_id: list(self.watchers.get(room_id, {}).items())
+                        for room_id in pending}
+        for room_id, messages in pending.items():
+            if any(event == "game-over" for event, _ in messages):
+                # The final snapshot carries the winner and the ships
+                with self.lock:
+                    self.stale.update(sid for sid, _ in watchers[room_id]
+                                      if sid in self.watching)
+                continue
+            encoded = {}  # packed -> packet, built on first use
+            slow = []
+            for sid, (eio_sid, packed) in watchers[room_id]:
+                if sid in self.stale:
+                    continue
+                if self.backlog(eio_sid) > self.max_backlog:
+                    slow.append(sid)
+                    continue
+                if packed not in encoded:
+                    encoded[packed] = self.encode_update(room_id, messages, packed)
+                self.send(eio_sid, encoded[packed])
+                self.counters["updatesSent"] += 1
+            if slow:
+                self.counters["updatesDropped"] += len(slow)
+                with self.lock:
+                    self.stale.update(sid for sid in slow if sid in self.watching)
+        self.resync()
+
+    def resync(self):
+        """Send a fresh snapshot to stale spectators whose queue has
+        drained, one snapshot per room."""
+        with self.lock:
+            rooms = {}
+            for sid in self.stale:
+                room_id = self.watching[sid]
+                eio_sid, _ = self.watchers[room_id][sid]
+                if self.backlog(eio_sid) <= self.max_backlog // 2:
+                    rooms.setdefault(room_id, []).append((sid, eio_sid))
+        for room_id, ready in rooms.items():
+            snapshot = self.snapshot(room_id)
+            if snapshot is None:
+                encoded = self.encode("error", {"message": "Game not found"})
+            else:
+                encoded = self.encode("spectate-snapshot", snapshot)
+            with self.lock:
+                for sid, eio_sid in ready:
+                    if sid in self.stale:
+                        self.stale.discard(sid)
+                        self.send(eio_sid, encoded)
+                        self.counters["snapshotsSent"] += 1
+                        if snapshot is None:
+                            self._unwatch(sid)
+
+    def encode_update(self, room_id, messages, packed):
+        if packed:
+            return self.encode("frame", encode_frame(messages))
+        return self.encode("spectate-update", {
+            "roomId": room_id, "events": [list(message) for message in messages]})
+
+    def encode(self, event, payload):
+        """One Engine.IO packet, reused for every recipient."""
+        encoded = self.server.packet_class(
+            packet.EVENT, namespace="/", data=[event, payload]).encode()
+        return eio_packet.Packet(eio_packet.MESSAGE, encoded)
+
+    def send(self, eio_sid, encoded):
+        self.server.eio.send_packet(eio_sid, encoded)
+
+    def backlog(self, eio_sid):
+        """Packets queued for a connection and not yet written to it."""
+        socket = self.server.eio.sockets.get(eio_sid)
+        return socket.queue.qsize() if socket is not None else 0
+
+    def stats(self):
+        return dict(self.counters, spectators=len(self.watching),
+                    watchedGames=len(self.watchers), stale=len(self.stale))
@@ -0,0 +1,184 @@
+"""Packed binary encoding for game events (opt-in per connection).
+
+A client that sends "encoding": "packed" with join-game gets its events as
+'frame' events instead of one JSON event each. A frame is a base64 string
+of one or more binary messages back to back, each a type byte followed by
+fixed little-endian fields:
+
+    1 joined        roomId u32, yourId u32
+    2 ships-placed  userId u32
+    3 game-ready    turn u32, width u16, height u16
+    4 move-update   x u16, y u16, hit u8, turn u32
+    5 game-over     winner u32
+    6 error         length u16, UTF-8 message
+    7 salvo-update  turn u32, count u16, then count x (x u16, y u16, hit u8)
+  255 any other     name length u8, name, length u32, JSON payload
+
+Such a client may also send place-ships cells as "cells" (base64 of x/y
+u16 pairs) instead of nested "positions" lists, and fire-salvo shots the
+same way instead of "shots". Broadcasts for a room are
+buffered and sent as one frame per tick (FrameBatcher).
+
+Packed messages carry no game version (see engine.py). A client that
+resyncs counts one per ships-placed and move-update instead (and for the
+game-over that replaces the last move-update). game-ready adds none: it
+has the version of the second ships-placed. That count is exact for
+classic games; after a salvo-update it is behind, and a resync from it
+just gets that salvo again.
+
+Frames are base64 text rather than Socket.IO binary attachments: an
+attachment costs a second WebSocket message plus a ~40 byte placeholder
+header, more than a whole move-update.
+"""
+import base64
+import binascii
+import json
+import struct
+import threading
+
+PACKED = "packed"
+
+JOINED, SHIPS_PLACED, GAME_READY, MOVE_UPDATE, GAME_OVER, ERROR, SALVO_UPDATE, OTHER = \
+    1, 2, 3, 4, 5, 6, 7, 255
+
+# event -> (layout, type byte, payload fields in layout order)
+FORMATS = {
+    "joined": (struct.Struct("<BII"), JOINED, ("roomId", "yourId")),
+    "ships-placed": (struct.Struct("<BI"), SHIPS_PLACED, ("userId",)),
+    "game-ready": (struct.Struct("<BIHH"), GAME_READY, ("turn", "width", "height")),
+    "move-update": (struct.Struct("<BHHBI"), MOVE_UPDATE, ("x", "y", "hit", "turn")),
+    "game-over": (struct.Struct("<BI"), GAME_OVER, ("winner",)),
+}
+BY_TYPE = {kind: (event, fmt, fields) for event, (fmt, kind, fields) in FORMATS.items()}
+U8, U16, U32 = struct.Struct("<B"), struct.Struct("<H"), struct.Struct("<I")
+SALVO_HEADER = struct.Struct("<BIH")  # type, turn, count
+SHOT = struct.Struct("<HHB")
+
+
+def encode_salvo(payload):
+    """salvo-update in binary, or None if it does not fit the layout."""
+    shots = payload["shots"]
+    try:
+        return SALVO_HEADER.pack(SALVO_UPDATE, payload["turn"], len(shots)) + \
+            b"".join(SHOT.pack(x, y, hit) for x, y, hit in shots)
+    except (struct.error, TypeError, ValueError):
+        return None
+
+
+def encode_message(event, payload):
+    packer = FORMATS.get(event)
+    if packer is not None:
+        fmt, kind, fields = packer
+        try:
+            return fmt.pack(kind, *(payload[name] for name in fields))
+        except (struct.error, KeyError, TypeError):
+            pass  # ids too large or an unexpected payload: send it as JSON
+    if event == "error":
+        text = payload.get("message", "").encode()[:65535]
+        return U8.pack(ERROR) + U16.pack(len(text)) + text
+    if event == "salvo-update":
+        message = encode_salvo(payload)
+        if message is not None:
+            return message
+    name = event.encode()
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return U8.pack(OTHER) + U8.pack(len(name)) + name + U32.pack(len(body)) + body
+
+
+def encode_frame(messages):
+    """[(event, payload)] -> frame string"""
+    return base64.b64encode(b"".join(encode_message(event, payload)
+                                     for event, payload in messages)).decode()
+
+
+def decode_frame(frame):
+    """frame string -> [(event, payload)]"""
+    data = base64.b64decode(frame)
+    messages = []
+    offset = 0
+    while offset < len(data):
+        kind = data[offset]
+        if kind in BY_TYPE:
+            event, fmt, fields = BY_TYPE[kind]
+            payload = dict(zip(fields, fmt.unpack_from(data, offset)[1:]))
+            if kind == MOVE_UPDATE:
+                payload["hit"] = bool(payload["hit"])
+            offset += fmt.size
+        elif kind == ERROR:
+            (length,) = U16.unpack_from(data, offset + 1)
+            start = offset + 3
+            event, payload = "error", {"message": data[start:start + length].decode()}
+            offset = start + length
+        elif kind == SALVO_UPDATE:
+            _, turn, count = SALVO_HEADER.unpack_from(data, offset)
+            offset += SALVO_HEADER.size
+            shots = [[x, y, bool(hit)] for x, y, hit in SHOT.iter_unpack(
+                data[offset:offset + count * SHOT.size])]
+            event, payload = "salvo-update", {"shots": shots, "turn": turn}
+            offset += count * SHOT.size
+        else:
+            name_length = data[offset + 1]
+            start = offset + 2
+            event = data[start:start + name_length].decode()
+            (length,) = U32.unpack_from(data, start + name_length)
+            start += name_length + 4
+            payload = json.loads(data[start:start + length])
+            offset = start + length
+        messages.append((event, payload))
+    return messages
+
+
+def pack_cells(positions):
+    flat = [c for cell in positions for c in cell]
+    return base64.b64encode(struct.pack(f"<{len(flat)}H", *flat)).decode()
+
+
+def unpack_cells(cells):
+    """base64 of x/y u16 pairs -> [[x, y], ...]; None if malformed."""
+    try:
+        data = base64.b64decode(cells, validate=True)
+    except (TypeError, ValueError, binascii.Error):
+        return None
+    if len(data) % 4:
+        return None
+    flat = struct.unpack(f"<{len(data) // 2}H", data)
+    return [[flat[i], flat[i + 1]] for i in range(0, len(flat), 2)]
+
+
+class FrameBatcher:
+    """Coalesces a room's broadcasts into one frame per tick.
+
+    send(room, frame) does the emit. With tick=0 every add() is sent at
+    once (still one frame for all messages of one event); otherwise
+    messages wait up to tick seconds in a per-room buffer, flushed by a
+    background task started on first use."""
+
+    def __init__(self, send, tick=0.0, start_task=None, sleep=None):
+        self.send = send
+        self.tick = tick
+        self.start_task = start_task
+        self.sleep = sleep
+        self.pending = {}  # room -> [(event, payload)]
+        self.lock = threading.Lock()
+        self.started = False
+
+    def add(self, room, messages):
+        if not self.tick:
+            self.send(room, encode_frame(messages))
+            return
+        with self.lock:
+            self.pending.setdefault(room, []).extend(messages)
+            if not self.started:
+                self.started = True
+                self.start_task(self.run)
+
+    def run(self):
+        while True:
+            self.sleep(self.tick)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for room, messages in pending.items():
+            self.send(room, encode_frame(messages))
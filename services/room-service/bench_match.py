@@ -0,0 +1,83 @@
+"""Benchmark: matchmaking pairs per second vs. number of queued players.
+
+Run from this directory:  python bench_match.py [--pairs N] [--queued 0,10000,100000]
+Before each run --queued players are left waiting, each in its own skill
+band so none of them pair, then --pairs pairs are made in one more band.
+The baseline is a single waiting list scanned for a compatible player,
+which is what pairing looks like without per-bucket queues. The last line
+times the full POST /match handler through Flask's test client.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from matchmaking import Matchmaker
+
+
+# --- Baseline: one list, linear scan for someone in the same bucket ---
+class ScanMatchmaker:
+    def __init__(self, create_room):
+        self.create_room = create_room
+        self.waiting = []  # [(user_id, bucket)]
+
+    def prefill(self, user_id, bucket):
+        self.waiting.append((user_id, bucket))
+
+    def enqueue(self, user_id, bucket):
+        for i, (other, other_bucket) in enumerate(self.waiting):
+            if other_bucket == bucket:
+                del self.waiting[i]
+                return self.create_room(other, user_id)
+        self.waiting.append((user_id, bucket))
+
+
+def run(matchmaker_class, queued, pairs):
+    room_ids = iter(range(10 ** 9))
+    matchmaker = matchmaker_class(lambda p1, p2: next(room_ids))
+    prefill = getattr(matchmaker, "prefill", matchmaker.enqueue)
+    for user_id in range(queued):
+        prefill(user_id, f"classic:{user_id}")
+    user_ids = range(queued, queued + 2 * pairs)
+    start = time.perf_counter()
+    for user_id in user_ids:
+        matchmaker.enqueue(user_id, "classic:hot")
+    return pairs / (time.perf_counter() - start)
+
+
+def run_http(queued, pairs):
+    os.environ.setdefault("SESSION_SECRET", "bench")
+    from tokens import issue_token
+    import server
+    for user_id in range(1, queued + 1):
+        server.matchmaker.enqueue(user_id, f"classic:{user_id}")
+    bodies = [{"token": issue_token(user_id)}
+              for user_id in range(queued + 1, queued + 1 + 2 * pairs)]
+    client = server.app.test_client()
+    start = time.perf_counter()
+    for body in bodies:
+        client.post("/match", json=body)
+    return pairs / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=20000)
+    parser.add_argument("--queued", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[0, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'queued':>8} {'deque pairs/s':>14} {'scan pairs/s':>13}")
+    for queued in args.queued:
+        fast = run(Matchmaker, queued, args.pairs)
+        # The scan is O(queued) per pair; keep its run short
+        slow = run(ScanMatchmaker, queued, max(1, min(args.pairs, 2000000 // (queued + 1))))
+        print(f"{queued:>8} {fast:>14,.0f} {slow:>13,.0f}")
+    queued = max(args.queued)
+    rate = run_http(queued, args.pairs // 4)
+    print(f"POST /match handler, {queued} queued: {rate:,.0f} pairs/s ({2 * rate:,.0f} requests/s)")
+
+
+if __name__ == "__main__":
+    main()
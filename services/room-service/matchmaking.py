@@ -0,0 +1,127 @@
+"""Matchmaking queue: pairs waiting users into full rooms.
+
+Users wait in a FIFO deque per bucket (board variant + skill band). A new
+user is paired with the oldest live ticket in its bucket, so pairing is O(1)
+no matter how many users are queued. Cancelled tickets are left in the
+deque and skipped when they reach the front, which keeps cancel O(1) too.
+Each bucket has its own lock stripe, so different buckets pair in parallel.
+A matched ticket is forgotten once its user has read the match, or
+MATCH_TTL seconds after pairing if they never do.
+"""
+import threading
+import time
+from collections import deque
+
+from state_store import StripedLock
+
+
+MATCH_TTL = 300  # seconds an unread match is kept
+
+
+class Ticket:
+    __slots__ = ("user_id", "bucket", "match", "cancelled", "event")
+
+    def __init__(self, user_id, bucket):
+        self.user_id = user_id
+        self.bucket = bucket
+        self.match = None  # {"roomId", "opponentId", "yourPosition"} once paired
+        self.cancelled = False
+        self.event = None  # created by the first long poll
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+
+    def status(self):
+        if self.match is not None:
+            return dict(self.match, status="matched")
+        return {"status": "waiting", "bucket": self.bucket}
+
+
+class Matchmaker:
+    def __init__(self, create_room):
+        # create_room(player1_id, player2_id) -> room id of a new full room
+        self.create_room = create_room
+        self.queues = {}   # bucket -> deque of Tickets, oldest first
+        self.tickets = {}  # user_id -> latest Ticket
+        self.matched = deque()  # (matched_at, Ticket), oldest first
+        # Lock order: user stripe, then bucket stripe
+        self.user_locks = StripedLock()
+        self.bucket_locks = StripedLock()
+
+    def enqueue(self, user_id, bucket):
+        """Queue user_id, or pair it right away. Returns the user's Ticket."""
+        with self.user_locks(user_id):
+            ticket = self.tickets.get(user_id)
+            if ticket is not None and ticket.match is None and not ticket.cancelled:
+                return ticket  # already waiting
+            ticket = Ticket(user_id, bucket)
+            with self.bucket_locks(bucket):
+                self.tickets[user_id] = ticket
+                waiting = self.queues.setdefault(bucket, deque())
+                while waiting:
+                    other = waiting.popleft()
+                    if not other.cancelled:
+                        self.pair(other, ticket)
+                        break
+                else:
+                    waiting.append(ticket)
+                if not waiting:
+                    del self.queues[bucket]
+            return ticket
+
+    def pair(self, first, second):
+        room_id = self.create_room(first.user_id, second.user_id)
+        first.match = {"roomId": room_id, "opponentId": second.user_id, "yourPosition": "player1"}
+        second.match = {"roomId": room_id, "opponentId": first.user_id, "yourPosition": "player2"}
+        now = time.monotonic()
+        self.matched.append((now, first))
+        self.matched.append((now, second))
+        first.wake()
+        second.wake()
+
+    def cancel(self, user_id):
+        """Leave the queue. False if the user is not waiting."""
+        with self.user_locks(user_id):
+            ticket = self.tickets.get(user_id)
+            if ticket is None:
+                return False
+            with self.bucket_locks(ticket.bucket):
+                if ticket.match is not None or ticket.cancelled:
+                    return False
+                ticket.cancelled = True
+                del self.tickets[user_id]
+                ticket.wake()
+                return True
+
+    def ticket(self, user_id):
+        return self.tickets.get(user_id)
+
+    def forget(self, ticket):
+        """Drop a matched ticket, once its user has read the match."""
+        with self.user_locks(ticket.user_id):
+            if self.tickets.get(ticket.user_id) is ticket:
+                del self.tickets[ticket.user_id]
+
+    def expire(self, now=None):
+        """Forget matches unread for MATCH_TTL seconds. Returns how many
+        tickets were still held."""
+        now = time.monotonic() if now is None else now
+        expired = 0
+        while self.matched and now - self.matched[0][0] >= MATCH_TTL:
+            _, ticket = self.matched.popleft()
+            with self.user_locks(ticket.user_id):
+                if self.tickets.get(ticket.user_id) is ticket:
+                    del self.tickets[ticket.user_id]
+                    expired += 1
+        return expired
+
+    def wait(self, ticket, timeout):
+        """Block until ticket is paired or cancelled, at most timeout seconds."""
+        with self.bucket_locks(ticket.bucket):
+            if ticket.match is not None or ticket.cancelled:
+                return
+            if ticket.event is None:
+                ticket.event = threading.Event()
+            event = ticket.event
+        event.wait(timeout)
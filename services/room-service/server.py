@@ -1,66 +1,221 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+
 from flask import Flask, request, jsonify
-import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from service_client import ServiceClient, ServiceError, invalidation_blueprint, notify_invalidate
+from tokens import check_secret, verify_token, REQUIRE_TOKENS
+from state_store import Counter, StripedStore, footprint, sample
+from matchmaking import Matchmaker
+from metrics import REGISTRY, instrument_app, process_gauges, start_lag_monitor
 
 app = Flask(__name__)
 
 # In-memory storage
-rooms = {}  # room_id -> {player1_id: int, player2_id: int or None, status: 'waiting'|'full'}
-next_room_id = 1
+rooms = StripedStore()  # room_id -> {player1_id: int, player2_id: int or None, status: 'waiting'|'full'}
+room_ids = Counter()
+room_created = deque()  # (created_at, room_id), oldest first
+room_counters = {"evicted": 0}
+
+# Rooms are dropped ROOM_TTL seconds after creation (a game only needs its
+# room to start), or oldest first while there are more than ROOM_LIMIT
+ROOM_TTL = float(os.environ.get("ROOM_TTL", "7200"))
+ROOM_LIMIT = int(os.environ.get("ROOM_LIMIT", "0"))  # 0 = no limit
+EVICT_INTERVAL = 30  # seconds between sweeps
+# Services that cache GET /rooms/<id> and must hear about evictions (the
+# game server's internal port, GAME_INTERNAL_PORT)
+CACHE_SUBSCRIBERS = ["http://127.0.0.1:3013"]
+
+SKILL_BAND = 100  # players whose skill differs by less than this can be paired
+MAX_MATCH_WAIT = 30  # seconds GET /match/<id>?wait= may block
 
 USER_SERVICE_URL = "http://localhost:3001"
+user_service = ServiceClient("user-service", USER_SERVICE_URL)
+app.register_blueprint(invalidation_blueprint(user_service))
+instrument_app(app)
+REGISTRY.gauge("battleship_rooms", "Rooms in memory", fn=lambda: len(rooms))
 
 @app.route('/rooms', methods=['POST'])
 def create_room():
-    global next_room_id
-    room_id = next_room_id
-    rooms[room_id] = {
+    room_id = add_room({
         "player1_id": None,
         "player2_id": None,
         "status": "waiting"
-    }
-    next_room_id += 1
+    })
     return jsonify({"roomId": room_id}), 201
 
-@app.route('/rooms/<int:room_id>/join', methods=['POST'])
-def join_room(room_id):
-    if room_id not in rooms:
-        return jsonify({"error": "Room not found"}), 404
+def create_full_room(player1_id, player2_id):
+    return add_room({
+        "player1_id": player1_id,
+        "player2_id": player2_id,
+        "status": "full"
+    })
 
-    data = request.get_json()
+def add_room(room):
+    room_id = room_ids.next()
+    rooms.set(room_id, room)
+    room_created.append((time.time(), room_id))
+    return room_id
+
+matchmaker = Matchmaker(create_full_room)
+REGISTRY.gauge("battleship_match_queue_length",
+               "Tickets in matchmaking queues (cancelled ones until skipped)",
+               fn=lambda: sum(len(queue) for queue in list(matchmaker.queues.values())))
+
+def resolve_user(data):
+    """(user_id, None) for the caller of a request body, or (None, error response)."""
+    token = data.get("token")
+    if token is not None:
+        # A signed session token proves the user exists; no lookup needed
+        user_id = verify_token(token)
+        if user_id is None:
+            return None, (jsonify({"error": "Invalid session token"}), 401)
+        return user_id, None
+    if REQUIRE_TOKENS:
+        return None, (jsonify({"error": "Session token required"}), 401)
     user_id = data.get("userId")
     if not user_id:
-        return jsonify({"error": "userId required"}), 400
+        return None, (jsonify({"error": "userId required"}), 400)
 
-    # Validate user exists via User Service
-    user_resp = requests.get(f"{USER_SERVICE_URL}/users/{user_id}")
+    # Validate user exists via User Service (ids are never reused, so a
+    # positive answer can be cached)
+    try:
+        user_resp = user_service.get(f"/users/{user_id}",
+                                     cache_if=lambda status, _: status == 200)
+    except ServiceError:
+        return None, (jsonify({"error": "User service unavailable"}), 503)
     if user_resp.status_code != 200:
-        return jsonify({"error": "Invalid userId"}), 400
+        return None, (jsonify({"error": "Invalid userId"}), 400)
+    return user_id, None
 
-    room = rooms[room_id]
+@app.route('/rooms/<int:room_id>/join', methods=['POST'])
+def join_room(room_id):
+    user_id, failure = resolve_user(request.get_json() or {})
+    if failure:
+        return failure
 
-    if room["status"] == "full":
-        return jsonify({"error": "Room is full"}), 400
+    # Two joins of the same room must not both become player2, and the
+    # room may be evicted until the lock is held
+    with rooms.locked(room_id):
+        room = rooms.get(room_id)
+        if room is None:
+            return jsonify({"error": "Room not found"}), 404
 
-    if room["player1_id"] is None:
-        room["player1_id"] = user_id
-    elif room["player2_id"] is None:
-        room["player2_id"] = user_id
-        room["status"] = "full"
-    else:
-        return jsonify({"error": "Room full"}), 400
+        if room["status"] == "full":
+            return jsonify({"error": "Room is full"}), 400
 
-    return jsonify({
-        "roomId": room_id,
-        "status": room["status"],
-        "yourPosition": "player1" if room["player1_id"] == user_id else "player2"
-    })
+        if room["player1_id"] is None:
+            room["player1_id"] = user_id
+        elif room["player2_id"] is None:
+            room["player2_id"] = user_id
+            room["status"] = "full"
+        else:
+            return jsonify({"error": "Room full"}), 400
+
+        return jsonify({
+            "roomId": room_id,
+            "status": room["status"],
+            "yourPosition": "player1" if room["player1_id"] == user_id else "player2"
+        })
 
 @app.route('/rooms/<int:room_id>', methods=['GET'])
 def get_room(room_id):
-    if room_id not in rooms:
+    room = rooms.get(room_id)
+    if room is None:
         return jsonify({"error": "Room not found"}), 404
-    return jsonify(rooms[room_id])
+    return jsonify(room)
+
+@app.route('/rooms/stats', methods=['GET'])
+def room_stats():
+    live = rooms.values()
+    sizes = [footprint(room) for room in sample(live)]
+    return jsonify({"live": len(live), "evicted": room_counters["evicted"],
+                    "bytesPerRoom": sum(sizes) // len(sizes) if sizes else 0})
+
+# === EVICTION ===
+def evict_rooms(now=None):
+    now = time.time() if now is None else now
+    evicted, stale = 0, []
+    while room_created and (now - room_created[0][0] >= ROOM_TTL
+                            or (ROOM_LIMIT and len(rooms) > ROOM_LIMIT)):
+        _, room_id = room_created.popleft()
+        with rooms.locked(room_id):
+            room = rooms.pop(room_id)
+        evicted += 1
+        if room is not None and room["status"] == "full":
+            stale.append(f"/rooms/{room_id}")  # cached by subscribers
+    room_counters["evicted"] += evicted
+    if stale:
+        notify_invalidate(CACHE_SUBSCRIBERS, "room-service", stale)
+    return evicted
+
+def evict_loop():
+    while True:
+        time.sleep(EVICT_INTERVAL)
+        evict_rooms()
+        matchmaker.expire()
+
+def start_evictor():
+    threading.Thread(target=evict_loop, daemon=True).start()
+
+# === MATCHMAKING ===
+def match_response(ticket):
+    body = ticket.status()
+    if body["status"] != "matched":
+        return jsonify(body), 202
+    matchmaker.forget(ticket)  # the user has their match now
+    return jsonify(body), 200
+
+@app.route('/match', methods=['POST'])
+def join_match():
+    data = request.get_json() or {}
+    user_id, failure = resolve_user(data)
+    if failure:
+        return failure
+    variant = str(data.get("variant", "classic"))
+    skill = data.get("skill")
+    if skill is not None and type(skill) is not int:  # bools are ints too
+        return jsonify({"error": "skill must be an integer"}), 400
+    bucket = variant if skill is None else f"{variant}:{skill // SKILL_BAND}"
+    return match_response(matchmaker.enqueue(user_id, bucket))
+
+@app.route('/match/<int:user_id>', methods=['GET'])
+def get_match(user_id):
+    # A GET has no body: the session token comes as "Authorization: Bearer <token>"
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    caller, failure = resolve_user({"token": token if scheme == "Bearer" else None,
+                                    "userId": user_id})
+    if failure:
+        return failure
+    if caller != user_id:
+        return jsonify({"error": "Not your match"}), 403
+    ticket = matchmaker.ticket(user_id)
+    if ticket is None:
+        return jsonify({"error": "Not in matchmaking"}), 404
+    wait = min(request.args.get("wait", 0, type=float), MAX_MATCH_WAIT)
+    if wait > 0:
+        matchmaker.wait(ticket, wait)  # long poll: returns as soon as paired
+        if ticket.cancelled:
+            return jsonify({"error": "Not in matchmaking"}), 404
+    return match_response(ticket)
+
+@app.route('/match', methods=['DELETE'])
+def cancel_match():
+    user_id, failure = resolve_user(request.get_json() or {})
+    if failure:
+        return failure
+    if not matchmaker.cancel(user_id):
+        return jsonify({"error": "Not waiting for a match"}), 404
+    return jsonify({"status": "cancelled"})
 
 if __name__ == '__main__':
+    check_secret("Room Service")
+    start_evictor()
+    process_gauges()
+    start_lag_monitor()
     print("Room Service running on http://localhost:3002")
     app.run(port=3002, debug=True)
\ No newline at end of file
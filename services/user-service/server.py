@@ -1,38 +1,87 @@
+import os
+import sys
+
 from flask import Flask, request, jsonify
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from tokens import check_secret, issue_token
+from state_store import Counter, StripedStore
+from metrics import REGISTRY, instrument_app, process_gauges, start_lag_monitor
+
 app = Flask(__name__)
 
 # In-memory storage
-users = {}  # username -> {id, status}
-next_id = 1
+users = StripedStore()  # username -> {id, username, status}
+users_by_id = StripedStore()  # id -> same record, so lookups by id are O(1)
+user_ids = Counter()
+
+MAX_BATCH = 1000
+
+instrument_app(app)
+REGISTRY.gauge("battleship_users", "Registered users", fn=lambda: len(users))
 
 @app.route('/register', methods=['POST'])
 def register():
-    global next_id
     data = request.get_json()
     username = data.get('username')
-    if not username or username in users:
+    if not username:
         return jsonify({"error": "Invalid or existing username"}), 400
-    users[username] = {"id": next_id, "status": "online"}
-    user_id = next_id
-    next_id += 1
-    return jsonify({"userId": user_id, "username": username})
+    # Two registrations of the same name must not both succeed
+    with users.locked(username):
+        if username in users:
+            return jsonify({"error": "Invalid or existing username"}), 400
+        user_id = user_ids.next()
+        user = {"id": user_id, "username": username, "status": "online"}
+        users_by_id.set(user_id, user)
+        users.set(username, user)
+    return jsonify({"userId": user_id, "username": username, "token": issue_token(user_id)})
 
 @app.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     username = data.get('username')
-    if username not in users:
+    user = users.get(username)
+    if user is None:
         return jsonify({"error": "User not found"}), 404
-    return jsonify(users[username])
+    user_id = user["id"]
+    return jsonify({"userId": user_id, "username": username, "token": issue_token(user_id)})
 
 @app.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    for user in users.values():
-        if user['id'] == user_id:
-            return jsonify(user)
-    return jsonify({"error": "User not found"}), 404
+    user = users_by_id.get(user_id)
+    if user is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify(user)
+
+def lookup_users(ids):
+    if (not isinstance(ids, list) or len(ids) > MAX_BATCH
+            or not all(type(i) is int for i in ids)):
+        return jsonify({"error": f"ids must be a list of at most {MAX_BATCH} ids"}), 400
+    found, missing = [], []
+    for user_id in ids:
+        user = users_by_id.get(user_id)
+        if user is None:
+            missing.append(user_id)
+        else:
+            found.append(user)
+    return jsonify({"users": found, "missing": missing})
+
+@app.route('/users/batch', methods=['POST'])
+def get_users_batch():
+    data = request.get_json(silent=True) or {}
+    return lookup_users(data.get('ids'))
+
+@app.route('/users', methods=['GET'])
+def get_users():
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i]
+    except ValueError:
+        return jsonify({"error": "ids must be comma-separated integers"}), 400
+    return lookup_users(ids)
 
 if __name__ == '__main__':
+    check_secret("User Service")
+    process_gauges()
+    start_lag_monitor()
     print("User Service running on http://localhost:3001")
     app.run(port=3001, debug=True)
\ No newline at end of file
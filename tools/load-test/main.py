@@ -0,0 +1,400 @@
+"""Headless load generator for the Battleship services.
+
+Registers bot users, creates and joins rooms, and plays N games end to end
+over the same Socket.IO events the CLI client uses (join-game, place-ships,
+fire, move-update, game-over). Reports throughput and p50/p95/p99 latency
+per Socket.IO event and per HTTP endpoint.
+
+    python tools/load-test/main.py --start-services --games 200 --concurrency 50
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+import socketio
+
+# === CONFIG ===
+USER_URL = "http://localhost:3001"
+ROOM_URL = "http://localhost:3002"
+GAME_URL = "http://localhost:3003"
+WS_URL = "http://localhost:3003"
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SERVICES = [
+    ("user-service", 3001),
+    ("room-service", 3002),
+    ("game-rules-service", 3003),
+]
+ALL_IN_ONE = [("all-in-one", 3000)]
+EVENT_TIMEOUT = 30
+
+sys.path.insert(0, os.path.join(ROOT, "services", "game-rules-service"))
+from wire import PACKED, decode_frame, pack_cells
+
+
+class GameError(Exception):
+    pass
+
+
+# === METRICS ===
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}  # name -> [seconds]
+        self.errors = {}   # name -> count
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def error(self, name):
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(sorted_values, pct):
+    index = max(0, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def summarize(recorder):
+    rows = {}
+    for name, values in recorder.samples.items():
+        values = sorted(values)
+        rows[name] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1e3,
+            "p95_ms": percentile(values, 95) * 1e3,
+            "p99_ms": percentile(values, 99) * 1e3,
+            "errors": recorder.errors.get(name, 0),
+        }
+    for name, count in recorder.errors.items():
+        rows.setdefault(name, {"count": 0, "p50_ms": 0, "p95_ms": 0,
+                               "p99_ms": 0, "errors": count})
+    return rows
+
+
+# === HTTP ===
+class Http:
+    def __init__(self, recorder):
+        self.session = requests.Session()
+        self.recorder = recorder
+
+    def post(self, label, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = self.session.post(url, timeout=EVENT_TIMEOUT, **kwargs)
+        except requests.RequestException:
+            self.recorder.error(label)
+            raise
+        self.recorder.add(label, time.perf_counter() - start)
+        if resp.status_code >= 400:
+            self.recorder.error(label)
+            raise GameError(f"{label}: {resp.status_code} {resp.text.strip()}")
+        return resp.json()
+
+
+# === BOT PLAYER ===
+class Player:
+    EVENTS = ("joined", "ships-placed", "game-ready", "move-update", "game-over", "error")
+
+    def __init__(self, recorder, transports):
+        self.recorder = recorder
+        self.transports = transports
+        self.inbox = queue.Queue()
+        self.sio = socketio.Client(reconnection=False)
+        for event in self.EVENTS:
+            self.sio.on(event, lambda data=None, event=event: self.inbox.put((event, data)))
+        self.sio.on("frame", self.on_frame)
+        self.user_id = None
+        self.token = None
+
+    def on_frame(self, frame):
+        for message in decode_frame(frame):
+            self.inbox.put(message)
+
+    def connect(self):
+        start = time.perf_counter()
+        self.sio.connect(WS_URL, transports=self.transports)
+        self.recorder.add("connect", time.perf_counter() - start)
+
+    def expect(self, names, match=None):
+        deadline = time.monotonic() + EVENT_TIMEOUT
+        while True:
+            try:
+                event, data = self.inbox.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise GameError(f"timed out waiting for {names}")
+            if event == "error":
+                raise GameError(data.get("message", "error event"))
+            if event in names and (match is None or match(data)):
+                return event, data
+
+    def request(self, event, payload, names, match=None):
+        """Emit an event and time until this player sees the reply."""
+        start = time.perf_counter()
+        self.sio.emit(event, payload)
+        try:
+            reply = self.expect(names, match)
+        except GameError:
+            self.recorder.error(event)
+            raise
+        self.recorder.add(event, time.perf_counter() - start)
+        return reply
+
+    def close(self):
+        if self.sio.connected:
+            self.sio.disconnect()
+
+
+class Spectator:
+    """Watches one game; keeps the latest snapshot and counts updates."""
+
+    def __init__(self, transports):
+        self.transports = transports
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("spectate-snapshot", self.on_snapshot)
+        self.sio.on("spectate-update", self.on_update)
+        self.snapshot = None
+        self.updates = 0
+        self.over = threading.Event()  # got the final snapshot
+
+    def on_snapshot(self, data):
+        self.snapshot = data
+        if data["winner"] is not None:
+            self.over.set()
+
+    def on_update(self, data):
+        self.updates += len(data["events"])
+
+    def watch(self, room_id):
+        self.sio.connect(WS_URL, transports=self.transports)
+        self.sio.emit("spectate-game", {"roomId": room_id})
+
+    def close(self):
+        if self.sio.connected:
+            self.sio.disconnect()
+
+
+def random_fleet(width, height, fleet, rng):
+    taken = set()
+    positions = []
+    for length in fleet:
+        for _ in range(1000):
+            if rng.random() < 0.5 and length <= width:
+                x, y, dx, dy = rng.randrange(width - length + 1), rng.randrange(height), 1, 0
+            elif length <= height:
+                x, y, dx, dy = rng.randrange(width), rng.randrange(height - length + 1), 0, 1
+            else:
+                continue
+            cells = [(x + dx * i, y + dy * i) for i in range(length)]
+            if not taken.intersection(cells):
+                taken.update(cells)
+                positions.extend([list(c) for c in cells])
+                break
+        else:
+            raise GameError("could not place fleet")
+    return positions
+
+
+def play_game(index, args, recorder, run_id):
+    rng = random.Random(f"{run_id}-{index}")
+    http = Http(recorder)
+    players = [Player(recorder, args.transports), Player(recorder, args.transports)]
+    spectators = [Spectator(args.transports) for _ in range(args.spectators)]
+    try:
+        for n, player in enumerate(players):
+            user = http.post("POST /register", f"{USER_URL}/register",
+                             json={"username": f"load-{run_id}-{index}-{n}"})
+            player.user_id = user["userId"]
+            player.token = user.get("token")
+        if args.match:
+            # A bucket per game, so the two bots pair with each other
+            for player in players:
+                match = http.post("POST /match", f"{ROOM_URL}/match",
+                                  json={"userId": player.user_id, "token": player.token,
+                                        "variant": f"load-{run_id}-{index}"})
+            room_id = match["roomId"]
+        else:
+            room_id = http.post("POST /rooms", f"{ROOM_URL}/rooms")["roomId"]
+            for player in players:
+                http.post("POST /rooms/<id>/join", f"{ROOM_URL}/rooms/{room_id}/join",
+                          json={"userId": player.user_id, "token": player.token})
+        config = {"width": args.width, "height": args.height, "fleet": args.fleet}
+        http.post("POST /games/<id>/start", f"{GAME_URL}/games/{room_id}/start", json=config)
+        for spectator in spectators:
+            spectator.watch(room_id)
+
+        for player in players:
+            player.connect()
+            player.request("join-game", {"roomId": room_id, "userId": player.user_id,
+                                         "token": player.token, "encoding": args.encoding},
+                           ("joined",))
+
+        for n, player in enumerate(players):
+            positions = random_fleet(args.width, args.height, args.fleet, rng)
+            uid = player.user_id
+            placement = {"roomId": room_id, "userId": uid, "token": player.token}
+            if args.encoding == PACKED:
+                placement["cells"] = pack_cells(positions)
+            else:
+                placement["positions"] = positions
+            player.request("place-ships", placement,
+                           ("ships-placed",), lambda d, uid=uid: d["userId"] == uid)
+            players[1 - n].expect(("ships-placed",), lambda d, uid=uid: d["userId"] == uid)
+        _, ready = players[0].expect(("game-ready",))
+        players[1].expect(("game-ready",))
+
+        by_id = {p.user_id: p for p in players}
+        targets = {}
+        for player in players:
+            cells = [(x, y) for x in range(args.width) for y in range(args.height)]
+            rng.shuffle(cells)
+            targets[player.user_id] = cells
+        turn = ready["turn"]
+        moves = 0
+        while True:
+            shooter = by_id[turn]
+            other = players[1] if shooter is players[0] else players[0]
+            x, y = targets[turn].pop()
+            event, data = shooter.request(
+                "fire", {"roomId": room_id, "userId": turn, "token": shooter.token,
+                         "x": x, "y": y},
+                ("move-update", "game-over"))
+            other.expect(("move-update", "game-over"))
+            moves += 1
+            if event == "game-over":
+                break
+            turn = data["turn"]
+        # Spectators end on a snapshot with every shot and both fleets
+        over = time.perf_counter()
+        for spectator in spectators:
+            if not spectator.over.wait(EVENT_TIMEOUT):
+                recorder.error("spectator final snapshot")
+                raise GameError("spectator never saw game-over")
+            final = spectator.snapshot
+            if len(final["moves"]) != moves or len(final["ships"]) != 2:
+                recorder.error("spectator final snapshot")
+                raise GameError("spectator snapshot does not match the game")
+            recorder.add("spectator final snapshot", time.perf_counter() - over)
+        return moves
+    finally:
+        for player in players:
+            player.close()
+        for spectator in spectators:
+            spectator.close()
+
+
+# === SERVICES ===
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("localhost", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"service on port {port} did not start")
+
+
+def start_services(services):
+    # The services need a shared session secret; a fresh one per run
+    env = dict(os.environ)
+    env.setdefault("SESSION_SECRET", secrets.token_hex(32))
+    procs = []
+    for name, port in services:
+        script = os.path.join(ROOT, "services", name, "server.py")
+        procs.append(subprocess.Popen([sys.executable, script],
+                                      cwd=os.path.dirname(script), env=env,
+                                      stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL,
+                                      start_new_session=True))
+    for _, port in services:
+        wait_for_port(port)
+    return procs
+
+
+def report(rows, games, failed, moves, elapsed):
+    print(f"\n{games} games ({failed} failed), {moves} moves in {elapsed:.2f}s")
+    print(f"throughput: {games / elapsed:.2f} games/s, {moves / elapsed:.1f} moves/s\n")
+    print(f"{'name':<26}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name in sorted(rows):
+        r = rows[name]
+        print(f"{name:<26}{r['count']:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Battleship load generator")
+    parser.add_argument("--games", type=int, default=20, help="games to play")
+    parser.add_argument("--concurrency", type=int, default=10, help="games in flight")
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--height", type=int, default=5)
+    parser.add_argument("--fleet", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[2, 2], help="comma-separated ship lengths")
+    parser.add_argument("--websocket-only", dest="transports", action="store_const",
+                        const=["websocket"], default=None,
+                        help="skip the long-polling handshake")
+    parser.add_argument("--start-services", action="store_true",
+                        help="start the three services locally for the run")
+    parser.add_argument("--all-in-one", action="store_true",
+                        help="target the single-process server on port 3000")
+    parser.add_argument("--encoding", choices=("json", PACKED), default="json",
+                        help="event encoding negotiated on join-game")
+    parser.add_argument("--match", action="store_true",
+                        help="pair players with POST /match instead of creating rooms")
+    parser.add_argument("--spectators", type=int, default=0,
+                        help="spectator connections watching each game")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    services = SERVICES
+    if args.all_in_one:
+        global USER_URL, ROOM_URL, GAME_URL, WS_URL
+        USER_URL = ROOM_URL = GAME_URL = WS_URL = "http://localhost:3000"
+        services = ALL_IN_ONE
+    procs = start_services(services) if args.start_services else []
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    moves = failed = 0
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(play_game, i, args, recorder, run_id)
+                       for i in range(args.games)]
+            for future in as_completed(futures):
+                try:
+                    moves += future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"game failed: {e}", file=sys.stderr)
+        elapsed = time.perf_counter() - start
+    finally:
+        # The debug servers fork a reloader child, so stop the whole group
+        for proc in procs:
+            os.killpg(proc.pid, signal.SIGTERM)
+
+    rows = summarize(recorder)
+    completed = args.games - failed
+    report(rows, completed, failed, moves, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"games": completed, "failed": failed, "moves": moves,
+                       "seconds": elapsed, "games_per_s": completed / elapsed,
+                       "moves_per_s": moves / elapsed, "latency": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()